@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from iscc.iscc import *
 from iscc.const import *
+from iscc import backends
 
 
 __version__ = "1.0.5"
+
+backends.select_from_env()
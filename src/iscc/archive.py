@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Sequential access to the members of ZIP and TAR archives.
+
+Members are yielded as readable streams in the order they are stored, so an
+archive is read in a single pass without extracting anything to disk. TAR
+archives are opened in streaming mode and may be compressed with gzip, bzip2
+or xz. A member stream is only valid until the next member is requested.
+"""
+import tarfile
+import zipfile
+from os.path import basename
+
+
+ARCHIVE_EXTENSIONS = (
+    ".zip",
+    ".tar",
+    ".tar.gz",
+    ".tgz",
+    ".tar.bz2",
+    ".tbz2",
+    ".tar.xz",
+    ".txz",
+)
+
+# Separates archive path and member name in result paths
+MEMBER_SEPARATOR = "!"
+
+
+def is_archive(path):
+    return basename(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_members(archive):
+    """Yield `(name, size, stream)` for every regular file in `archive`.
+
+    `archive` is a path or a binary file object (ZIP requires it seekable).
+    """
+    opened = isinstance(archive, str)
+    fileobj = open(archive, "rb") if opened else archive
+    try:
+        if fileobj.seekable() and zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            yield from _zip_members(fileobj)
+        else:
+            if fileobj.seekable():
+                fileobj.seek(0)
+            yield from _tar_members(fileobj)
+    finally:
+        if opened:
+            fileobj.close()
+
+
+def _zip_members(fileobj):
+    with zipfile.ZipFile(fileobj) as zf:
+        infos = sorted(zf.infolist(), key=lambda info: info.header_offset)
+        for info in infos:
+            if info.is_dir():
+                continue
+            with zf.open(info) as stream:
+                yield info.filename, info.file_size, stream
+
+
+def _tar_members(fileobj):
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            stream = tf.extractfile(member)
+            yield member.name, member.size, stream
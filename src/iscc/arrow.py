@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Columnar export of ISCC results to Apache Arrow and Parquet.
+
+Result dicts (as produced by `iscc.cli`) are buffered into record batches of
+a fixed number of rows and streamed to an Arrow IPC file (`.arrow`,
+`.feather`) or a Parquet file (`.parquet`), so memory stays bounded by the
+batch size. Every component is stored as a `uint8` header and a `uint64`
+body column, the Instance-ID top hash as 32-byte fixed size binary. Arrow
+IPC files are memory mapped by `read_catalog`, which hands the header and
+body columns to the similarity tools (`iscc.join`) without copying them if
+the file holds a single record batch.
+
+Requires `pyarrow` (`pip install iscc[arrow]`).
+
+Usage: python -m iscc.arrow results.jsonl results.parquet
+"""
+import argparse
+import json
+import sys
+import pyarrow as pa
+import pyarrow.compute as pc
+import iscc
+import iscc.iscc as core
+
+
+COMPONENTS = ("meta", "content", "data", "instance")
+DEFAULT_BATCH_SIZE = 65536
+PARQUET_EXTENSIONS = (".parquet", ".parq")
+
+SCHEMA = pa.schema(
+    [
+        pa.field("path", pa.string()),
+        pa.field("size", pa.uint64()),
+        pa.field("error", pa.string()),
+    ]
+    + [
+        pa.field(component + suffix, type_)
+        for component in COMPONENTS
+        for suffix, type_ in (("_header", pa.uint8()), ("_body", pa.uint64()))
+    ]
+    + [pa.field("tophash", pa.binary(32))]
+)
+
+
+def is_parquet(path):
+    return path.lower().endswith(PARQUET_EXTENSIONS)
+
+
+def to_record_batch(results, schema=SCHEMA):
+    """Convert result dicts into a record batch of `schema`."""
+    columns = {field.name: [] for field in SCHEMA}
+    for result in results:
+        columns["path"].append(result.get("path"))
+        columns["size"].append(result.get("size"))
+        columns["error"].append(result.get("error"))
+        for component in COMPONENTS:
+            code = result.get(component + "_id")
+            digest = core.decode(code) if code else None
+            columns[component + "_header"].append(digest[0] if digest else None)
+            columns[component + "_body"].append(
+                int.from_bytes(digest[1:9], "big", signed=False) if digest else None
+            )
+        tophash = result.get("tophash")
+        columns["tophash"].append(bytes.fromhex(tophash) if tophash else None)
+    arrays = [pa.array(columns[f.name], type=f.type) for f in SCHEMA]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ArrowWriter:
+    """Stream result dicts as record batches to an Arrow IPC or Parquet file.
+
+    `metadata` (str keys and values) is stored in the file schema together
+    with the library version.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, metadata=None):
+        meta = {"iscc.version": iscc.__version__}
+        meta.update(metadata or {})
+        self.schema = SCHEMA.with_metadata(meta)
+        self.batch_size = batch_size
+        self.rows = 0
+        self.pending = []
+        if is_parquet(path):
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, result):
+        self.pending.append(result)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, results):
+        for result in results:
+            self.write(result)
+
+    def flush(self):
+        if self.pending:
+            self.writer.write_batch(to_record_batch(self.pending, self.schema))
+            self.rows += len(self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_table(path, columns=None):
+    """Read an exported file, Arrow IPC files are memory mapped."""
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, columns=columns)
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.select(columns) if columns else table
+
+
+def read_catalog(path, component):
+    """Return `(paths, (headers, bodies))` of rows that have `component`.
+
+    `headers` and `bodies` are memoryviews in the `iscc.join.bodies()`
+    layout. For Arrow IPC files with a single record batch and no missing
+    codes they point into the memory mapped file. Otherwise the columns are
+    filtered and concatenated once.
+    """
+    header, body = component + "_header", component + "_body"
+    table = read_table(path, ["path", header, body])
+    if table.column(body).null_count:
+        table = table.filter(pc.is_valid(table.column(body)))
+    table = table.combine_chunks()
+    return (
+        table.column("path"),
+        (_view(table.column(header), "B"), _view(table.column(body), "Q")),
+    )
+
+
+def _view(column, fmt):
+    """Zero-copy memoryview of a single chunk primitive column."""
+    if not column.num_chunks:
+        return memoryview(b"").cast(fmt)
+    array = column.chunk(0)
+    width = array.type.bit_width // 8
+    data = memoryview(array.buffers()[1])
+    start = array.offset * width
+    return data[start : start + len(array) * width].cast(fmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m iscc.arrow",
+        description="Convert iscc JSON Lines results to Arrow or Parquet.",
+    )
+    parser.add_argument("results", help="JSON Lines file (- for stdin)")
+    parser.add_argument("output", help=".parquet or .arrow/.feather file")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="rows per record batch (default: %s)" % DEFAULT_BATCH_SIZE,
+    )
+    args = parser.parse_args(argv)
+
+    infile = sys.stdin if args.results == "-" else open(args.results, "rb")
+    metadata = {"source": args.results}
+    try:
+        with ArrowWriter(args.output, args.batch_size, metadata) as writer:
+            for line in infile:
+                writer.write(json.loads(line))
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+    sys.stderr.write("%d rows written to %s\n" % (writer.rows, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""NumPy vectorized implementations of the hot ISCC primitives.
+
+Floating point operations mirror the reference implementation step by step so
+that `dct` and `image_hash` produce bit-identical results.
+"""
+import math
+from itertools import islice
+import numpy as np
+from iscc.const import CHUNKING_GEAR, MINHASH_PERMUTATIONS
+
+
+MINHASH_BATCH_SIZE = 4096
+CHUNK_SEGMENT_SIZE = 4096
+
+_MAX_INT64 = (1 << 64) - 1
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_PERM_A = np.array([a for a, _ in MINHASH_PERMUTATIONS], dtype=np.uint64)[:, None]
+_PERM_B = np.array([b for _, b in MINHASH_PERMUTATIONS], dtype=np.uint64)[:, None]
+_GEAR = np.array(CHUNKING_GEAR, dtype=np.uint64)
+_DOUBLINGS = [np.uint64(m) for m in (1, 2, 4, 8, 16, 32)]
+_DCT_FACTORS = {}
+
+
+def minimum_hash(features, n=64):
+
+    a, b = _PERM_A[:n], _PERM_B[:n]
+    features = iter(features)
+    minima = np.full(n, _MAX_HASH, dtype=np.uint64)
+    empty = True
+    while True:
+        batch = list(islice(features, MINHASH_BATCH_SIZE))
+        try:
+            batch = np.array(batch, dtype=np.uint64)
+        except OverflowError:
+            batch = np.array([f & _MAX_INT64 for f in batch], dtype=np.uint64)
+        if batch.size == 0:
+            break
+        empty = False
+        hashes = ((a * batch + b) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(minima, hashes.min(axis=1), out=minima)
+    if empty:
+        raise ValueError("minimum_hash() arg is an empty sequence")
+    return [int(x) for x in minima]
+
+
+def similarity_hash(hash_digests):
+
+    n_bytes = len(hash_digests[0])
+    for digest in hash_digests:
+        assert len(digest) == n_bytes
+    arr = np.frombuffer(b"".join(hash_digests), dtype=np.uint8)
+    bits = np.unpackbits(arr.reshape(-1, n_bytes), axis=1)
+    counts = bits.sum(axis=0, dtype=np.int64)
+    shash = counts >= len(hash_digests) / 2
+    return np.packbits(shash).tobytes()
+
+
+def similarity_hash_batch(digest_lists):
+
+    if not digest_lists:
+        return []
+    n_bytes = len(digest_lists[0][0])
+    counts = np.array([len(digests) for digests in digest_lists], dtype=np.int64)
+    arr = np.frombuffer(b"".join(b"".join(d) for d in digest_lists), dtype=np.uint8)
+    assert arr.size == counts.sum() * n_bytes
+    bits = np.unpackbits(arr.reshape(-1, n_bytes), axis=1)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sums = np.add.reduceat(bits, offsets, axis=0, dtype=np.int64)
+    shash = sums >= counts[:, None] / 2
+    return [row.tobytes() for row in np.packbits(shash, axis=1)]
+
+
+def chunk_length(data, norm_size, min_size, max_size, mask_1, mask_2):
+
+    data_length = len(data)
+    if data_length <= min_size:
+        return data_length
+
+    end = min(max_size, data_length)
+    for start in range(min_size, end, CHUNK_SEGMENT_SIZE):
+        stop = min(start + CHUNK_SEGMENT_SIZE, end)
+        # The gear pattern at i is sum(GEAR[data[i - j]] << j) for j < 64 and
+        # i - j >= min_size. Sum it up with log2(64) shifted additions.
+        lo = max(min_size, start - 63)
+        pattern = np.zeros(63 + stop - lo, dtype=np.uint64)
+        pattern[63:] = _GEAR[np.frombuffer(data, np.uint8, stop - lo, offset=lo)]
+        for m in _DOUBLINGS:
+            shifted = pattern[: -int(m)] << m
+            pattern[int(m) :] += shifted
+        pattern = pattern[63 + start - lo :]
+        positions = np.arange(start, stop)
+        masks = np.where(positions < norm_size, np.uint64(mask_1), np.uint64(mask_2))
+        hits = np.flatnonzero((pattern & masks) == 0)
+        if hits.size:
+            return int(positions[hits[0]])
+    return end
+
+
+def _dct_factors(n):
+    if n not in _DCT_FACTORS:
+        _DCT_FACTORS[n] = np.array(
+            [math.cos((i + 0.5) * math.pi / n) * 2.0 for i in range(n // 2)]
+        )
+    return _DCT_FACTORS[n]
+
+
+def _dct_rows(values):
+    """Apply the reference DCT to every row of a 2-dimensional array."""
+    n = values.shape[1]
+    if n == 1:
+        return values.copy()
+    elif n == 0 or n % 2 != 0:
+        raise ValueError()
+    half = n // 2
+    mirrored = values[:, : half - 1 : -1]
+    alpha = _dct_rows(values[:, :half] + mirrored)
+    beta = _dct_rows((values[:, :half] - mirrored) / _dct_factors(n))
+    result = np.empty_like(values)
+    result[:, 0 : n - 2 : 2] = alpha[:, : half - 1]
+    result[:, 1 : n - 2 : 2] = beta[:, : half - 1] + beta[:, 1:half]
+    result[:, n - 2] = alpha[:, -1]
+    result[:, n - 1] = beta[:, -1]
+    return result
+
+
+def dct(values_list):
+
+    values = np.asarray(values_list, dtype=np.float64).reshape(1, -1)
+    return _dct_rows(values)[0].tolist()
+
+
+def image_hash(pixels):
+
+    # 1. DCT per row
+    dct_rows = _dct_rows(np.asarray(pixels, dtype=np.float64))
+
+    # 2. DCT per col
+    dct_cols = _dct_rows(dct_rows.T).T
+
+    # 3. Extract upper left 8x8 corner
+    flat = dct_cols[:8, :8].ravel()
+
+    # 4. Calculate median
+    med = np.median(flat)
+
+    # 5. Create 64-bit digest by comparing to median
+    return np.packbits(flat > med).tobytes()
+
+
+PRIMITIVES = {
+    "minimum_hash": minimum_hash,
+    "similarity_hash": similarity_hash,
+    "similarity_hash_batch": similarity_hash_batch,
+    "chunk_length": chunk_length,
+    "dct": dct,
+    "image_hash": image_hash,
+}
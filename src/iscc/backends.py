@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Runtime selectable implementations of the hot ISCC primitives.
+
+The pure Python functions in `iscc.iscc` are the reference backend. Other
+backends provide a subset of `PRIMITIVES` and fall back to the reference for
+the rest. Selecting a backend rebinds the primitives in `iscc.iscc` (which the
+generators call) and in the `iscc` package namespace.
+
+Select with the `ISCC_BACKEND` environment variable ("python", "numpy",
+"auto" or the name of a registered backend) or at runtime:
+
+    iscc.backends.select("auto")
+
+Third party (e.g. compiled) backends can register themselves via the
+`iscc.backends` entry point group. The entry point must resolve to a callable
+returning a dict of primitive implementations.
+"""
+import os
+import sys
+from os.path import dirname, isfile, join
+
+
+ENV_VAR = "ISCC_BACKEND"
+ENV_TEST_DATA = "ISCC_TEST_DATA"
+ENTRY_POINT_GROUP = "iscc.backends"
+
+PRIMITIVES = (
+    "minimum_hash",
+    "similarity_hash",
+    "similarity_hash_batch",
+    "chunk_length",
+    "dct",
+    "image_hash",
+    "encode",
+    "decode",
+)
+
+# Test data functions that exercise the primitives
+CHECKED = (
+    "meta_id",
+    "content_id_text",
+    "content_id_image",
+    "content_id_mixed",
+    "data_id",
+    "data_chunks",
+    "minimum_hash",
+)
+
+
+class BackendError(Exception):
+    pass
+
+
+class Backend:
+    def __init__(self, name, loader, priority=0):
+        self.name = name
+        self.loader = loader
+        self.priority = priority
+        self._functions = None
+
+    def load(self):
+        """Return a complete mapping of primitive names to implementations."""
+        if self._functions is None:
+            functions = dict(reference())
+            provided = self.loader()
+            unknown = set(provided) - set(PRIMITIVES)
+            if unknown:
+                raise BackendError("Unknown primitives %s" % sorted(unknown))
+            functions.update(provided)
+            self._functions = functions
+        return self._functions
+
+    @property
+    def available(self):
+        try:
+            self.load()
+        except ImportError:
+            return False
+        return True
+
+
+_registry = {}
+_active = "python"
+_entry_points_loaded = False
+_reference = {}
+
+
+def reference():
+    """Reference implementations captured before any backend was selected."""
+    if not _reference:
+        from iscc import iscc as module
+
+        _reference.update({name: getattr(module, name) for name in PRIMITIVES})
+    return _reference
+
+
+def register(name, loader, priority=0):
+    """Register a backend `loader` returning a dict of primitive functions.
+
+    The loader should raise ImportError if the backend is unavailable.
+    """
+    _registry[name] = Backend(name, loader, priority)
+
+
+def _load_numpy():
+    from iscc import backend_numpy
+
+    return backend_numpy.PRIMITIVES
+
+
+def _load_entry_points():
+    """Register entry point backends on first use (keeps `import iscc` fast)."""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # pragma: no cover - Python < 3.8
+        return
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        group = eps.select(group=ENTRY_POINT_GROUP)
+    else:  # pragma: no cover - Python < 3.10
+        group = eps.get(ENTRY_POINT_GROUP, [])
+    for ep in group:
+        register(ep.name, lambda ep=ep: ep.load()(), priority=20)
+
+
+register("python", dict, priority=0)
+register("numpy", _load_numpy, priority=10)
+
+
+def names():
+    """Registered backend names ordered by descending priority."""
+    _load_entry_points()
+    return [b.name for b in sorted(_registry.values(), key=lambda b: -b.priority)]
+
+
+def available():
+    """Names of backends whose dependencies can be imported."""
+    return [name for name in names() if _registry[name].available]
+
+
+def active():
+    return _active
+
+
+def get(name):
+    _load_entry_points()
+    if name not in _registry:
+        raise BackendError("Unknown backend %r. Choose from %s" % (name, names()))
+    return _registry[name]
+
+
+def select(name=None, check=True):
+    """Activate backend `name` and return its name.
+
+    `None` reads the `ISCC_BACKEND` environment variable and defaults to
+    "auto", which picks the highest priority available backend that passes
+    the self-check. With `check=True` an explicit backend is verified before
+    activation and BackendError is raised on mismatches.
+    """
+    if name is None:
+        name = os.environ.get(ENV_VAR, "auto")
+    if name == "auto":
+        for candidate in available():
+            if not check or self_check(candidate, raise_error=False):
+                return select(candidate, check=False)
+        return select("python", check=False)
+    backend = get(name)
+    try:
+        functions = backend.load()
+    except ImportError as e:
+        raise BackendError("Backend %r is not available: %s" % (name, e))
+    if check:
+        self_check(name)
+    _activate(functions)
+    global _active
+    _active = name
+    return name
+
+
+def _activate(functions):
+    from iscc import iscc as module
+
+    package = sys.modules.get("iscc")
+    for name, func in functions.items():
+        setattr(module, name, func)
+        if package is not None and hasattr(package, name):
+            setattr(package, name, func)
+
+
+def select_from_env():
+    """Select the backend from `ISCC_BACKEND` if the variable is set."""
+    if os.environ.get(ENV_VAR):
+        select()
+
+
+###############################################################################
+# Self-Check                                                                  #
+###############################################################################
+
+
+def test_data_path():
+    """Locate the conformance test data (`ISCC_TEST_DATA` or source checkout)."""
+    path = os.environ.get(ENV_TEST_DATA)
+    if path is None:
+        path = join(dirname(dirname(dirname(__file__))), "tests", "test_data.json")
+    return path if isfile(path) else None
+
+
+def _conformance_cases(path):
+    import json
+
+    base = dirname(path)
+    with open(path, encoding="utf-8") as jfile:
+        data = json.load(jfile)
+    for funcname in CHECKED:
+        for testname, testdata in sorted(data.get(funcname, {}).items()):
+            if not testname.startswith("test_"):
+                continue
+            args = [
+                join(base, a) if isinstance(a, str) and isfile(join(base, a)) else a
+                for a in testdata["inputs"]
+            ]
+            expected = testdata["outputs"]
+            if funcname == "data_chunks":
+                expected = [bytes.fromhex(i.split(":")[1]) for i in expected]
+            yield funcname, testname, args, expected
+
+
+def _synthetic_cases(seed=0):
+    """Inputs for comparison against the reference backend without test data."""
+    import random
+
+    rnd = random.Random(seed)
+    data = rnd.getrandbits(8 * 300000).to_bytes(300000, "big")
+    digests = [rnd.getrandbits(64).to_bytes(8, "big") for _ in range(100)]
+    features = [rnd.getrandbits(32) for _ in range(1000)]
+    pixels = [[rnd.randint(0, 255) for _ in range(32)] for _ in range(32)]
+    flat = [[128] * 32 for _ in range(32)]
+    yield "minimum_hash", (features,)
+    yield "minimum_hash", ([-1, 1 << 64, (1 << 70) + 5] + features[:10],)
+    yield "similarity_hash", (digests,)
+    yield "similarity_hash_batch", ([digests[:1], digests[1:4], digests[4:]],)
+    yield "similarity_hash_batch", ([],)
+    yield "dct", ([float(v) for v in pixels[0]],)
+    yield "image_hash", (pixels,)
+    yield "image_hash", (flat,)
+    yield "encode", (b"\x20" + digests[0],)
+    yield "decode", ("CDC7Lg4oHA8DC",)
+    yield "data_chunks", (data,)
+    yield "data_id", (data,)
+    yield "meta_id", ("Die Unendliche Geschichte", "Michael Ende")
+    yield "content_id_text", ("Ein Text mit Umlauten äöü und Zahlen 123",)
+
+
+def _call(module, funcname, args):
+    result = getattr(module, funcname)(*args)
+    if funcname == "data_chunks":
+        result = list(result)
+    return result
+
+
+def self_check(name, raise_error=True):
+    """Verify backend `name` against the conformance test data.
+
+    Without test data the backend is compared against the reference backend
+    on synthetic inputs. Returns True on success.
+    """
+    from iscc import iscc as module
+
+    previous = {p: getattr(module, p) for p in PRIMITIVES}
+    path = test_data_path()
+    failures = []
+    try:
+        _activate(get(name).load())
+        if path is not None:
+            for funcname, testname, args, expected in _conformance_cases(path):
+                if _call(module, funcname, args) != expected:
+                    failures.append(testname)
+        else:
+            for funcname, args in _synthetic_cases():
+                result = _call(module, funcname, args)
+                _activate(reference())
+                expected = _call(module, funcname, args)
+                _activate(get(name).load())
+                if result != expected:
+                    failures.append(funcname)
+    finally:
+        _activate(previous)
+    if failures and raise_error:
+        raise BackendError("Backend %r failed self-check: %s" % (name, failures))
+    return not failures
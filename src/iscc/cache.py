@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Persistent SQLite cache of ISCC results keyed by file identity.
+
+Entries are keyed by `(device, inode, size, mtime_ns)` of the file and the
+component name. The cache stores the library version together with a
+fingerprint of the algorithm constants and drops all entries when either
+changes. The number of entries is bounded with least recently used eviction.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import iscc
+from iscc import const
+
+
+DEFAULT_MAX_ENTRIES = 1000000
+COMMIT_INTERVAL = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    component TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (dev, ino, size, mtime_ns, component)
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+def algorithm_version():
+    """Library version plus a fingerprint of all algorithm constants."""
+    h = hashlib.sha256()
+    for name in sorted(n for n in dir(const) if n.isupper()):
+        value = getattr(const, name)
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        h.update(("%s=%r;" % (name, value)).encode("utf-8"))
+    return "%s-%s" % (iscc.__version__, h.hexdigest()[:16])
+
+
+def file_key(path):
+    """Identity of a file as `(device, inode, size, mtime_ns)`."""
+    st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class ResultCache:
+    """Component results cached by file identity in an SQLite database.
+
+    A cache instance may be shared between threads of one process.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, version=None):
+        self.version = version or algorithm_version()
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._invalidate()
+
+    def _invalidate(self):
+        row = self.db.execute(
+            "SELECT value FROM settings WHERE key = 'version'"
+        ).fetchone()
+        if row is None or row[0] != self.version:
+            with self.db:
+                self.db.execute("DELETE FROM results")
+                self.db.execute(
+                    "INSERT OR REPLACE INTO settings VALUES ('version', ?)",
+                    (self.version,),
+                )
+
+    def get(self, key, component):
+        """Return the cached value or None."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT value FROM results WHERE dev = ? AND ino = ? AND size = ? "
+                "AND mtime_ns = ? AND component = ? AND version = ?",
+                tuple(key) + (component, self.version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute(
+                "UPDATE results SET accessed = ? WHERE dev = ? AND ino = ? "
+                "AND size = ? AND mtime_ns = ? AND component = ?",
+                (time.time(),) + tuple(key) + (component,),
+            )
+            self._written()
+        return json.loads(row[0])
+
+    def get_many(self, key, components):
+        """Return a dict with the cached values of the given components."""
+        values = {}
+        for component in components:
+            value = self.get(key, component)
+            if value is not None:
+                values[component] = value
+        return values
+
+    def put(self, key, component, value):
+        row = tuple(key) + (component, self.version, json.dumps(value), time.time())
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+            self._written()
+
+    def _written(self):
+        self.writes += 1
+        if self.writes % COMMIT_INTERVAL == 0:
+            self.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries beyond `max_entries`."""
+        with self.lock:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self.db.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                )
+        return max(excess, 0)
+
+    def commit(self):
+        with self.lock:
+            self.evict()
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""Bulk ISCC generation for files and directory trees.
+
+Writes one JSON object per file (JSON Lines) and reports progress on stderr.
+
+Usage: iscc [-c meta,content,data,instance] [-w WORKERS] [PATH ...]
+
+Paths may be files or directories (walked recursively). Without paths or with
+`-` the file list is read from stdin, one path per line. With `--archives`
+the members of ZIP and TAR archives are processed instead of the archive.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from multiprocessing import Pool
+from os.path import basename, getsize, isdir, join, splitext
+import iscc
+from iscc.archive import MEMBER_SEPARATOR, is_archive, iter_members
+from iscc.cache import DEFAULT_MAX_ENTRIES, ResultCache, file_key
+from iscc.incremental import BLOCK_SIZE, DataIdState, InstanceIdState
+from iscc.readers import DEFAULT_BLOCK_SIZE, open_file
+
+
+COMPONENTS = ("meta", "content", "data", "instance")
+DEFAULT_COMPONENTS = ("content", "data", "instance")
+CACHEABLE = ("content", "data", "instance")
+
+TEXT_EXTENSIONS = frozenset((".txt", ".md", ".html", ".htm", ".xml", ".csv", ".json"))
+IMAGE_EXTENSIONS = frozenset(
+    (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+)
+
+
+###############################################################################
+# File Discovery                                                              #
+###############################################################################
+
+
+def iter_paths(sources, stdin=None):
+    """Yield file paths from files, directory trees and `-` (stdin lines)."""
+
+    for source in sources:
+        if source == "-":
+            for line in stdin if stdin is not None else sys.stdin:
+                line = line.rstrip("\r\n")
+                if line:
+                    yield from iter_paths([line])
+        elif isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    yield join(root, name)
+        else:
+            yield source
+
+
+###############################################################################
+# Generation                                                                  #
+###############################################################################
+
+
+def content_kind(path):
+    ext = splitext(path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        return "text"
+    if ext in IMAGE_EXTENSIONS:
+        return "image"
+    return None
+
+
+def cache_name(path, component):
+    """Cache key of a component (the content kind depends on the file name)."""
+    if component == "content":
+        kind = content_kind(path)
+        return "content:" + kind if kind else None
+    return component
+
+
+def generate(path, components=DEFAULT_COMPONENTS, cached=None, read_options=None):
+    """Compute the selected ISCC components for the file at `path`.
+
+    Components found in the `cached` dict are taken from there. Data-ID and
+    Instance-ID read the file with `readers.open_file(path, **read_options)`.
+    With the `fadvise` read option the file is read once for all components
+    and the result reports `bytes_read`.
+    """
+
+    cached = cached or {}
+    read_options = read_options or {}
+    if read_options.get("fadvise"):
+        return generate_once(path, components, cached, read_options)
+    result = {"path": path}
+    try:
+        result["size"] = getsize(path)
+        if "meta" in components:
+            title = splitext(basename(path))[0]
+            result["meta_id"] = iscc.meta_id(title)[0]
+        if "content" in cached:
+            result["content_id"] = cached["content"]
+        elif "content" in components:
+            kind = content_kind(path)
+            if kind == "text":
+                result["content_id"] = iscc.content_id_text_stream(path)
+            elif kind == "image":
+                result["content_id"] = iscc.content_id_image(path)
+        if "data" in cached:
+            result["data_id"] = cached["data"]
+        elif "data" in components:
+            with open_file(path, **read_options) as infile:
+                result["data_id"] = iscc.data_id(infile)
+        if "instance" in cached:
+            result["instance_id"], result["tophash"] = cached["instance"]
+        elif "instance" in components:
+            with open_file(path, **read_options) as infile:
+                result["instance_id"], result["tophash"] = iscc.instance_id(infile)
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+        return result
+    return _join(result)
+
+
+def generate_stream(path, stream, size, components=DEFAULT_COMPONENTS):
+    """Compute the selected ISCC components reading `stream` exactly once.
+
+    Data-ID and Instance-ID are updated with every block read for the
+    Content-ID, so no component needs a second pass over the data. `path`
+    names the stream (its extension selects the content kind).
+    """
+
+    result = {"path": path, "size": size}
+    try:
+        if "meta" in components:
+            title = splitext(basename(path))[0]
+            result["meta_id"] = iscc.meta_id(title)[0]
+        data = DataIdState() if "data" in components else None
+        instance = InstanceIdState() if "instance" in components else None
+        blocks = _blocks(stream, [s for s in (data, instance) if s is not None])
+        kind = content_kind(path) if "content" in components else None
+        if kind == "text":
+            result["content_id"] = iscc.content_id_text_stream(blocks)
+        elif kind == "image":
+            result["content_id"] = iscc.content_id_image(BytesIO(b"".join(blocks)))
+        if data is not None or instance is not None:
+            for _ in blocks:
+                pass
+        if data is not None:
+            result["data_id"] = data.code()
+        if instance is not None:
+            result["instance_id"], result["tophash"] = instance.code()
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+        return result
+    return _join(result)
+
+
+def generate_once(path, components=DEFAULT_COMPONENTS, cached=None, read_options=None):
+    """Compute the selected ISCC components reading the file at `path` once.
+
+    Opens the file with `readers.open_file(path, **read_options)` and adds
+    the number of bytes read to the result. Cached components are not read.
+    """
+
+    cached = cached or {}
+    todo = tuple(c for c in components if c not in cached)
+    try:
+        size = getsize(path)
+        with open_file(path, **(read_options or {})) as infile:
+            result = generate_stream(path, infile, size, todo)
+            result["bytes_read"] = infile.bytes_read
+    except Exception as e:
+        return {"path": path, "error": "%s: %s" % (type(e).__name__, e)}
+    if "error" in result:
+        return result
+    if "content" in cached:
+        result["content_id"] = cached["content"]
+    if "data" in cached:
+        result["data_id"] = cached["data"]
+    if "instance" in cached:
+        result["instance_id"], result["tophash"] = cached["instance"]
+    return _join(result)
+
+
+def generate_archive(path, components=DEFAULT_COMPONENTS):
+    """Yield results for every member of the archive at `path` in one pass."""
+
+    try:
+        for name, size, stream in iter_members(path):
+            member = path + MEMBER_SEPARATOR + name
+            yield generate_stream(member, stream, size, components)
+    except Exception as e:
+        yield {"path": path, "error": "%s: %s" % (type(e).__name__, e)}
+
+
+def _blocks(stream, states):
+    for block in iter(lambda: stream.read(BLOCK_SIZE), b""):
+        for state in states:
+            state.push(block)
+        yield block
+
+
+def _join(result):
+    codes = [
+        result[key]
+        for key in ("meta_id", "content_id", "data_id", "instance_id")
+        if key in result
+    ]
+    if codes:
+        result["iscc"] = "-".join(codes)
+    return result
+
+
+def _generate(task):
+    path, components, key, cached, archive, read_options = task
+    if archive:
+        return task, list(generate_archive(path, components))
+    return task, [generate(path, components, cached, read_options)]
+
+
+def _tasks(paths, components, cache, archives=False, read_options=None):
+    for path in paths:
+        if archives and is_archive(path):
+            yield path, components, None, {}, True, read_options
+            continue
+        key, cached = None, {}
+        if cache is not None:
+            try:
+                key = file_key(path)
+            except OSError:
+                pass
+            else:
+                for component in CACHEABLE:
+                    name = cache_name(path, component)
+                    if component in components and name is not None:
+                        value = cache.get(key, name)
+                        if value is not None:
+                            cached[component] = value
+        yield path, components, key, cached, False, read_options
+
+
+def _store(cache, task, result):
+    path, components, key, cached, archive, read_options = task
+    if key is None or "error" in result:
+        return
+    values = {}
+    if "content_id" in result:
+        values["content"] = result["content_id"]
+    if "data_id" in result:
+        values["data"] = result["data_id"]
+    if "instance_id" in result:
+        values["instance"] = [result["instance_id"], result["tophash"]]
+    for component, value in values.items():
+        name = cache_name(path, component)
+        if component not in cached and name is not None:
+            cache.put(key, name, value)
+
+
+def run(
+    paths,
+    components=DEFAULT_COMPONENTS,
+    workers=None,
+    ordered=False,
+    cache=None,
+    archives=False,
+    read_options=None,
+):
+    """Yield results for `paths`, computed by `workers` processes.
+
+    With a `ResultCache` the cache is consulted in the main process before
+    any work is dispatched and new results are stored as they arrive. With
+    `archives` every archive yields one result per member (not cached).
+    `read_options` are passed to `readers.open_file` (e.g. `readahead`).
+    """
+
+    tasks = _tasks(paths, components, cache, archives, read_options)
+    if workers == 1:
+        results = map(_generate, tasks)
+    else:
+        pool = Pool(workers)
+        imap = pool.imap if ordered else pool.imap_unordered
+        results = imap(_generate, tasks, chunksize=1)
+    try:
+        for task, task_results in results:
+            for result in task_results:
+                if cache is not None:
+                    _store(cache, task, result)
+                yield result
+    finally:
+        if workers != 1:
+            pool.terminate()
+
+
+###############################################################################
+# Reporting                                                                   #
+###############################################################################
+
+
+class Progress:
+    """Throttled throughput report written to a text stream."""
+
+    def __init__(self, stream=sys.stderr, interval=1.0):
+        self.stream = stream
+        self.interval = interval
+        self.start = self.last = time.perf_counter()
+        self.files = 0
+        self.errors = 0
+        self.bytes = 0
+
+    def update(self, result):
+        self.files += 1
+        self.bytes += result.get("size", 0)
+        self.errors += int("error" in result)
+        now = time.perf_counter()
+        if self.stream is not None and now - self.last >= self.interval:
+            self.last = now
+            self.report(final=False)
+
+    def report(self, final=True):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        mb = self.bytes / 1024**2
+        self.stream.write(
+            "\r%d files (%d errors), %.1f MB in %.1fs - %.1f files/s, %.2f MB/s"
+            % (self.files, self.errors, mb, elapsed, self.files / elapsed, mb / elapsed)
+        )
+        if final:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+def parse_components(text):
+    components = tuple(c.strip() for c in text.split(",") if c.strip())
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            "unknown components %s (choose from %s)"
+            % (", ".join(sorted(unknown)), ", ".join(COMPONENTS))
+        )
+    return components
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="iscc", description="Generate ISCC codes for files as JSON Lines."
+    )
+    parser.add_argument("paths", nargs="*", help="files or directories, - for stdin")
+    parser.add_argument(
+        "-c",
+        "--components",
+        type=parse_components,
+        default=DEFAULT_COMPONENTS,
+        help="comma separated: %s (default: %s)"
+        % (",".join(COMPONENTS), ",".join(DEFAULT_COMPONENTS)),
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="worker processes"
+    )
+    parser.add_argument(
+        "-o", "--output", help="write JSON Lines to file instead of stdout"
+    )
+    parser.add_argument(
+        "--ordered", action="store_true", help="keep output in input order"
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress report")
+    parser.add_argument(
+        "-a", "--archives", action="store_true", help="process ZIP/TAR members"
+    )
+    parser.add_argument(
+        "--readahead",
+        type=int,
+        default=0,
+        metavar="DEPTH",
+        help="read DEPTH blocks ahead in a background thread (default: off)",
+    )
+    parser.add_argument(
+        "--block-size",
+        type=int,
+        default=DEFAULT_BLOCK_SIZE,
+        help="read-ahead block size in bytes (default: %s)" % DEFAULT_BLOCK_SIZE,
+    )
+    parser.add_argument(
+        "--fadvise",
+        action="store_true",
+        help="read each file once with page cache hints, report bytes read",
+    )
+    parser.add_argument("--cache", help="SQLite result cache for repeated scans")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="maximum number of cached results (default: %s)" % DEFAULT_MAX_ENTRIES,
+    )
+    args = parser.parse_args(argv)
+
+    paths = iter_paths(args.paths or ["-"])
+    progress = Progress(stream=None if args.quiet else sys.stderr)
+    cache = ResultCache(args.cache, args.cache_size) if args.cache else None
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    read_options = {
+        "readahead": args.readahead,
+        "block_size": args.block_size,
+        "fadvise": args.fadvise,
+    }
+    try:
+        results = run(
+            paths,
+            args.components,
+            args.workers,
+            args.ordered,
+            cache,
+            args.archives,
+            read_options,
+        )
+        for result in results:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            progress.update(result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+    if not args.quiet:
+        progress.report()
+        if cache is not None:
+            sys.stderr.write("cache: %d hits, %d misses\n" % (cache.hits, cache.misses))
+    return 1 if progress.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Near-duplicate clustering of ISCC corpora.
+
+Items carry component codes (Meta-ID, Content-ID, Data-ID, Instance-ID).
+Two items are linked if any component with a threshold is within that
+Hamming distance. Candidate pairs come from a multi-index of disjoint bit
+bands (pigeonhole principle): if two 64-bit codes differ in at most `d` bits
+and are split into `m` bands, at least one band differs in at most `d // m`
+bits. Each band is indexed in buckets and only neighboring buckets within
+that radius are compared. Identical codes are merged without comparison,
+candidates are verified with a popcount and linked items are merged with
+union-find. Only codes with equal header bytes are compared.
+
+Usage: python -m iscc.cluster results.jsonl -t content=8,data=4
+"""
+import argparse
+import json
+import sys
+from array import array
+from itertools import combinations
+from math import factorial
+import iscc.iscc as core
+
+
+COMPONENTS = ("meta", "content", "data", "instance")
+HEADER_COMPONENTS = {0x00: "meta", 0x20: "data", 0x30: "instance"}
+DEFAULT_THRESHOLDS = {"content": 8, "data": 8}
+MAX_BANDS = 16
+
+
+def component_of(header):
+    """Component name for a header byte value."""
+    if 0x10 <= header <= 0x19:
+        return "content"
+    return HEADER_COMPONENTS.get(header)
+
+
+def split_bands(n, bits=64):
+    """`(shift, mask)` of `n` disjoint bands covering `bits` bits."""
+    bands, start = [], 0
+    for i in range(n):
+        width = bits // n + (1 if i < bits % n else 0)
+        bands.append((start, (1 << width) - 1))
+        start += width
+    return bands
+
+
+def _probes(width, radius):
+    return sum(
+        factorial(width) // (factorial(k) * factorial(width - k))
+        for k in range(radius + 1)
+    )
+
+
+def plan_bands(n, threshold, bits=64):
+    """Number of bands with the lowest estimated cost for `n` random codes.
+
+    The estimate counts bucket probes plus expected candidate comparisons.
+    Narrow bands give large buckets, wide bands need many probes.
+    """
+
+    def cost(m):
+        width, radius = bits // m, threshold // m
+        probes = _probes(width, radius)
+        buckets = min(n, 2**width)
+        return m * (buckets * probes + n * n / 2.0 * probes / 2**width)
+
+    return min(range(1, min(threshold + 1, MAX_BANDS) + 1), key=cost)
+
+
+def neighbor_masks(width, radius):
+    """Non-zero XOR masks of up to `radius` bits within `width` bits."""
+    masks = []
+    for k in range(1, radius + 1):
+        for positions in combinations(range(width), k):
+            masks.append(sum(1 << p for p in positions))
+    return masks
+
+
+class UnionFind:
+    """Disjoint sets over `0..n-1` with path halving and union by size."""
+
+    def __init__(self, n=0):
+        self.parent = array("l", range(n))
+        self.size = array("l", [1]) * n
+
+    def add(self):
+        self.parent.append(len(self.parent))
+        self.size.append(1)
+        return len(self.parent) - 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        """Merge the sets of `a` and `b`, return False if already merged."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+class Clusterer:
+    """Collect items and cluster them with per-component thresholds.
+
+    `thresholds` maps component names to the maximum Hamming distance of
+    linked codes, e.g. `{"content": 8, "data": 4}`. Components without a
+    threshold are ignored.
+    """
+
+    def __init__(self, thresholds=None):
+        thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+        unknown = set(thresholds) - set(COMPONENTS)
+        if unknown:
+            raise ValueError("Unknown components %s" % sorted(unknown))
+        self.thresholds = dict(thresholds)
+        self.ids = []
+        self.sets = UnionFind()
+        # component -> {(header, body): first item index}
+        self.codes = {c: {} for c in self.thresholds}
+        self.comparisons = 0
+        self.merges = 0
+
+    def add(self, item_id, codes):
+        """Add an item with a list of component codes or a full ISCC string."""
+        if isinstance(codes, str):
+            codes = codes.split("-")
+        index = self.sets.add()
+        self.ids.append(item_id)
+        for code in codes:
+            digest = core.decode(code)
+            component = component_of(digest[0])
+            if component not in self.codes:
+                continue
+            key = (digest[0], int.from_bytes(digest[1:], "big", signed=False))
+            first = self.codes[component].setdefault(key, index)
+            if first != index:
+                self._union(first, index)
+        return index
+
+    def add_result(self, result):
+        """Add a result dict as written by the `iscc` command line tool."""
+        codes = [result[c + "_id"] for c in COMPONENTS if c + "_id" in result]
+        return self.add(result.get("path"), codes)
+
+    def _union(self, a, b):
+        if self.sets.union(a, b):
+            self.merges += 1
+
+    def run(self):
+        """Link all candidate pairs within the component thresholds."""
+        for component, threshold in sorted(self.thresholds.items()):
+            if threshold <= 0:
+                continue
+            codes = self.codes[component]
+            n_bands = plan_bands(len(codes), threshold)
+            radius = threshold // n_bands
+            for shift, mask in split_bands(n_bands):
+                buckets = {}
+                for (header, body), index in codes.items():
+                    band = (header, (body >> shift) & mask)
+                    buckets.setdefault(band, []).append((body, index))
+                flips = neighbor_masks(mask.bit_length(), radius)
+                for (header, value), members in buckets.items():
+                    self._link(members, None, threshold)
+                    for flip in flips:
+                        if value ^ flip > value:
+                            other = buckets.get((header, value ^ flip))
+                            if other:
+                                self._link(members, other, threshold)
+        return self
+
+    def _link(self, members, others, threshold):
+        """Compare pairs within `members` or between `members` and `others`."""
+        find = self.sets.find
+        for i, (body_a, index_a) in enumerate(members):
+            for body_b, index_b in members[i + 1 :] if others is None else others:
+                if find(index_a) == find(index_b):
+                    continue
+                self.comparisons += 1
+                if bin(body_a ^ body_b).count("1") <= threshold:
+                    self._union(index_a, index_b)
+
+    def assignments(self):
+        """Yield `(item_id, cluster)` with the first item index as cluster."""
+        first = {}
+        for index, item_id in enumerate(self.ids):
+            root = self.sets.find(index)
+            yield item_id, first.setdefault(root, index)
+
+    def clusters(self, min_size=2):
+        """Return lists of item ids of all clusters with `min_size` items."""
+        groups = {}
+        for item_id, cluster in self.assignments():
+            groups.setdefault(cluster, []).append(item_id)
+        return [g for g in groups.values() if len(g) >= min_size]
+
+
+def cluster(items, thresholds=None):
+    """Yield `(item_id, cluster)` for `(item_id, codes)` pairs."""
+    clusterer = Clusterer(thresholds)
+    for item_id, codes in items:
+        clusterer.add(item_id, codes)
+    return clusterer.run().assignments()
+
+
+def parse_thresholds(text):
+    thresholds = {}
+    for part in text.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() not in COMPONENTS or not value.strip().isdigit():
+            raise argparse.ArgumentTypeError("invalid threshold %r" % part)
+        thresholds[name.strip()] = int(value)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m iscc.cluster",
+        description="Cluster near-duplicates in iscc JSON Lines results.",
+    )
+    parser.add_argument("results", nargs="*", help="JSON Lines files (default stdin)")
+    parser.add_argument(
+        "-t",
+        "--thresholds",
+        type=parse_thresholds,
+        default=DEFAULT_THRESHOLDS,
+        help="e.g. content=8,data=4 (default: content=8,data=8)",
+    )
+    parser.add_argument(
+        "--min-size", type=int, default=1, help="only report clusters this large"
+    )
+    args = parser.parse_args(argv)
+
+    clusterer = Clusterer(args.thresholds)
+    for path in args.results or ["-"]:
+        infile = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in infile:
+                result = json.loads(line)
+                if "error" not in result:
+                    clusterer.add_result(result)
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+    clusterer.run()
+    sizes = {}
+    for _, cluster_id in clusterer.assignments():
+        sizes[cluster_id] = sizes.get(cluster_id, 0) + 1
+    for item_id, cluster_id in clusterer.assignments():
+        if sizes[cluster_id] >= args.min_size:
+            print(json.dumps({"path": item_id, "cluster": cluster_id}))
+    sys.stderr.write(
+        "%d items, %d clusters, %d comparisons\n"
+        % (len(clusterer.ids), len(sizes), clusterer.comparisons)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -54,6 +54,18 @@ INPUT_TRIM = 128
 WINDOW_SIZE_MID = 4
 WINDOW_SIZE_CID_T = 13
 
+# Content-ID-Video: hash every n-th frame, skip frames whose mean absolute
+# 32x32 grayscale difference to the last hashed frame is within threshold
+FRAME_STEP_CID_V = 5
+SCENE_THRESHOLD_CID_V = 2.0
+
+# Content-ID-Audio: mono PCM downsampled to about 8 kHz, 256 sample windows,
+# 65 log spaced DCT energy bands between 300 Hz and 2 kHz (64-bit features)
+SAMPLE_RATE_CID_A = 8000
+WINDOW_SIZE_CID_A = 256
+BANDS_CID_A = 65
+BAND_RANGE_CID_A = (300, 2000)
+
 MAX_INT64 = 2 ** 64 - 1
 GEAR1_NORM = 40
 GEAR1_MIN = 20
@@ -67,7 +79,7 @@ GEAR2_MAX = 65536
 GEAR2_MASK1 = 0x0003590703530000
 GEAR2_MASK2 = 0x0000D90003530000
 
-MINHASH_PERMUTATIONS = [
+MINHASH_PERMUTATIONS = (
     (853146490016488653, 1089606993368836715),
     (1849332765672628665, 726972438868274737),
     (1131688930666554379, 66204585613901025),
@@ -324,9 +336,9 @@ MINHASH_PERMUTATIONS = [
     (1184950555241875363, 1034879193665968156),
     (949293229786807261, 1390525603722466192),
     (577374388210505249, 1452060099744603134),
-]
+)
 
-CHUNKING_GEAR = [
+CHUNKING_GEAR = (
     9584138480181866666,
     4739450037122062430,
     1042006760432515769,
@@ -583,4 +595,4 @@ CHUNKING_GEAR = [
     3663261456454345351,
     5865411828910435346,
     13570376904595974307,
-]
+)
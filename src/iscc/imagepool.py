@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Process pool for Content-ID-Image with shared memory transport.
+
+The main process decodes and normalizes images to 32x32 grayscale buffers
+and writes them into slots of a `multiprocessing.shared_memory` slab. Only
+`(slot, offset, size)` tuples travel through the task queue and workers run
+`image_hash` directly on memoryviews of the shared buffer, so no pixel lists
+are pickled. Requires Python 3.8+.
+
+Example:
+
+    with ImageHashPool(workers=4) as pool:
+        for path, code in zip(paths, pool.content_ids(paths)):
+            print(path, code)
+"""
+import multiprocessing
+import queue
+import iscc.iscc as core
+from iscc.const import HEAD_CID_I, HEAD_CID_I_PCF
+
+
+SIDE = 32
+SLOT_SIZE = SIDE * SIDE
+DEFAULT_SLOTS = 256
+# Seconds between liveness checks of the workers while waiting for results
+POLL_INTERVAL = 0.5
+
+
+def normalize_buffer(img):
+    """32x32 grayscale bytes with the same pixels as `image_normalize`."""
+    from PIL import Image
+
+    if not isinstance(img, Image.Image):
+        img = Image.open(img)
+    return img.convert("L").resize((SIDE, SIDE), Image.BICUBIC).tobytes()
+
+
+def _worker(shm_name, tasks, results):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        for slot, offset, size in iter(tasks.get, None):
+            view = shm.buf[offset : offset + size]
+            rows = [view[i : i + SIDE] for i in range(0, size, SIDE)]
+            try:
+                results.put((slot, core.image_hash(rows), None))
+            except Exception as e:
+                results.put((slot, None, "%s: %s" % (type(e).__name__, e)))
+            finally:
+                for row in rows:
+                    row.release()
+                view.release()
+    finally:
+        shm.close()
+
+
+class ImageHashPool:
+    """Worker processes hashing normalized images from a shared memory slab.
+
+    If a worker dies (for example killed for its memory use) its task is
+    lost: waiting calls raise `RuntimeError` and the pool can only be closed.
+    """
+
+    def __init__(self, workers=None, slots=DEFAULT_SLOTS, context=None):
+        from multiprocessing import shared_memory
+
+        workers = workers or multiprocessing.cpu_count()
+        ctx = context or multiprocessing.get_context()
+        self.slots = max(slots, workers)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * SLOT_SIZE)
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.processes = [
+            ctx.Process(target=_worker, args=(self.shm.name, self.tasks, self.results))
+            for _ in range(workers)
+        ]
+        for process in self.processes:
+            process.daemon = True
+            process.start()
+        self.broken = None
+
+    def _check_workers(self):
+        if self.broken is None:
+            for process in self.processes:
+                if not process.is_alive():
+                    self.broken = "image worker %s exited with code %s" % (
+                        process.pid,
+                        process.exitcode,
+                    )
+                    break
+        if self.broken is not None:
+            raise RuntimeError(self.broken)
+
+    def _result(self):
+        """Next `(slot, digest, error)` result, raise if a worker died."""
+        while True:
+            try:
+                return self.results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+
+    def image_hashes(self, images):
+        """Yield `image_hash` digests of `images` in input order.
+
+        Images are paths, file objects or PIL images. A failing image raises
+        its exception (ValueError for hashing errors) when its turn comes.
+        """
+        self._check_workers()
+        free = list(range(self.slots))
+        busy = {}
+        done = {}
+        next_index = 0
+        images = enumerate(images)
+        exhausted = False
+        try:
+            while not exhausted or busy or done:
+                while free and not exhausted:
+                    try:
+                        index, img = next(images)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    slot = free.pop()
+                    offset = slot * SLOT_SIZE
+                    try:
+                        buffer = normalize_buffer(img)
+                    except Exception as e:
+                        free.append(slot)
+                        done[index] = e
+                        continue
+                    self.shm.buf[offset : offset + SLOT_SIZE] = buffer
+                    busy[slot] = index
+                    self.tasks.put((slot, offset, SLOT_SIZE))
+                while next_index in done:
+                    result = done.pop(next_index)
+                    next_index += 1
+                    if isinstance(result, Exception):
+                        raise result
+                    yield result
+                if busy:
+                    slot, digest, error = self._result()
+                    free.append(slot)
+                    done[busy.pop(slot)] = ValueError(error) if error else digest
+        finally:
+            # Collect outstanding results so the pool can be reused
+            if self.broken is None:
+                try:
+                    for _ in range(len(busy)):
+                        self._result()
+                except RuntimeError:
+                    pass
+
+    def content_ids(self, images, partial=False):
+        """Yield Content-ID-Image codes of `images` in input order."""
+        header = HEAD_CID_I_PCF if partial else HEAD_CID_I
+        for digest in self.image_hashes(images):
+            yield core.encode(header + digest)
+
+    def close(self, timeout=5.0):
+        if not all(process.is_alive() for process in self.processes):
+            # A killed worker may hold the task queue lock, stop the others
+            timeout = 0
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.tasks.cancel_join_thread()
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""Resumable ISCC generation for growing and locally edited files.
+
+The state objects persist everything needed to continue a computation
+without reprocessing data that is already accounted for. Save them next to
+the file, and after an append (or an edit at a known offset) resume from the
+last stable point instead of starting at byte 0.
+"""
+import base64
+import json
+import sys
+from array import array
+from io import BytesIO
+import xxhash
+import iscc.iscc as core
+from iscc.const import *
+
+
+BLOCK_SIZE = 1024 * 1024
+STATE_VERSION = 1
+
+
+def _open(data):
+    if isinstance(data, str):
+        return open(data, "rb")
+    if not hasattr(data, "read"):
+        return BytesIO(data)
+    return data
+
+
+def _pack(values):
+    arr = array("I", values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def _unpack(text):
+    arr = array("I")
+    arr.frombytes(base64.b64decode(text))
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+def _merge_minima(a, b):
+    if a is None:
+        return b
+    return [min(x, y) for x, y in zip(a, b)]
+
+
+###############################################################################
+# Data-ID                                                                     #
+###############################################################################
+
+
+class DataIdState:
+    """Resumable Data-ID with persisted content defined chunking state.
+
+    The state keeps the length and xxHash32 feature of every stable chunk,
+    the offset after the last stable chunk (the chunk counter selects the
+    GEAR1/GEAR2 parameters) and the running per-permutation minima of all
+    stable features. Bytes after the last stable chunk are kept in memory
+    only and are re-read from the file when resuming.
+
+    A chunk is stable once at least the maximum chunk size of data follows
+    its start, because `chunk_length` never looks further ahead.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.lengths = array("I")
+        self.features = array("I")
+        self.minima = None
+        self.tail = b""
+
+    @property
+    def size(self):
+        """Number of bytes consumed so far."""
+        return self.offset + len(self.tail)
+
+    def _gear(self, counter):
+        if counter < 100:
+            return GEAR1_NORM, GEAR1_MIN, GEAR1_MAX, GEAR1_MASK1, GEAR1_MASK2
+        return GEAR2_NORM, GEAR2_MIN, GEAR2_MAX, GEAR2_MASK1, GEAR2_MASK2
+
+    def _chunks(self, final=False):
+        """Yield chunks from the front of the tail (all of them if `final`)."""
+        pos, counter, tail = 0, len(self.features), self.tail
+        while True:
+            norm, min_size, max_size, mask_1, mask_2 = self._gear(counter)
+            if len(tail) - pos < (1 if final else max_size):
+                break
+            section = tail[pos : pos + max_size]
+            boundary = core.chunk_length(
+                section, norm, min_size, max_size, mask_1, mask_2
+            )
+            yield section[:boundary]
+            pos += boundary
+            counter += 1
+
+    def push(self, data):
+        """Consume bytes appended to the data."""
+        self.tail += data
+        new_features = []
+        consumed = 0
+        for chunk in self._chunks():
+            feature = xxhash.xxh32(chunk).intdigest()
+            self.lengths.append(len(chunk))
+            self.features.append(feature)
+            new_features.append(feature)
+            consumed += len(chunk)
+        if new_features:
+            self.tail = self.tail[consumed:]
+            self.offset += consumed
+            self.minima = _merge_minima(
+                self.minima, core.minimum_hash(new_features, n=64)
+            )
+        return self
+
+    def rollback(self, offset):
+        """Discard chunks that may be affected by a change at byte `offset`.
+
+        A chunk boundary depends on the byte at the boundary position, so only
+        chunks ending strictly before `offset` are kept.
+        """
+        keep, end = 0, 0
+        for length in self.lengths:
+            if end + length >= offset:
+                break
+            end += length
+            keep += 1
+        self.lengths = self.lengths[:keep]
+        self.features = self.features[:keep]
+        self.offset = end
+        self.tail = b""
+        self.minima = core.minimum_hash(self.features, n=64) if keep else None
+        return self
+
+    def verify(self, data):
+        """Check that the last stable chunk in `data` is unchanged."""
+        if not self.lengths:
+            return True
+        stream = _open(data)
+        stream.seek(self.offset - self.lengths[-1])
+        chunk = stream.read(self.lengths[-1])
+        return xxhash.xxh32(chunk).intdigest() == self.features[-1]
+
+    def resume(self, data, changed=None, block_size=BLOCK_SIZE):
+        """Continue from the last stable chunk with the current `data`.
+
+        `data` is the complete current file (path, seekable file or bytes).
+        Pass the offset of the first `changed` byte after local edits.
+        """
+        if changed is not None:
+            self.rollback(changed)
+        stream = _open(data)
+        if not self.verify(stream):
+            raise ValueError(
+                "Data changed before offset %s. Pass the changed offset." % self.offset
+            )
+        stream.seek(self.offset)
+        self.tail = b""
+        for block in iter(lambda: stream.read(block_size), b""):
+            self.push(block)
+        return self
+
+    def code(self):
+        """Data-ID of all data consumed so far."""
+        tail_features = [xxhash.xxh32(c).intdigest() for c in self._chunks(True)]
+        minhash = self.minima
+        if tail_features:
+            minhash = _merge_minima(minhash, core.minimum_hash(tail_features, n=64))
+        if minhash is None:
+            raise ValueError("Data-ID requires at least one byte of data")
+        lsb = "".join([str(x & 1) for x in minhash])
+        digest = int(lsb, 2).to_bytes(8, "big", signed=False)
+        return core.encode(HEAD_DID + digest)
+
+    def to_dict(self):
+        return {
+            "type": "data_id",
+            "version": STATE_VERSION,
+            "offset": self.offset,
+            "lengths": _pack(self.lengths),
+            "features": _pack(self.features),
+            "minima": self.minima,
+        }
+
+    @classmethod
+    def from_dict(cls, obj):
+        if obj.get("type") != "data_id" or obj.get("version") != STATE_VERSION:
+            raise ValueError("Unsupported Data-ID state")
+        state = cls()
+        state.offset = obj["offset"]
+        state.lengths = _unpack(obj["lengths"])
+        state.features = _unpack(obj["features"])
+        state.minima = obj["minima"]
+        return state
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as outf:
+            json.dump(self.to_dict(), outf)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as infile:
+            return cls.from_dict(json.load(infile))
+
+
+def data_id_resumable(path, state_path=None, changed=None):
+    """Data-ID of the file at `path`, resumed from a state file next to it.
+
+    The state is stored at `state_path` (default: `<path>.did.json`). With
+    the `changed` offset of an edit the state is rolled back to the chunks
+    before it, otherwise a state that does not match the file is discarded.
+    """
+    state_path = state_path or path + ".did.json"
+    try:
+        state = DataIdState.load(state_path)
+    except (OSError, ValueError):
+        state = DataIdState()
+    with open(path, "rb") as infile:
+        if changed is None and not state.verify(infile):
+            state = DataIdState()
+        state.resume(infile, changed)
+    state.save(state_path)
+    return state.code()
+
+
+###############################################################################
+# Instance-ID                                                                 #
+###############################################################################
+
+
+def _root(nodes):
+    """Top hash from perfect subtree roots `(level, digest)` of decreasing level.
+
+    Matches `top_hash`, which pairs the odd last node with itself per level.
+    """
+    level, node = nodes[-1]
+    for parent_level, digest in reversed(nodes[:-1]):
+        while level < parent_level:
+            node = core.hash_inner_nodes(node, node)
+            level += 1
+        node = core.hash_inner_nodes(digest, node)
+        level += 1
+    return node
+
+
+class InstanceIdState:
+    """Resumable Instance-ID with a persisted Merkle frontier.
+
+    The frontier holds the roots of the perfect subtrees over all complete
+    64000 byte leaves (at most one per level). Appending a leaf merges it into
+    the frontier in O(log n) and the top hash is derived from the frontier.
+    The trailing partial leaf is kept in memory only and re-read on resume.
+    """
+
+    leaf_size = 64000
+
+    def __init__(self):
+        self.leaves = 0
+        self.frontier = []
+        self.last_leaf = None
+        self.tail = b""
+
+    @property
+    def offset(self):
+        """End of the last complete leaf."""
+        return self.leaves * self.leaf_size
+
+    @property
+    def size(self):
+        return self.offset + len(self.tail)
+
+    @staticmethod
+    def _add(frontier, leaf):
+        level, node = 0, leaf
+        while frontier and frontier[-1][0] == level:
+            node = core.hash_inner_nodes(frontier.pop()[1], node)
+            level += 1
+        frontier.append((level, node))
+
+    def push(self, data):
+        """Consume bytes appended to the data."""
+        tail = self.tail + data
+        pos = 0
+        while len(tail) - pos >= self.leaf_size:
+            leaf = core.sha256d(b"\x00" + tail[pos : pos + self.leaf_size])
+            self._add(self.frontier, leaf)
+            self.last_leaf = leaf
+            self.leaves += 1
+            pos += self.leaf_size
+        self.tail = tail[pos:]
+        return self
+
+    def verify(self, data):
+        """Check that the last complete leaf in `data` is unchanged."""
+        if not self.leaves:
+            return True
+        stream = _open(data)
+        stream.seek(self.offset - self.leaf_size)
+        leaf = core.sha256d(b"\x00" + stream.read(self.leaf_size))
+        return leaf == self.last_leaf
+
+    def resume(self, data, block_size=BLOCK_SIZE):
+        """Continue after the last complete leaf with the current `data`."""
+        stream = _open(data)
+        if not self.verify(stream):
+            raise ValueError("Data changed before offset %s." % self.offset)
+        stream.seek(self.offset)
+        self.tail = b""
+        for block in iter(lambda: stream.read(block_size), b""):
+            self.push(block)
+        return self
+
+    def top_hash(self):
+        frontier = list(self.frontier)
+        if self.tail:
+            self._add(frontier, core.sha256d(b"\x00" + self.tail))
+        if not frontier:
+            raise ValueError("Instance-ID requires at least one byte of data")
+        return _root(frontier)
+
+    def code(self):
+        """Instance-ID and hex encoded top hash of all data consumed so far."""
+        top_hash_digest = self.top_hash()
+        code = core.encode(HEAD_IID + top_hash_digest[:8])
+        return [code, top_hash_digest.hex()]
+
+    def to_dict(self):
+        return {
+            "type": "instance_id",
+            "version": STATE_VERSION,
+            "leaves": self.leaves,
+            "frontier": [[level, node.hex()] for level, node in self.frontier],
+            "last_leaf": self.last_leaf.hex() if self.last_leaf else None,
+        }
+
+    @classmethod
+    def from_dict(cls, obj):
+        if obj.get("type") != "instance_id" or obj.get("version") != STATE_VERSION:
+            raise ValueError("Unsupported Instance-ID state")
+        state = cls()
+        state.leaves = obj["leaves"]
+        state.frontier = [(level, bytes.fromhex(n)) for level, n in obj["frontier"]]
+        state.last_leaf = bytes.fromhex(obj["last_leaf"]) if obj["last_leaf"] else None
+        return state
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as outf:
+            json.dump(self.to_dict(), outf)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as infile:
+            return cls.from_dict(json.load(infile))
+
+
+def instance_id_resumable(path, state_path=None):
+    """Instance-ID of the file at `path`, resumed from a state file next to it.
+
+    The state is stored at `state_path` (default: `<path>.iid.json`). The file
+    is expected to be append-only. Only the last complete leaf is verified, if
+    it changed the state is rebuilt from scratch.
+    """
+    state_path = state_path or path + ".iid.json"
+    try:
+        state = InstanceIdState.load(state_path)
+    except (OSError, ValueError):
+        state = InstanceIdState()
+    with open(path, "rb") as infile:
+        if not state.verify(infile):
+            state = InstanceIdState()
+        state.resume(infile)
+    state.save(state_path)
+    return state.code()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Persistent SQLite index of ISCC component codes with Hamming lookup.
+
+Every code is stored as its header byte, its 64-bit body and four indexed
+16-bit band columns. Two bodies within Hamming distance `r` have at least one
+band within `r // 4` bits (pigeonhole principle), so a radius query only
+reads the rows of the band values within that distance through the band
+indexes and verifies them with the registered `hamming(a, b)` SQL function.
+Radius queries above `MAX_BAND_RADIUS * 4 + 3` fall back to a scan.
+
+Example:
+
+    with CodeIndex("isccs.db") as index:
+        index.add_many([("a.jpg", "CYmLoqBRgV32u"), ("b.jpg", "CYmLoqBRgV32v")])
+        index.query("CYmLoqBRgV32u", radius=8)
+"""
+import sqlite3
+import threading
+from iscc.cluster import component_of, neighbor_masks, split_bands
+import iscc.iscc as core
+
+
+BANDS = split_bands(4)
+MAX_BAND_RADIUS = 2
+COMMIT_INTERVAL = 10000
+MASK64 = (1 << 64) - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS codes (
+    item TEXT NOT NULL,
+    component TEXT NOT NULL,
+    header INTEGER NOT NULL,
+    body INTEGER NOT NULL,
+    b0 INTEGER NOT NULL,
+    b1 INTEGER NOT NULL,
+    b2 INTEGER NOT NULL,
+    b3 INTEGER NOT NULL,
+    PRIMARY KEY (item, component)
+);
+CREATE INDEX IF NOT EXISTS codes_b0 ON codes (header, b0);
+CREATE INDEX IF NOT EXISTS codes_b1 ON codes (header, b1);
+CREATE INDEX IF NOT EXISTS codes_b2 ON codes (header, b2);
+CREATE INDEX IF NOT EXISTS codes_b3 ON codes (header, b3);
+"""
+
+
+def hamming(a, b):
+    """Hamming distance of two 64-bit integers (SQLite stores them signed)."""
+    if a is None or b is None:
+        return None
+    return bin((a ^ b) & MASK64).count("1")
+
+
+def _signed(body):
+    return body - (1 << 64) if body >= 1 << 63 else body
+
+
+def _row(item, code):
+    """Table row of `code`, which is a component code or a decoded digest."""
+    digest = core.decode(code) if isinstance(code, str) else code
+    component = component_of(digest[0])
+    if component is None or len(digest) != 9:
+        raise ValueError("Not a 64-bit component code: %r" % (code,))
+    body = int.from_bytes(digest[1:], "big", signed=False)
+    bands = [(body >> shift) & mask for shift, mask in BANDS]
+    return [item, component, digest[0], _signed(body)] + bands
+
+
+def _band_values(value, radius):
+    return [value] + [value ^ flip for flip in neighbor_masks(16, radius)]
+
+
+class CodeIndex:
+    """Component codes of items in an SQLite database with radius queries.
+
+    An index instance may be shared between threads of one process.
+    """
+
+    def __init__(self, path, commit_interval=COMMIT_INTERVAL):
+        self.commit_interval = commit_interval
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.create_function("hamming", 2, hamming, deterministic=True)
+        except (TypeError, sqlite3.NotSupportedError):
+            self.db.create_function("hamming", 2, hamming)
+        self.pending = 0
+
+    def add(self, item, code):
+        """Add or replace the code of `item` for the component of `code`."""
+        self.add_many([(item, code)])
+
+    def add_many(self, items):
+        """Add `(item, code)` pairs in transactions of `commit_interval` rows."""
+        batch = []
+        for item, code in items:
+            batch.append(_row(item, code))
+            if len(batch) >= self.commit_interval:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+
+    def add_result(self, result):
+        """Add the component codes of a result dict of the `iscc` tool."""
+        codes = [
+            result[c + "_id"]
+            for c in ("meta", "content", "data", "instance")
+            if c + "_id" in result
+        ]
+        self.add_many((result["path"], code) for code in codes)
+
+    def _insert(self, rows):
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO codes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.pending += len(rows)
+            if self.pending >= self.commit_interval:
+                self.commit()
+
+    def remove(self, item):
+        """Remove all codes of `item`, return the number of removed codes."""
+        with self.lock:
+            cursor = self.db.execute("DELETE FROM codes WHERE item = ?", (item,))
+            self.pending += cursor.rowcount
+            return cursor.rowcount
+
+    def get(self, item):
+        """Return the codes of `item` by component name."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT component, header, body FROM codes WHERE item = ?", (item,)
+            ).fetchall()
+        return {c: _encode(header, body) for c, header, body in rows}
+
+    def query_sql(self, code, radius):
+        """SQL statement and parameters of a radius query for `code`."""
+        row = _row(None, code)
+        header, body, bands = row[2], row[3], row[4:]
+        band_radius = radius // len(BANDS)
+        select = "SELECT item, header, body, hamming(body, ?) AS distance FROM codes"
+        params = [body]
+        if band_radius > MAX_BAND_RADIUS:
+            where = "WHERE header = ? AND hamming(body, ?) <= ?"
+            params += [header, body, radius]
+        else:
+            terms = []
+            for i, value in enumerate(bands):
+                values = _band_values(value, band_radius)
+                terms.append(
+                    "(header = ? AND b%d IN (%s))" % (i, ",".join("?" * len(values)))
+                )
+                params += [header] + values
+            where = "WHERE (%s) AND hamming(body, ?) <= ?" % " OR ".join(terms)
+            params += [body, radius]
+        return "%s %s ORDER BY distance, item" % (select, where), params
+
+    def query(self, code, radius=0, limit=None):
+        """Return `(item, code, distance)` of all codes within `radius` bits."""
+        sql, params = self.query_sql(code, radius)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [(item, _encode(h, body), d) for item, h, body, d in rows]
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM codes").fetchone()[0]
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _encode(header, body):
+    return core.encode(bytes([header]) + (body & MASK64).to_bytes(8, "big"))
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Opt-in per-step instrumentation of the ISCC generator pipelines.
+
+Instrumentation is disabled unless a callback is registered. While disabled
+every generator receives the shared `NULL_PROBE`, whose methods return
+immediately and which hands back wrapped iterables unchanged.
+
+Example:
+
+    with iscc.instrument.recording() as rec:
+        iscc.data_id("file.bin")
+    print(rec.to_prometheus())
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+_callbacks = []
+
+
+###############################################################################
+# Callback Registry                                                           #
+###############################################################################
+
+
+def register(callback):
+    """Register `callback(generator, step, seconds, nbytes, items)`."""
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+    return callback
+
+
+def unregister(callback):
+    if callback in _callbacks:
+        _callbacks.remove(callback)
+
+
+def enabled():
+    return bool(_callbacks)
+
+
+@contextmanager
+def recording(recorder=None):
+    """Collect step statistics into a `Recorder` for the duration of the block."""
+    recorder = Recorder() if recorder is None else recorder
+    register(recorder)
+    try:
+        yield recorder
+    finally:
+        unregister(recorder)
+
+
+def probe(generator):
+    """Return a probe for one invocation of `generator`."""
+    if not _callbacks:
+        return NULL_PROBE
+    return Probe(generator, tuple(_callbacks))
+
+
+###############################################################################
+# Probes                                                                      #
+###############################################################################
+
+
+class NullProbe:
+    def step(self, name, nbytes=0, items=0):
+        pass
+
+    def wrap(self, name, iterable, size=None):
+        return iterable
+
+
+NULL_PROBE = NullProbe()
+
+
+class Probe:
+    """Measure exclusive wall time of the numbered steps of one generator call.
+
+    `step` closes the step that started at the previous mark. Lazy stages are
+    measured with `wrap`, which times every `next()` on the wrapped iterable.
+    Time spent inside nested wrapped stages is subtracted from the enclosing
+    stage, so the recorded steps add up to the total runtime.
+    """
+
+    clock = time.perf_counter
+
+    def __init__(self, generator, callbacks):
+        self.generator = generator
+        self.callbacks = callbacks
+        self.nested = 0.0
+        self.mark = self.clock()
+        self.mark_nested = 0.0
+        self.pending = {}
+
+    def step(self, name, nbytes=0, items=0):
+        now = self.clock()
+        elapsed = now - self.mark - (self.nested - self.mark_nested)
+        for stage, (seconds, stage_bytes, stage_items) in self.pending.items():
+            self.emit(stage, seconds, stage_bytes, stage_items)
+        self.pending = {}
+        self.emit(name, elapsed, nbytes, items)
+        self.mark = self.clock()
+        self.mark_nested = self.nested
+
+    def wrap(self, name, iterable, size=None):
+        clock = self.clock
+        it = iter(iterable)
+        while True:
+            start, nested = clock(), self.nested
+            try:
+                item = next(it)
+            except StopIteration:
+                elapsed = clock() - start
+                stats = self.pending.setdefault(name, [0.0, 0, 0])
+                stats[0] += elapsed - (self.nested - nested)
+                self.nested = nested + elapsed
+                return
+            elapsed = clock() - start
+            stats = self.pending.setdefault(name, [0.0, 0, 0])
+            stats[0] += elapsed - (self.nested - nested)
+            stats[1] += size(item) if size is not None else 0
+            stats[2] += 1
+            self.nested = nested + elapsed
+            yield item
+
+    def emit(self, step, seconds, nbytes, items):
+        for callback in self.callbacks:
+            callback(self.generator, step, seconds, nbytes, items)
+
+
+###############################################################################
+# Recorder                                                                    #
+###############################################################################
+
+
+class Recorder:
+    """Aggregate calls, seconds, bytes and items per generator step."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def __call__(self, generator, step, seconds, nbytes=0, items=0):
+        with self.lock:
+            entry = self.stats.setdefault((generator, step), [0, 0.0, 0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += nbytes
+            entry[3] += items
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def to_dict(self):
+        result = {}
+        with self.lock:
+            for (generator, step), (calls, seconds, nbytes, items) in sorted(
+                self.stats.items()
+            ):
+                result.setdefault(generator, {})[step] = {
+                    "calls": calls,
+                    "seconds": seconds,
+                    "bytes": nbytes,
+                    "items": items,
+                }
+        return result
+
+    def dedup_stats(self):
+        """Feature deduplication per generator with an estimate of time saved.
+
+        `ratio` is the share of features dropped as repeats before
+        `minimum_hash`, `seconds_saved` extrapolates the recorded minhash time
+        per unique feature to the dropped ones and `seconds` is the cost of
+        the deduplication itself.
+        """
+        result = {}
+        for generator, steps in self.to_dict().items():
+            if "dedup" not in steps or "features" not in steps:
+                continue
+            total = steps["features"]["items"]
+            unique = steps["dedup"]["items"]
+            minhash = steps.get("minhash", {}).get("seconds", 0.0)
+            result[generator] = {
+                "features": total,
+                "unique": unique,
+                "ratio": (total - unique) / total if total else 0.0,
+                "seconds": steps["dedup"]["seconds"],
+                "seconds_saved": (total - unique) * minhash / unique if unique else 0.0,
+            }
+        return result
+
+    def to_json(self, **kwargs):
+        import json
+
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="iscc"):
+        metrics = (
+            ("calls", "counter", "Number of recorded step executions"),
+            ("seconds", "counter", "Wall time spent per generator step"),
+            ("bytes", "counter", "Bytes processed per generator step"),
+            ("items", "counter", "Items produced per generator step"),
+        )
+        data = self.to_dict()
+        lines = []
+        for field, kind, description in metrics:
+            name = "%s_step_%s_total" % (prefix, field)
+            lines.append("# HELP %s %s" % (name, description))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for generator, steps in data.items():
+                for step, values in steps.items():
+                    lines.append(
+                        '%s{generator="%s",step="%s"} %s'
+                        % (name, generator, step, values[field])
+                    )
+        return "\n".join(lines) + "\n"
@@ -1,16 +1,26 @@
 # -*- coding: utf-8 -*-
 """ISCC Reference Implementation"""
+from array import array
 from binascii import hexlify
-from statistics import median
+import codecs
+from functools import lru_cache
+from itertools import islice
 import math
+import sys
 from io import BytesIO
 from hashlib import sha256
 import unicodedata
-from PIL import Image
 import xxhash
+from iscc import instrument
 from iscc.const import *
 
 
+MINHASH_BATCH_SIZE = 4096
+FEATURE_DEDUP_SIZE = 1 << 16
+TEXT_BLOCK_SIZE = 1024 * 1024
+AUDIO_BLOCK_SIZE = 8192
+
+
 ###############################################################################
 # Top-Level functions for generating ISCC Component Codes                     #
 ###############################################################################
@@ -18,31 +28,38 @@ from iscc.const import *
 
 def meta_id(title, extra=""):
 
+    probe = instrument.probe("meta_id")
+
     # 1. Normalization
     title_norm = text_normalize(title, keep_ws=True)
     extra_norm = text_normalize(extra, keep_ws=True)
+    probe.step("normalize", items=2)
 
     # 2. Trimming
     title_trimmed = text_trim(title_norm)
     extra_trimmed = text_trim(extra_norm)
+    probe.step("trim", items=2)
 
     # 3. Concatenate
     concat = "\u0020".join((title_trimmed, extra_trimmed)).strip()
 
     # 4. Create a list of n-grams
-    n_grams = sliding_window(concat, width=WINDOW_SIZE_MID)
+    n_grams = probe.wrap("ngrams", sliding_window(concat, width=WINDOW_SIZE_MID))
 
     # 5. Encode n-grams and create xxhash64-digest
     hash_digests = [xxhash.xxh64(s.encode("utf-8")).digest() for s in n_grams]
+    probe.step("features", items=len(hash_digests))
 
     # 6. Apply similarity_hash
     simhash_digest = similarity_hash(hash_digests)
+    probe.step("simhash", items=len(hash_digests))
 
     # 7. Prepend header-byte
     meta_id_digest = HEAD_MID + simhash_digest
 
     # 8. Encode with base58_iscc
     meta_id = encode(meta_id_digest)
+    probe.step("encode")
 
     # 9. Return encoded Meta-ID, trimmed `title` and trimmed `extra` data.
     return [meta_id, title_trimmed, extra_trimmed]
@@ -50,17 +67,70 @@ def meta_id(title, extra=""):
 
 def content_id_text(text, partial=False):
 
+    probe = instrument.probe("content_id_text")
+
     # 1. Normalize (drop whitespace)
     text = text_normalize(text, keep_ws=False)
+    probe.step("normalize", items=len(text))
 
     # 2. Create 13 character n-grams
     ngrams = ("\u0020".join(l) for l in sliding_window(text, WINDOW_SIZE_CID_T))
+    ngrams = probe.wrap("ngrams", ngrams)
+
+    # 3. Create 32-bit features with xxHash32
+    features = (xxhash.xxh32(s.encode("utf-8")).intdigest() for s in ngrams)
+    features = probe.wrap("features", features)
+
+    # 4. Drop repeated features and apply minimum_hash
+    features = probe.wrap("dedup", unique_features(features))
+    minhash = minimum_hash(features, n=64)
+    probe.step("minhash")
+
+    # 5. Collect least significant bits of first 64 minhash signatures
+    lsb = "".join([str(x & 1) for x in minhash])
+
+    # 6. Create 64-bit digests
+    digest = int(lsb, 2).to_bytes(8, "big", signed=False)
+
+    # 7. Prepend component header
+    if partial:
+        content_id_text_digest = HEAD_CID_T_PCF + digest
+    else:
+        content_id_text_digest = HEAD_CID_T + digest
+
+    # 8. Encode and return
+    code = encode(content_id_text_digest)
+    probe.step("encode")
+    return code
+
+
+def content_id_text_stream(stream, partial=False, block_size=TEXT_BLOCK_SIZE):
+    """Content-ID-Text of UTF-8 text read in blocks with bounded memory.
+
+    `stream` is a file path, a binary or text file object or an iterable of
+    str or bytes blocks. The result is identical to `content_id_text`.
+    """
+
+    probe = instrument.probe("content_id_text")
+
+    # 1. Normalize text segments split at context free boundaries
+    segments = text_segments(stream, block_size)
+    segments = (text_normalize(s, keep_ws=False) for s in segments)
+    segments = probe.wrap("normalize", segments)
+
+    # 2. Create 13 character n-grams across segment boundaries
+    windows = sliding_window_stream(segments, WINDOW_SIZE_CID_T)
+    ngrams = ("\u0020".join(l) for l in windows)
+    ngrams = probe.wrap("ngrams", ngrams)
 
     # 3. Create 32-bit features with xxHash32
     features = (xxhash.xxh32(s.encode("utf-8")).intdigest() for s in ngrams)
+    features = probe.wrap("features", features)
 
-    # 4. Apply minimum_hash
+    # 4. Drop repeated features and apply minimum_hash
+    features = probe.wrap("dedup", unique_features(features))
     minhash = minimum_hash(features, n=64)
+    probe.step("minhash")
 
     # 5. Collect least significant bits of first 64 minhash signatures
     lsb = "".join([str(x & 1) for x in minhash])
@@ -75,16 +145,22 @@ def content_id_text(text, partial=False):
         content_id_text_digest = HEAD_CID_T + digest
 
     # 8. Encode and return
-    return encode(content_id_text_digest)
+    code = encode(content_id_text_digest)
+    probe.step("encode")
+    return code
 
 
 def content_id_image(img, partial=False):
 
+    probe = instrument.probe("content_id_image")
+
     # 1. Normalize image to 2-dimensional pixel array
     pixels = image_normalize(img)
+    probe.step("normalize")
 
     # 2. Calculate image hash
     hash_digest = image_hash(pixels)
+    probe.step("image_hash")
 
     # 3. Prepend the 1-byte component header
     if partial:
@@ -93,19 +169,116 @@ def content_id_image(img, partial=False):
         content_id_image_digest = HEAD_CID_I + hash_digest
 
     # 4. Encode and return
-    return encode(content_id_image_digest)
+    code = encode(content_id_image_digest)
+    probe.step("encode")
+    return code
+
+
+def content_id_video(
+    frames, partial=False, step=FRAME_STEP_CID_V, threshold=SCENE_THRESHOLD_CID_V
+):
+
+    probe = instrument.probe("content_id_video")
+
+    counts = None
+    previous, digest, weight = None, None, 0
+
+    # 1. Sample every `step`-th frame and normalize to 32x32 grayscale
+    sampled = (frame_normalize(f) for i, f in enumerate(frames) if i % step == 0)
+    for pixels in probe.wrap("normalize", sampled):
+
+        # 2. Count frames that barely differ from the last hashed frame
+        if previous is not None and frame_difference(previous, pixels) <= threshold:
+            weight += 1
+            continue
+
+        # 3. Add the last frame hash weighted by its number of frames
+        if digest is not None:
+            counts = similarity_hash_update(counts, digest, weight)
+
+        # 4. Calculate image hash of the new scene
+        digest, previous, weight = image_hash(pixels), pixels, 1
+        probe.step("image_hash")
+
+    if digest is None:
+        raise ValueError("Content-ID-Video requires at least one frame")
+    counts = similarity_hash_update(counts, digest, weight)
+
+    # 5. Weighted similarity hash of all frame hashes
+    simhash_digest = similarity_hash_finalize(counts)
+    probe.step("simhash", items=counts[-1])
+
+    # 6. Prepend component header
+    if partial:
+        content_id_video_digest = HEAD_CID_V_PCF + simhash_digest
+    else:
+        content_id_video_digest = HEAD_CID_V + simhash_digest
+
+    # 7. Encode and return
+    code = encode(content_id_video_digest)
+    probe.step("encode")
+    return code
+
+
+def content_id_audio(audio, partial=False, sample_rate=None):
+
+    probe = instrument.probe("content_id_audio")
+
+    # 1. Decode mono PCM sample blocks (WAV file or raw samples)
+    if sample_rate is None:
+        blocks, sample_rate = audio_samples(audio)
+    else:
+        samples = iter(audio)
+        blocks = iter(lambda: list(islice(samples, AUDIO_BLOCK_SIZE)), [])
+    blocks = probe.wrap("decode", blocks, size=len)
+
+    # 2. Downsample and cut into fixed windows
+    factor = max(1, sample_rate // SAMPLE_RATE_CID_A)
+    windows = audio_windows(blocks, factor, WINDOW_SIZE_CID_A)
+    windows = probe.wrap("window", windows)
+
+    # 3. DCT per window
+    spectra = probe.wrap("dct", (dct(window) for window in windows))
+
+    # 4. Create 64-bit band energy difference digests
+    bands = audio_bands(sample_rate / factor)
+    digests = probe.wrap("features", audio_features(spectra, bands))
+
+    # 5. Similarity hash of all window digests (constant memory)
+    counts = None
+    for digest in digests:
+        counts = similarity_hash_update(counts, digest)
+    if counts is None:
+        raise ValueError("Content-ID-Audio requires at least one sample")
+    simhash_digest = similarity_hash_finalize(counts)
+    probe.step("simhash", items=counts[-1])
+
+    # 6. Prepend component header
+    if partial:
+        content_id_audio_digest = HEAD_CID_A_PCF + simhash_digest
+    else:
+        content_id_audio_digest = HEAD_CID_A + simhash_digest
+
+    # 7. Encode and return
+    code = encode(content_id_audio_digest)
+    probe.step("encode")
+    return code
 
 
 def content_id_mixed(cids, partial=False):
 
+    probe = instrument.probe("content_id_mixed")
+
     # 1. Decode CIDs
-    decoded = (decode(code) for code in cids)
+    decoded = probe.wrap("decode", (decode(code) for code in cids))
 
     # 2. Extract first 8-bytes
     truncated = [data[:8] for data in decoded]
+    probe.step("truncate", items=len(truncated))
 
     # 3. Apply Similarity hash
     simhash_digest = similarity_hash(truncated)
+    probe.step("simhash", items=len(truncated))
 
     # 4. Prepend component header
     if partial:
@@ -114,16 +287,24 @@ def content_id_mixed(cids, partial=False):
         content_id_mixed_digest = HEAD_CID_M + simhash_digest
 
     # 5. Encode and return
-    return encode(content_id_mixed_digest)
+    code = encode(content_id_mixed_digest)
+    probe.step("encode")
+    return code
 
 
 def data_id(data):
 
+    probe = instrument.probe("data_id")
+
     # 1. & 2. XxHash32 over CDC-Chunks
-    features = (xxhash.xxh32(chunk).intdigest() for chunk in data_chunks(data))
+    chunks = probe.wrap("chunk", data_chunks(data), size=len)
+    features = (xxhash.xxh32(chunk).intdigest() for chunk in chunks)
+    features = probe.wrap("features", features)
 
-    # 3. Apply minimum_hash
+    # 3. Drop repeated features and apply minimum_hash
+    features = probe.wrap("dedup", unique_features(features))
     minhash = minimum_hash(features, n=64)
+    probe.step("minhash")
 
     # 4. Collect least significant bits
     lsb = "".join([str(x & 1) for x in minhash])
@@ -135,11 +316,15 @@ def data_id(data):
     data_id_digest = HEAD_DID + digest
 
     # 7. Encode and return
-    return encode(data_id_digest)
+    code = encode(data_id_digest)
+    probe.step("encode")
+    return code
 
 
 def instance_id(data):
 
+    probe = instrument.probe("instance_id")
+
     if isinstance(data, str):
         data = open(data, "rb")
 
@@ -148,18 +333,18 @@ def instance_id(data):
 
     leaf_node_digests = []
 
-    while True:
-        chunk = data.read(64000)
-        if chunk:
-            leaf_node_digests.append(sha256d(b"\x00" + chunk))
-        else:
-            break
+    chunks = probe.wrap("read", iter(lambda: data.read(64000), b""), size=len)
+    for chunk in chunks:
+        leaf_node_digests.append(sha256d(b"\x00" + chunk))
+    probe.step("leaf_hash", items=len(leaf_node_digests))
 
     top_hash_digest = top_hash(leaf_node_digests)
+    probe.step("top_hash")
     instance_id_digest = HEAD_IID + top_hash_digest[:8]
 
     code = encode(instance_id_digest)
     hex_hash = hexlify(top_hash_digest).decode("ascii")
+    probe.step("encode")
 
     return [code, hex_hash]
 
@@ -211,8 +396,99 @@ def text_normalize(text, keep_ws=False):
     return recombined
 
 
+def text_segments(stream, block_size=TEXT_BLOCK_SIZE):
+    """Split streamed text into segments that can be normalized separately.
+
+    Segments end before a character that follows whitespace and starts with
+    a starter that no normalization step combines with preceding characters
+    (see `_segment_start`), between two such letters of any script that are
+    no final sigma context (see `_segment_letter`), or between two ASCII
+    alphanumerics or CJK ideographs. Lower casing (final sigma), Unicode
+    normalization and the removal of whitespace never combine characters
+    across such a boundary.
+    """
+    opened = isinstance(stream, str)
+    if opened:
+        stream = open(stream, "rb")
+    try:
+        if hasattr(stream, "read"):
+            blocks = iter(lambda: stream.read(block_size), stream.read(0))
+        else:
+            blocks = stream
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        # Pieces of the pending segment, joined once a boundary is found
+        pending = []
+        for block in blocks:
+            if isinstance(block, bytes):
+                block = decoder.decode(block)
+            if not block:
+                continue
+            before = pending[-1][-1] if pending else ""
+            for i in range(len(block) - 1, -1 if pending else 0, -1):
+                if _segment_boundary(block[i - 1] if i else before, block[i]):
+                    pending.append(block[:i])
+                    yield "".join(pending)
+                    pending = [block[i:]]
+                    break
+            else:
+                pending.append(block)
+        yield "".join(pending) + decoder.decode(b"", final=True)
+    finally:
+        if opened:
+            stream.close()
+
+
+def _segment_boundary(before, char):
+    if before.isspace():
+        return _segment_start(char)
+    if _segment_safe(before) and _segment_safe(char):
+        return True
+    return _segment_letter(before) and _segment_letter(char)
+
+
+def _segment_safe(char):
+    return (char < "\x80" and char.isalnum()) or "\u4e00" <= char <= "\u9fff"
+
+
+@lru_cache(maxsize=4096)
+def _segment_letter(char):
+    """Whether a boundary next to `char` keeps the final sigma context intact.
+
+    Modifier letters (Lm) are case-ignorable and capital sigma lower cases
+    depending on the following letters, both are excluded.
+    """
+    return (
+        char != "\u03a3"
+        and unicodedata.category(char) in ("Lu", "Ll", "Lt", "Lo")
+        and _segment_start(char)
+    )
+
+
+@lru_cache(maxsize=4096)
+def _segment_start(char):
+    """Whether text normalization never joins `char` with preceding characters.
+
+    The first character of the lower cased and decomposed `char` must survive
+    the filter and its compatibility decomposition must start with a starter
+    (combining class 0) that does not compose with a preceding character.
+    Only marks (removed by the filter) and Hangul vowel and trailing
+    consonant jamo compose backwards.
+    """
+    first = unicodedata.normalize("NFD", char.lower())[:1]
+    if not first or first.isspace() or unicodedata.category(first) in UNICODE_FILTER:
+        return False
+    first = unicodedata.normalize("NFKD", first)[0]
+    return (
+        unicodedata.combining(first) == 0
+        and not unicodedata.category(first).startswith("M")
+        and not "\u1160" <= first <= "\u11ff"
+    )
+
+
 def image_normalize(img):
 
+    from PIL import Image
+
     if not isinstance(img, Image.Image):
         img = Image.open(img)
 
@@ -228,6 +504,112 @@ def image_normalize(img):
     return pixels
 
 
+def frame_normalize(frame):
+    """Normalize a PIL image or a `(width, height, buffer)` 8-bit grayscale frame."""
+
+    if isinstance(frame, tuple):
+        from PIL import Image
+
+        width, height, buffer = frame
+        frame = Image.frombytes("L", (width, height), bytes(buffer))
+    return image_normalize(frame)
+
+
+def frame_difference(a, b):
+    """Mean absolute difference of two normalized 32x32 frames."""
+
+    diff = 0
+    for row_a, row_b in zip(a, b):
+        for x, y in zip(row_a, row_b):
+            diff += abs(x - y)
+    return diff / 1024.0
+
+
+def audio_samples(audio):
+    """Open WAV audio and return `(mono sample blocks, sample rate)`."""
+
+    import wave
+
+    reader = audio if hasattr(audio, "readframes") else wave.open(audio, "rb")
+    return _wave_blocks(reader), reader.getframerate()
+
+
+def _wave_blocks(reader):
+    channels, width = reader.getnchannels(), reader.getsampwidth()
+    try:
+        while True:
+            frames = reader.readframes(AUDIO_BLOCK_SIZE)
+            if not frames:
+                break
+            if width == 3:
+                frames = b"".join(
+                    b"\x00" + frames[i : i + 3] for i in range(0, len(frames), 3)
+                )
+            samples = array({1: "B", 2: "h", 3: "i", 4: "i"}[width], frames)
+            if sys.byteorder == "big" and width > 1:
+                samples.byteswap()
+            if width == 1:
+                samples = [s - 128 for s in samples]
+            elif width == 3:
+                samples = [s >> 8 for s in samples]
+            if channels > 1:
+                samples = [
+                    sum(samples[i : i + channels]) / channels
+                    for i in range(0, len(samples), channels)
+                ]
+            yield list(samples)
+    finally:
+        reader.close()
+
+
+def audio_windows(blocks, factor, size):
+    """Average groups of `factor` samples and yield windows of `size` samples.
+
+    A trailing partial window is padded with silence.
+    """
+
+    pending, window = [], []
+    for block in blocks:
+        pending.extend(block)
+        n = len(pending) - len(pending) % factor
+        if factor == 1:
+            window.extend(pending)
+        else:
+            groups = range(0, n, factor)
+            window.extend(sum(pending[i : i + factor]) / factor for i in groups)
+        del pending[:n]
+        for start in range(0, len(window) - size + 1, size):
+            yield window[start : start + size]
+        del window[: len(window) - len(window) % size]
+    if pending:
+        window.append(sum(pending) / len(pending))
+    if window:
+        yield window + [0] * (size - len(window))
+
+
+def audio_bands(sample_rate, size=WINDOW_SIZE_CID_A, n_bands=BANDS_CID_A):
+    """DCT coefficient ranges of log spaced bands within BAND_RANGE_CID_A."""
+
+    low, high = BAND_RANGE_CID_A
+    edges = []
+    for k in range(n_bands + 1):
+        hz = low * (high / low) ** (k / n_bands)
+        edge = min(int(round(hz * 2 * size / sample_rate)), size)
+        edges.append(max(edge, edges[-1] + 1) if edges else edge)
+    return [(edges[k], edges[k + 1]) for k in range(n_bands)]
+
+
+def audio_features(spectra, bands):
+    """64-bit digests comparing the energies of adjacent bands per window."""
+
+    for spectrum in spectra:
+        energies = [sum(c * c for c in spectrum[lo:hi]) for lo, hi in bands]
+        feature = 0
+        for b in range(len(bands) - 1):
+            feature = (feature << 1) | (energies[b] > energies[b + 1])
+        yield feature.to_bytes((len(bands) - 1) // 8, "big", signed=False)
+
+
 ###############################################################################
 # Feature Hashing                                                             #
 ###############################################################################
@@ -236,40 +618,109 @@ def image_normalize(img):
 def similarity_hash(hash_digests):
 
     n_bytes = len(hash_digests[0])
-    n_bits = n_bytes * 8
-    vector = [0] * n_bits
+    counts = None
 
     for digest in hash_digests:
 
         assert len(digest) == n_bytes
-        h = int.from_bytes(digest, "big", signed=False)
+        counts = similarity_hash_update(counts, digest)
+
+    return similarity_hash_finalize(counts)
 
-        for i in range(n_bits):
-            vector[i] += h & 1
-            h >>= 1
 
-    minfeatures = len(hash_digests) * 1.0 / 2
+def similarity_hash_update(counts, digest, weight=1):
+    """Add `digest` with `weight` to running bit counts (None to start).
+
+    The counts hold the weight of set bits per bit position (least
+    significant first) followed by the total weight.
+    """
+    n_bits = len(digest) * 8
+    if counts is None:
+        counts = [0] * (n_bits + 1)
+    h = int.from_bytes(digest, "big", signed=False)
+    for i in range(n_bits):
+        counts[i] += weight * (h & 1)
+        h >>= 1
+    counts[n_bits] += weight
+    return counts
+
+
+def similarity_hash_finalize(counts):
+    """Similarity hash digest of bits set in at least half the total weight."""
+    n_bits = len(counts) - 1
+    minfeatures = counts[n_bits] * 1.0 / 2
     shash = 0
 
     for i in range(n_bits):
-        shash |= int(vector[i] >= minfeatures) << i
+        shash |= int(counts[i] >= minfeatures) << i
+
+    return shash.to_bytes(n_bits // 8, "big", signed=False)
+
+
+def similarity_hash_batch(digest_lists):
 
-    return shash.to_bytes(n_bytes, "big", signed=False)
+    return [similarity_hash(hash_digests) for hash_digests in digest_lists]
 
 
 def minimum_hash(features, n=64):
-    features = list(features)
+    features = iter(features)
+    minima = None
+    while True:
+        batch = _feature_batch(features)
+        if not batch:
+            break
+        minima = minimum_hash_update(minima, batch, n)
+    if minima is None:
+        raise ValueError("min() arg is an empty sequence")
+    return minima
+
+
+def _feature_batch(features):
+    """Next batch of features as unsigned 64-bit integers.
+
+    Features are used modulo 2**64 by the permutations, so negative or larger
+    integers are masked to the same value instead of overflowing the array.
+    """
+    batch = list(islice(features, MINHASH_BATCH_SIZE))
+    try:
+        return array("Q", batch)
+    except OverflowError:
+        return array("Q", [f & ((1 << 64) - 1) for f in batch])
+
+
+def unique_features(features, size=FEATURE_DEDUP_SIZE):
+    """Yield features that were not seen among the last `size` unique ones.
+
+    The minimum hash is invariant to duplicates, so repeated n-grams or chunks
+    can skip the permutations. The set is cleared when full to bound memory.
+    """
+    seen = set()
+    for feature in features:
+        if feature not in seen:
+            if len(seen) >= size:
+                seen.clear()
+            seen.add(feature)
+            yield feature
+
+
+def minimum_hash_update(minima, features, n=64):
+    """Fold a batch of features into running minima (None to start)."""
     max_int64 = (1 << 64) - 1
     mersenne_prime = (1 << 61) - 1
     max_hash = (1 << 32) - 1
-    return [
+    batch = [
         min((((a * f + b) & max_int64) % mersenne_prime) & max_hash for f in features)
         for a, b in MINHASH_PERMUTATIONS[:n]
     ]
+    if minima is None:
+        return batch
+    return [min(x, y) for x, y in zip(minima, batch)]
 
 
 def image_hash(pixels):
 
+    from statistics import median
+
     # 1. DCT per row
     dct_row_lists = []
     for pixel_list in pixels:
@@ -393,6 +844,22 @@ def sliding_window(seq, width):
     return (seq[i : i + width] for i in idx)
 
 
+def sliding_window_stream(segments, width):
+    """Sliding window over the concatenation of string `segments`."""
+
+    assert width >= 2, "Sliding window width must be 2 or bigger."
+    carry = ""
+    emitted = False
+    for segment in segments:
+        seq = carry + segment
+        for i in range(len(seq) - width + 1):
+            yield seq[i : i + width]
+            emitted = True
+        carry = seq[-(width - 1) :]
+    if not emitted:
+        yield carry
+
+
 def dct(values_list):
     """
     Discrete cosine transform algorithm by Project Nayuki. (MIT License)
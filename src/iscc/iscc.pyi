@@ -12,7 +12,23 @@ def meta_id(
     title: Union[str, bytes], extra: Union[str, bytes] = ""
 ) -> Tuple[str, str, str]: ...
 def content_id_text(text: Union[str, bytes], partial=False) -> str: ...
+def content_id_text_stream(
+    stream: Union[str, BinaryIO, TextIO, Iterable[Union[str, bytes]]],
+    partial: bool = False,
+    block_size: int = ...,
+) -> str: ...
 def content_id_image(img: IMG, partial: bool = False) -> str: ...
+def content_id_video(
+    frames: Iterable[Union[Image.Image, Tuple[int, int, ByteString]]],
+    partial: bool = False,
+    step: int = ...,
+    threshold: float = ...,
+) -> str: ...
+def content_id_audio(
+    audio: Union[str, BinaryIO, Iterable[float]],
+    partial: bool = False,
+    sample_rate: Optional[int] = None,
+) -> str: ...
 def content_id_mixed(cids: List[str], partial: bool = False) -> str: ...
 def data_id(data: B) -> str: ...
 def instance_id(data: B) -> Tuple[str, str]: ...
@@ -21,11 +37,40 @@ def instance_id(data: B) -> Tuple[str, str]: ...
 def text_pre_normalize(text: TEXT) -> str: ...
 def text_trim(text: str) -> str: ...
 def text_normalize(text: str, keep_ws: bool = False) -> str: ...
+def text_segments(
+    stream: Union[str, BinaryIO, TextIO, Iterable[Union[str, bytes]]],
+    block_size: int = ...,
+) -> Iterator[str]: ...
 def image_normalize(img: IMG) -> List[List[int]]: ...
+def frame_normalize(
+    frame: Union[Image.Image, Tuple[int, int, ByteString]]
+) -> List[List[int]]: ...
+def audio_samples(audio: Union[str, BinaryIO]) -> Tuple[Iterator[List[float]], int]: ...
+def audio_windows(
+    blocks: Iterable[List[float]], factor: int, size: int
+) -> Iterator[List[float]]: ...
+def audio_bands(
+    sample_rate: float, size: int = ..., n_bands: int = ...
+) -> List[Tuple[int, int]]: ...
+def audio_features(
+    spectra: Iterable[List[float]], bands: List[Tuple[int, int]]
+) -> Iterator[bytes]: ...
+def frame_difference(a: List[List[int]], b: List[List[int]]) -> float: ...
 
 # Feature Hashing
 def similarity_hash(hash_digests: Sequence[ByteString]) -> bytes: ...
+def similarity_hash_update(
+    counts: Optional[List[int]], digest: ByteString, weight: int = 1
+) -> List[int]: ...
+def similarity_hash_finalize(counts: List[int]) -> bytes: ...
+def similarity_hash_batch(
+    digest_lists: Sequence[Sequence[ByteString]],
+) -> List[bytes]: ...
 def minimum_hash(features: Iterable[int], n: int = 64) -> List[int]: ...
+def minimum_hash_update(
+    minima: Optional[List[int]], features: Sequence[int], n: int = 64
+) -> List[int]: ...
+def unique_features(features: Iterable[int], size: int = ...) -> Iterator[int]: ...
 def image_hash(pixels: List[List[int]]) -> bytes: ...
 
 # Content-ID-Image utils
@@ -44,6 +89,7 @@ def hash_inner_nodes(a: bytes, b: bytes) -> bytes: ...
 
 # Common untility functions
 def sliding_window(seq: Sequence, width: int) -> List: ...
+def sliding_window_stream(segments: Iterable[str], width: int) -> Iterator[str]: ...
 def distance(a: Union[int, str, bytes], b: Union[int, str, bytes]) -> int: ...
 def encode(digest: bytes) -> str: ...
 def decode(code: str) -> bytes: ...
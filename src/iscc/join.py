@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Similarity join of 64-bit ISCC component codes.
+
+Streams all pairs within a Hamming distance `radius` between two catalogs
+(or within one catalog) without a nested loop over `distance()`. The code
+bodies are split into `m` disjoint bit blocks. If two codes differ in at most
+`radius` bits, at least one block differs in at most `radius // m` bits
+(pigeonhole principle); with `m = radius + 1` one block is identical. For
+every block the right catalog is sorted by that block (the permuted sort:
+the block rotated to the top bits) and each left code looks up the sorted
+run of its block value and its neighbors within the block radius. A pair is
+reported only by the first block that finds it, so results are unique.
+
+Work is split into tasks of one block and one slice of the left catalog and
+runs in worker processes. Pairs are yielded as `(left, right, distance)`
+index triples as tasks complete. Only codes with equal headers are paired.
+
+Usage: python -m iscc.join archive.jsonl partner.jsonl -c content -r 8
+"""
+import argparse
+import json
+import sys
+from array import array
+from bisect import bisect_left
+from multiprocessing import Pool
+from iscc.cluster import neighbor_masks, plan_bands, split_bands
+import iscc.iscc as core
+
+
+DEFAULT_RADIUS = 8
+SLICE_SIZE = 65536
+# Largest block radius, limits the neighbor block values probed per code
+MAX_BLOCK_RADIUS = 2
+INDEX_BITS = 32
+INDEX_MASK = (1 << INDEX_BITS) - 1
+ARROW_EXTENSIONS = (".arrow", ".feather", ".parquet", ".parq")
+
+_state = {}
+
+
+def bodies(codes):
+    """Decode component codes (or 9-byte digests) into `(headers, bodies)`."""
+    headers, values = array("B"), array("Q")
+    for code in codes:
+        digest = core.decode(code) if isinstance(code, str) else code
+        headers.append(digest[0])
+        values.append(int.from_bytes(digest[1:9], "big", signed=False))
+    return headers, values
+
+
+def _arrays(catalog):
+    """Copy memoryview catalogs (see `arrow.read_catalog`) for worker processes."""
+    if catalog is None or not isinstance(catalog[1], memoryview):
+        return catalog
+    headers, values = array("B"), array("Q")
+    headers.frombytes(catalog[0])
+    values.frombytes(catalog[1])
+    return headers, values
+
+
+def min_blocks(radius):
+    """Fewest blocks for which `radius // blocks <= MAX_BLOCK_RADIUS`."""
+    return radius // (MAX_BLOCK_RADIUS + 1) + 1
+
+
+def sorted_keys(catalog, band):
+    """Sort keys `header | block value | index` of `catalog` for one block."""
+    headers, values = catalog
+    shift, mask = band
+    return sorted(
+        (((headers[i] << 64) | ((values[i] >> shift) & mask)) << INDEX_BITS) | i
+        for i in range(len(values))
+    )
+
+
+def _init(left, right, radius, bands):
+    _state.clear()
+    _state.update(left=left, right=right, radius=radius, bands=bands, keys={})
+
+
+def _keys(block):
+    """Sorted keys of the right catalog for `block`, one block at a time."""
+    keys = _state["keys"]
+    if block not in keys:
+        keys.clear()
+        right = _state["right"] or _state["left"]
+        keys[block] = sorted_keys(right, _state["bands"][block])
+    return keys[block]
+
+
+def _found_before(xor, block, bands, block_radius):
+    for shift, mask in bands[:block]:
+        if bin((xor >> shift) & mask).count("1") <= block_radius:
+            return True
+    return False
+
+
+def _join_slice(task):
+    block, start, stop = task
+    radius, bands = _state["radius"], _state["bands"]
+    self_join = _state["right"] is None
+    left_headers, left_values = _state["left"]
+    right_values = (_state["left"] if self_join else _state["right"])[1]
+    shift, mask = bands[block]
+    block_radius = radius // len(bands)
+    flips = [0] + neighbor_masks(mask.bit_length(), block_radius)
+    keys = _keys(block)
+    n_keys = len(keys)
+    pairs = []
+    for i in range(start, stop):
+        body = left_values[i]
+        value = (body >> shift) & mask
+        for flip in flips:
+            prefix = (left_headers[i] << 64) | (value ^ flip)
+            k = bisect_left(keys, prefix << INDEX_BITS)
+            while k < n_keys and keys[k] >> INDEX_BITS == prefix:
+                j = keys[k] & INDEX_MASK
+                k += 1
+                if self_join and j <= i:
+                    continue
+                xor = body ^ right_values[j]
+                distance = bin(xor).count("1")
+                if distance <= radius and not _found_before(
+                    xor, block, bands, block_radius
+                ):
+                    pairs.append((i, j, distance))
+    return pairs
+
+
+def join(
+    left,
+    right=None,
+    radius=DEFAULT_RADIUS,
+    workers=1,
+    blocks=None,
+    slice_size=SLICE_SIZE,
+):
+    """Yield `(i, j, distance)` for all pairs within `radius` bits.
+
+    `left` and `right` are sequences of component codes or `bodies()`
+    tuples. Without `right` the self-join yields every pair `i < j` of
+    `left` once. `blocks` defaults to the lowest cost estimate of
+    `cluster.plan_bands`, raised to `min_blocks(radius)` to bound the probes
+    per code and capped at `radius + 1`. Pairs of a task are yielded
+    together, tasks complete in any order.
+    """
+    if not isinstance(left, tuple):
+        left = bodies(left)
+    if right is not None and not isinstance(right, tuple):
+        right = bodies(right)
+    n_left = len(left[1])
+    n_right = n_left if right is None else len(right[1])
+    if len(left[1]) > INDEX_MASK or n_right > INDEX_MASK:
+        raise ValueError("Catalogs are limited to %d codes" % INDEX_MASK)
+    if not n_left or not n_right:
+        return
+    blocks = max(blocks or plan_bands(n_right, radius), min_blocks(radius))
+    bands = split_bands(min(blocks, radius + 1))
+    tasks = [
+        (block, start, min(start + slice_size, n_left))
+        for block in range(len(bands))
+        for start in range(0, n_left, slice_size)
+    ]
+    if workers == 1:
+        _init(left, right, radius, bands)
+        try:
+            for task in tasks:
+                yield from _join_slice(task)
+        finally:
+            _state.clear()
+        return
+    initargs = (_arrays(left), _arrays(right), radius, bands)
+    pool = Pool(workers, initializer=_init, initargs=initargs)
+    try:
+        for pairs in pool.imap_unordered(_join_slice, tasks):
+            yield from pairs
+    finally:
+        pool.terminate()
+
+
+def read_codes(path, component):
+    """Read `(path, code)` of one component from iscc JSON Lines results."""
+    key = component + "_id"
+    items = []
+    infile = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in infile:
+            result = json.loads(line)
+            if key in result:
+                items.append((result.get("path"), result[key]))
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+    return items
+
+
+def read_catalog(path, component):
+    """Return `(paths, bodies)` of one component from iscc results.
+
+    Reads JSON Lines or files written by `iscc.arrow` (Arrow IPC or Parquet).
+    """
+    if path.lower().endswith(ARROW_EXTENSIONS):
+        from iscc import arrow
+
+        paths, catalog = arrow.read_catalog(path, component)
+        return paths.to_pylist(), catalog
+    items = read_codes(path, component)
+    return [item_path for item_path, _ in items], bodies(c for _, c in items)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m iscc.join",
+        description="Join iscc JSON Lines results by component Hamming distance.",
+    )
+    parser.add_argument("left", help="JSON Lines, Arrow or Parquet (- for stdin)")
+    parser.add_argument("right", nargs="?", help="same formats (default: self)")
+    parser.add_argument(
+        "-c",
+        "--component",
+        choices=("meta", "content", "data", "instance"),
+        default="content",
+        help="component to join on (default: content)",
+    )
+    parser.add_argument(
+        "-r", "--radius", type=int, default=DEFAULT_RADIUS, help="max distance"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None, help="worker processes"
+    )
+    args = parser.parse_args(argv)
+
+    left_paths, left = read_catalog(args.left, args.component)
+    right_paths, right = left_paths, None
+    if args.right:
+        right_paths, right = read_catalog(args.right, args.component)
+    pairs = join(left, right, args.radius, args.workers)
+    count = 0
+    for i, j, distance in pairs:
+        record = {"left": left_paths[i], "right": right_paths[j], "distance": distance}
+        print(json.dumps(record, ensure_ascii=False))
+        count += 1
+    sys.stderr.write("%d pairs\n" % count)
+
+
+if __name__ == "__main__":
+    main()
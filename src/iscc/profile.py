@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Profile ISCC generation for a single file.
+
+Runs every selected component once with the step instrumentation for wall
+time and pipeline steps, then again under cProfile and tracemalloc for peak
+memory, the top functions by cumulative time and the top allocation sites.
+Optionally samples the call stack in another run and writes collapsed stacks
+(`frame;frame;frame count` lines) for flamegraph tools.
+
+Usage: python -m iscc.profile FILE [-c data,instance] [--collapsed out.txt]
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from os.path import basename
+from iscc import cli, instrument
+
+
+DEFAULT_TOP = 15
+SAMPLE_INTERVAL = 0.001
+
+
+class StackSampler:
+    """Sample the stack of one thread periodically from a background thread.
+
+    Sampling runs between `start()` and `pause()` calls until `stop()`.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._active = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._active.wait(0.1):
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    "%s (%s:%d)"
+                    % (code.co_name, basename(code.co_filename), code.co_firstlineno)
+                )
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        """Start sampling (the thread is started once)."""
+        if not self._thread.is_alive():
+            self._thread.start()
+        self._active.set()
+        return self
+
+    def pause(self):
+        self._active.clear()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as outf:
+            for stack, count in sorted(self.counts.items()):
+                outf.write("%s %d\n" % (stack, count))
+
+
+def profile_file(path, components=cli.COMPONENTS, top=DEFAULT_TOP, sampler=None):
+    """Profile the selected components for the file at `path`, return a dict.
+
+    Wall time and steps come from a clean run of each component. The function
+    and allocation tables and peak memory come from a separate run under
+    cProfile and tracemalloc, whose overhead would distort the timings; its
+    wall time is reported as `profiled_seconds`. With a `sampler` the stacks
+    are sampled in a third run without tracing.
+    """
+    profiler = cProfile.Profile()
+    report = {"path": path, "size": os.path.getsize(path), "components": {}}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.stop()
+    try:
+        for component in components:
+            with instrument.recording() as recorder:
+                start = time.perf_counter()
+                result = cli.generate(path, (component,))
+                seconds = time.perf_counter() - start
+            if sampler is not None:
+                sampler.start()
+                cli.generate(path, (component,))
+                sampler.pause()
+            tracemalloc.start()
+            start = time.perf_counter()
+            profiler.enable()
+            cli.generate(path, (component,))
+            profiler.disable()
+            profiled_seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            report["components"][component] = {
+                "seconds": seconds,
+                "profiled_seconds": profiled_seconds,
+                "peak_bytes": peak,
+                "result": {
+                    k: v for k, v in result.items() if k not in ("path", "size")
+                },
+                "steps": recorder.to_dict(),
+                "allocations": _allocations(snapshot, top),
+            }
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if tracing:
+            tracemalloc.start()
+    report["functions"] = _functions(profiler, top)
+    return report
+
+
+def _functions(profiler, top):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), entry in stats.stats.items():
+        calls, _, tottime, cumtime = entry[:4]
+        rows.append(
+            {
+                "function": "%s (%s:%d)" % (name, basename(filename), line),
+                "calls": calls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            }
+        )
+    rows.sort(key=lambda r: -r["cumtime"])
+    return rows[:top]
+
+
+def _allocations(snapshot, top):
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [
+        {
+            "location": "%s:%d"
+            % (basename(s.traceback[0].filename), s.traceback[0].lineno),
+            "bytes": s.size,
+            "count": s.count,
+        }
+        for s in snapshot.statistics("lineno")[:top]
+    ]
+
+
+def format_report(report):
+    lines = ["%s (%d bytes)" % (report["path"], report["size"]), ""]
+    lines.append(
+        "%-10s %10s %10s %12s  steps" % ("component", "seconds", "profiled", "peak MB")
+    )
+    for component, entry in report["components"].items():
+        steps = ", ".join(
+            "%s %.3fs" % (step, values["seconds"])
+            for generator in entry["steps"].values()
+            for step, values in generator.items()
+        )
+        lines.append(
+            "%-10s %10.3f %10.3f %12.2f  %s"
+            % (
+                component,
+                entry["seconds"],
+                entry["profiled_seconds"],
+                entry["peak_bytes"] / 1024**2,
+                steps,
+            )
+        )
+        if "error" in entry["result"]:
+            lines.append("           error: %s" % entry["result"]["error"])
+    lines += ["", "%-60s %8s %10s %10s" % ("function", "calls", "tottime", "cumtime")]
+    for row in report["functions"]:
+        lines.append(
+            "%-60s %8d %10.3f %10.3f"
+            % (row["function"][:60], row["calls"], row["tottime"], row["cumtime"])
+        )
+    for component, entry in report["components"].items():
+        lines += ["", "top allocations (%s)" % component]
+        for row in entry["allocations"]:
+            lines.append(
+                "  %-50s %10.1f KB %8d"
+                % (row["location"], row["bytes"] / 1024, row["count"])
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m iscc.profile",
+        description="Profile ISCC generation for a file.",
+    )
+    parser.add_argument("path", help="file to profile")
+    parser.add_argument(
+        "-c",
+        "--components",
+        type=cli.parse_components,
+        default=cli.COMPONENTS,
+        help="comma separated: %s (default: all)" % ",".join(cli.COMPONENTS),
+    )
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="rows per table")
+    parser.add_argument("--collapsed", help="write sampled collapsed stacks to file")
+    parser.add_argument(
+        "--interval", type=float, default=SAMPLE_INTERVAL, help="sampling interval"
+    )
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args(argv)
+
+    sampler = StackSampler(interval=args.interval) if args.collapsed else None
+    report = profile_file(args.path, args.components, args.top, sampler)
+    if sampler is not None:
+        sampler.write(args.collapsed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
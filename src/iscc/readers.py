@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Binary readers for the bulk generators.
+
+`ReadAheadReader` wraps a file and reads fixed size blocks in a background
+thread into a bounded queue, so the next blocks are in flight while the
+current ones are chunked and hashed. Blocking reads and `sha256` release the
+GIL, so disk (or network) latency overlaps with CPU work. The reader is a
+drop-in for the `read(size)` calls of `data_chunks` and `instance_id`:
+
+    with ReadAheadReader("video.mp4", depth=4) as reader:
+        code, tophash = iscc.instance_id(reader)
+
+`AdvisedFile` keeps bulk scans from evicting the page cache of other
+processes: it announces sequential access with `posix_fadvise`, prefetches
+the next window (WILLNEED) and drops the pages it has consumed (DONTNEED)
+while reading and on close, except for windows that were cached before.
+Without `posix_fadvise` it is a plain file.
+"""
+import os
+import queue
+import threading
+
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_DEPTH = 4
+# Bytes prefetched (WILLNEED) ahead of and dropped (DONTNEED) behind the reader
+DROP_INTERVAL = 8 * 1024 * 1024
+
+
+class AdvisedFile:
+    """Binary file that sends page cache hints for a single sequential read.
+
+    Only pages this reader pulled into the cache are dropped: before a window
+    of `drop_interval` bytes is prefetched, a non-blocking one byte read
+    (`preadv` with `RWF_NOWAIT`) checks whether it was already cached, and
+    cached windows are left alone. Where that check is not available every
+    window counts as not cached.
+    """
+
+    def __init__(self, path, drop_interval=DROP_INTERVAL):
+        self.raw = open(path, "rb")
+        self.drop_interval = drop_interval
+        self.bytes_read = 0
+        self._dropped = 0
+        self._advise(0, 0, "POSIX_FADV_SEQUENTIAL")
+        self._cached = self._resident(0)
+        self._advise(0, drop_interval, "POSIX_FADV_WILLNEED")
+
+    def _advise(self, offset, length, advice):
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(self.raw.fileno(), offset, length, getattr(os, advice))
+            except OSError:
+                pass
+
+    def _resident(self, offset):
+        """Whether the page at `offset` is in the page cache (False if unknown)."""
+        if not hasattr(os, "RWF_NOWAIT"):
+            return False
+        try:
+            return (
+                os.preadv(self.raw.fileno(), [bytearray(1)], offset, os.RWF_NOWAIT) > 0
+            )
+        except OSError:
+            return False
+
+    def _release(self, end):
+        """Drop the current window up to `end` unless it was cached before."""
+        if not self._cached and end > self._dropped:
+            self._advise(self._dropped, end - self._dropped, "POSIX_FADV_DONTNEED")
+        self._dropped = end
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        if self.bytes_read - self._dropped >= self.drop_interval:
+            self._release(self.bytes_read)
+            self._cached = self._resident(self.bytes_read)
+            self._advise(self.bytes_read, self.drop_interval, "POSIX_FADV_WILLNEED")
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        """Drop the pages of the last window (read and prefetched) and close."""
+        if not self.raw.closed:
+            self._release(max(self.bytes_read, self._dropped + self.drop_interval))
+            self.raw.close()
+
+    @property
+    def closed(self):
+        return self.raw.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReadAheadReader:
+    """Read-only file wrapper that keeps up to `depth` blocks read ahead.
+
+    `file` is a path or a binary file object. The file is closed with the
+    reader if it was opened here or if `closefd` is True.
+    """
+
+    def __init__(
+        self, file, block_size=DEFAULT_BLOCK_SIZE, depth=DEFAULT_DEPTH, closefd=False
+    ):
+        if block_size <= 0 or depth <= 0:
+            raise ValueError("block_size and depth must be positive")
+        self.owned = closefd or isinstance(file, str)
+        self.raw = open(file, "rb") if isinstance(file, str) else file
+        self.block_size = block_size
+        self.depth = depth
+        self.bytes_read = 0
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._block = b""
+        self._offset = 0
+        self._eof = False
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _fill(self):
+        try:
+            while not self._stop.is_set():
+                block = self.raw.read(self.block_size)
+                self._put(block)
+                if not block:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _next_block(self):
+        if self._eof:
+            return False
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            self._eof = True
+            raise item
+        if not item:
+            self._eof = True
+            return False
+        self.bytes_read += len(item)
+        self._block, self._offset = item, 0
+        return True
+
+    def read(self, size=-1):
+        """Read up to `size` bytes (all remaining bytes if negative)."""
+        if size is None:
+            size = -1
+        parts = []
+        while size != 0:
+            if self._offset >= len(self._block) and not self._next_block():
+                break
+            end = len(self._block)
+            if size > 0:
+                end = min(end, self._offset + size)
+                size -= end - self._offset
+            parts.append(self._block[self._offset : end])
+            self._offset = end
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        """Stop the reader thread and close the file if it was opened here."""
+        self._stop.set()
+        self._thread.join()
+        self._eof = True
+        if self.owned:
+            self.raw.close()
+
+    @property
+    def closed(self):
+        return self._stop.is_set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_file(path, readahead=0, block_size=DEFAULT_BLOCK_SIZE, fadvise=False):
+    """Open `path` for binary reading.
+
+    With `readahead` that many blocks are kept in flight, with `fadvise` the
+    file is read through an `AdvisedFile`. Both count `bytes_read`.
+    """
+    if not fadvise:
+        if readahead:
+            return ReadAheadReader(path, block_size, readahead)
+        return open(path, "rb")
+    file = AdvisedFile(path)
+    if readahead:
+        return ReadAheadReader(file, block_size, readahead, closefd=True)
+    return file
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""Sharded similarity search service for ISCC Component Codes"""
+import argparse
+import heapq
+import itertools
+import json
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from multiprocessing import Pipe, Process
+from urllib.parse import parse_qs, urlparse
+import iscc.iscc as core
+
+
+SHARD_TIMEOUT = 60.0
+
+###############################################################################
+# Shard Workers                                                               #
+###############################################################################
+
+
+def load_shard(source):
+    """Load `(header, body, code, key)` entries from a file path or iterable.
+
+    Entries are component codes, optionally followed by a tab separated key.
+    """
+
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as infile:
+            return load_shard(line.strip() for line in infile)
+
+    entries = []
+    for item in source:
+        if not item:
+            continue
+        if isinstance(item, str):
+            code, _, key = item.partition("\t")
+        else:
+            code, key = item
+        digest = core.decode(code)
+        body = int.from_bytes(digest[1:], "big", signed=False)
+        entries.append((digest[:1], body, code, key or None))
+    return entries
+
+
+def search_shard(entries, code, k=10, max_distance=64):
+    """Return the `k` nearest entries as sorted `(distance, code, key)` tuples."""
+
+    digest = core.decode(code)
+    header = digest[:1]
+    body = int.from_bytes(digest[1:], "big", signed=False)
+    candidates = (
+        (core.distance(body, ebody), ecode, ekey)
+        for eheader, ebody, ecode, ekey in entries
+        if eheader == header
+    )
+    return heapq.nsmallest(
+        k, (c for c in candidates if c[0] <= max_distance), key=lambda c: c[:2]
+    )
+
+
+def shard_worker(conn, source):
+
+    entries = load_shard(source)
+    conn.send(len(entries))
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        request_id, code, k, max_distance = msg
+        start = time.perf_counter()
+        try:
+            result = search_shard(entries, code, k, max_distance)
+        except Exception as e:
+            conn.send((request_id, "error", repr(e), time.perf_counter() - start))
+        else:
+            conn.send((request_id, "ok", result, time.perf_counter() - start))
+    conn.close()
+
+
+class ShardError(RuntimeError):
+    """A shard worker died or did not answer in time."""
+
+
+class ShardConnection:
+    """Pipe to one shard worker shared by concurrent queries.
+
+    Requests are tagged with an id and a receiver thread hands each reply to
+    the query waiting for it, so queries of different threads are pipelined
+    instead of holding the pipe for their whole duration. If the worker dies
+    all waiting and later queries fail with `ShardError`.
+    """
+
+    def __init__(self, source):
+        self.conn, child = Pipe()
+        self.proc = Process(target=shard_worker, args=(child, source), daemon=True)
+        self.proc.start()
+        child.close()
+        self.size = 0
+        self.error = None
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.ids = itertools.count()
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+
+    def start(self):
+        """Wait until the shard is loaded and start receiving replies."""
+        try:
+            self.size = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise ShardError("shard worker failed to load: %r" % e)
+        self.receiver.start()
+
+    def _receive(self):
+        try:
+            while True:
+                request_id, status, payload, elapsed = self.conn.recv()
+                with self.lock:
+                    waiter = self.pending.pop(request_id, None)
+                if waiter is not None:
+                    waiter[1] = (status, payload, elapsed)
+                    waiter[0].set()
+        except (EOFError, OSError):
+            self._fail("shard worker exited")
+
+    def _fail(self, message):
+        with self.lock:
+            self.error = self.error or message
+            pending, self.pending = self.pending, {}
+        for waiter in pending.values():
+            waiter[1] = ShardError(message)
+            waiter[0].set()
+
+    def submit(self, code, k, max_distance):
+        """Send a query, return a waiter for `result()`."""
+        with self.lock:
+            if self.error is not None:
+                raise ShardError(self.error)
+            request_id = next(self.ids)
+            # [reply event, reply or ShardError, request id]
+            waiter = [threading.Event(), None, request_id]
+            self.pending[request_id] = waiter
+        try:
+            with self.send_lock:
+                self.conn.send((request_id, code, k, max_distance))
+        except (OSError, ValueError) as e:
+            self._fail("shard worker unreachable: %r" % e)
+            raise ShardError(self.error)
+        return waiter
+
+    def result(self, waiter, timeout=None):
+        """Return `(status, payload, seconds)` of a submitted query."""
+        if not waiter[0].wait(timeout):
+            with self.lock:
+                self.pending.pop(waiter[2], None)
+            raise ShardError("shard worker timed out")
+        if isinstance(waiter[1], Exception):
+            raise waiter[1]
+        return waiter[1]
+
+    @property
+    def alive(self):
+        return self.error is None and self.proc.is_alive()
+
+    def close(self, timeout=5.0):
+        try:
+            with self.send_lock:
+                self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        if self.receiver.is_alive():
+            self.receiver.join(timeout)
+        self.conn.close()
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join()
+
+
+###############################################################################
+# Metrics                                                                     #
+###############################################################################
+
+
+class LatencyMetrics:
+    """Thread safe latency counters with percentiles over a sliding window."""
+
+    def __init__(self, window=1024):
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def observe(self, seconds, error=False):
+        with self.lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total += seconds
+            self.samples.append(seconds)
+
+    def summary(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count, errors, total = self.count, self.errors, self.total
+
+        def pct(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            "count": count,
+            "errors": errors,
+            "mean_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": pct(0.50),
+            "p90_ms": pct(0.90),
+            "p99_ms": pct(0.99),
+            "max_ms": samples[-1] * 1000 if samples else 0.0,
+        }
+
+
+###############################################################################
+# Sharded Index                                                               #
+###############################################################################
+
+
+class ShardedIndex:
+    """Fan out similarity queries to one worker process per shard.
+
+    Each shard is either a path to a file with one code per line or an
+    iterable of codes (or `(code, key)` tuples). Queries from concurrent
+    threads are pipelined to the workers. A query fails with `ShardError` if
+    a worker died or did not answer within `timeout` seconds.
+    """
+
+    def __init__(self, shards, timeout=SHARD_TIMEOUT):
+        self.timeout = timeout
+        self.shards = [ShardConnection(source) for source in shards]
+        self.metrics = LatencyMetrics()
+        self.shard_metrics = [LatencyMetrics() for _ in self.shards]
+        try:
+            for shard in self.shards:
+                shard.start()
+        except ShardError:
+            self.close()
+            raise
+        self.sizes = [shard.size for shard in self.shards]
+
+    @classmethod
+    def partition(cls, codes, n_shards=2):
+        """Distribute codes round-robin across `n_shards` workers."""
+        buckets = [[] for _ in range(n_shards)]
+        for i, code in enumerate(codes):
+            buckets[i % n_shards].append(code)
+        return cls(buckets)
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def search(self, code, k=10, max_distance=64):
+        start = time.perf_counter()
+        try:
+            waiters = [shard.submit(code, k, max_distance) for shard in self.shards]
+            replies = [
+                shard.result(waiter, self.timeout)
+                for shard, waiter in zip(self.shards, waiters)
+            ]
+        except ShardError:
+            self.metrics.observe(time.perf_counter() - start, error=True)
+            raise
+        results, error = [], None
+        for (status, payload, elapsed), metrics in zip(replies, self.shard_metrics):
+            metrics.observe(elapsed, error=status != "ok")
+            if status == "ok":
+                results.append(payload)
+            else:
+                error = payload
+        if error is not None:
+            self.metrics.observe(time.perf_counter() - start, error=True)
+            raise ValueError(error)
+        merged = list(heapq.merge(*results, key=lambda c: c[:2]))[:k]
+        self.metrics.observe(time.perf_counter() - start)
+        return [dict(distance=d, code=c, key=key) for d, c, key in merged]
+
+    def unavailable(self):
+        """Return the numbers of shards whose worker is gone."""
+        return [i for i, shard in enumerate(self.shards) if not shard.alive]
+
+    def stats(self):
+        return {
+            "entries": len(self),
+            "shards": [
+                dict(entries=size, **m.summary())
+                for size, m in zip(self.sizes, self.shard_metrics)
+            ],
+            "queries": self.metrics.summary(),
+        }
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+###############################################################################
+# HTTP Endpoint                                                               #
+###############################################################################
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """GET /search?code=<code>&k=<int>&distance=<int>, /metrics and /health"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        index = self.server.index
+        if url.path == "/search":
+            params = parse_qs(url.query)
+            try:
+                code = params["code"][0]
+                k = int(params.get("k", ["10"])[0])
+                max_distance = int(params.get("distance", ["64"])[0])
+                results = index.search(code, k, max_distance)
+            except (KeyError, ValueError) as e:
+                return self.reply(400, {"error": str(e)})
+            except ShardError as e:
+                return self.reply(503, {"error": str(e)})
+            except Exception as e:
+                return self.reply(500, {"error": repr(e)})
+            return self.reply(200, {"code": code, "results": results})
+        if url.path == "/metrics":
+            return self.reply(200, index.stats())
+        if url.path == "/health":
+            unavailable = index.unavailable()
+            if unavailable:
+                return self.reply(503, {"status": "unavailable", "shards": unavailable})
+            return self.reply(200, {"status": "ok", "entries": len(index)})
+        return self.reply(404, {"error": "not found"})
+
+    def reply(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SearchServer(socketserver.ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, index, host="127.0.0.1", port=8000):
+        self.index = index
+        HTTPServer.__init__(self, (host, port), SearchHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ISCC similarity search.")
+    parser.add_argument("shards", nargs="+", help="files with one code per line")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    with ShardedIndex(args.shards) as index:
+        server = SearchServer(index, args.host, args.port)
+        print("Serving %s codes on http://%s:%s" % (len(index), args.host, args.port))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""Keep ISCC results current while files change.
+
+Watches directory trees with Linux inotify (through ctypes) or, where that
+is not available, by polling file sizes and modification times. Events are
+debounced per file: a file is processed once it was quiet for `debounce`
+seconds, or at the latest `max_delay` seconds after its first event, so
+write bursts cause one generation with bounded latency. Changed files are
+processed with `cli.generate` and results are passed to a sink, a callable
+taking a result dict. Deleted files produce `{"path": ..., "deleted": True}`.
+
+Usage: python -m iscc.watch [-c data,instance] [--index isccs.db] PATH ...
+"""
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+from os.path import isdir, join
+from iscc import cli
+
+
+DEBOUNCE = 1.0
+MAX_DELAY = 10.0
+POLL_INTERVAL = 2.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+EVENT = struct.Struct("iIII")
+
+CHANGED = "changed"
+DELETED = "deleted"
+
+
+def iter_files(root):
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            yield join(dirpath, name)
+
+
+###############################################################################
+# Event Sources                                                               #
+###############################################################################
+
+
+class Inotify:
+    """Recursive inotify watch of directory trees (Linux only).
+
+    The known files are tracked, so a directory that is deleted or moved out
+    of the trees is reported as deletion of every file below it.
+    """
+
+    def __init__(self, roots):
+        name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = list(roots)
+        self.dirs = {}
+        self.files = set()
+        for root in self.roots:
+            self.add_tree(root)
+
+    def add_tree(self, root):
+        """Watch `root` and its subdirectories, return the files found."""
+        files = []
+        for dirpath, dirs, names in os.walk(root):
+            try:
+                self.add_watch(dirpath)
+            except OSError:
+                if dirpath in self.roots:
+                    raise
+                continue
+            files.extend(join(dirpath, name) for name in names)
+        self.files.update(files)
+        return files
+
+    def remove_tree(self, path):
+        """Stop watching `path` and below, return the known files below it."""
+        prefix = join(path, "")
+        for wd, dirpath in list(self.dirs.items()):
+            if dirpath == path or dirpath.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+        files = sorted(p for p in self.files if p.startswith(prefix))
+        self.files.difference_update(files)
+        return files
+
+    def rescan(self):
+        """Events for the current trees compared to the known files."""
+        known, self.files = self.files, set()
+        for root in self.roots:
+            self.add_tree(root)
+        events = [(DELETED, p) for p in sorted(known - self.files)]
+        return events + [(CHANGED, p) for p in sorted(self.files)]
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed", path)
+        self.dirs[wd] = path
+
+    def poll(self, timeout):
+        """Return `(kind, path)` events, waiting at most `timeout` seconds."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, rescan and treat every file as changed
+                events.extend(self.rescan())
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if wd not in self.dirs:
+                continue
+            path = join(self.dirs[wd], name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    events.extend((CHANGED, p) for p in self.add_tree(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    events.extend((DELETED, p) for p in self.remove_tree(path))
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.files.discard(path)
+                events.append((DELETED, path))
+            else:
+                self.files.add(path)
+                events.append((CHANGED, path))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Poller:
+    """Detect changes by comparing size and mtime snapshots of the trees."""
+
+    def __init__(self, roots, interval=POLL_INTERVAL):
+        self.roots = list(roots)
+        self.interval = interval
+        self.snapshot = self.scan()
+        self.next_scan = time.monotonic() + interval
+
+    def scan(self):
+        snapshot = {}
+        for root in self.roots:
+            for path in iter_files(root):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def poll(self, timeout):
+        """Return `(kind, path)` events, waiting at most `timeout` seconds."""
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(wait, 0))
+        self.next_scan = time.monotonic() + self.interval
+        snapshot = self.scan()
+        events = [(DELETED, p) for p in self.snapshot if p not in snapshot]
+        events += [
+            (CHANGED, p) for p, v in snapshot.items() if self.snapshot.get(p) != v
+        ]
+        self.snapshot = snapshot
+        return events
+
+    def close(self):
+        pass
+
+
+def event_source(roots, poll_interval=None):
+    """Inotify watch of `roots`, or a `Poller` if inotify is not available."""
+    if poll_interval is None and sys.platform.startswith("linux"):
+        try:
+            return Inotify(roots)
+        except (OSError, AttributeError):
+            pass
+    return Poller(roots, poll_interval or POLL_INTERVAL)
+
+
+###############################################################################
+# Debouncing and Processing                                                   #
+###############################################################################
+
+
+class Debouncer:
+    """Collapse bursts of events per path into one with bounded delay."""
+
+    def __init__(self, delay=DEBOUNCE, max_delay=MAX_DELAY):
+        self.delay = delay
+        self.max_delay = max_delay
+        # path -> [first event time, last event time, kind]
+        self.pending = {}
+
+    def push(self, kind, path, now):
+        entry = self.pending.setdefault(path, [now, now, kind])
+        entry[1:] = [now, kind]
+
+    def _due(self, entry):
+        first, last, _ = entry
+        return min(last + self.delay, first + self.max_delay)
+
+    def ready(self, now):
+        """Pop and return `(kind, path)` of all paths that are due."""
+        due = [p for p, entry in self.pending.items() if self._due(entry) <= now]
+        return [(self.pending.pop(p)[2], p) for p in sorted(due)]
+
+    def timeout(self, now, default):
+        """Seconds until the next path is due (at most `default`)."""
+        if not self.pending:
+            return default
+        due = min(self._due(entry) for entry in self.pending.values())
+        return min(max(due - now, 0.0), default)
+
+
+class Watcher:
+    """Generate ISCCs for changed files under `roots` and pass them to `sink`."""
+
+    def __init__(
+        self,
+        roots,
+        components=cli.DEFAULT_COMPONENTS,
+        sink=None,
+        debounce=DEBOUNCE,
+        max_delay=MAX_DELAY,
+        poll_interval=None,
+    ):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.components = components
+        self.sink = sink or JsonLinesSink()
+        self.debouncer = Debouncer(debounce, max_delay)
+        self.source = event_source(self.roots, poll_interval)
+        self.processed = 0
+        # Files passed to the sink and not deleted since
+        self.known = set()
+
+    def scan(self):
+        """Queue all existing files (initial full generation)."""
+        now = time.monotonic()
+        for root in self.roots:
+            for path in iter_files(root) if isdir(root) else [root]:
+                self.debouncer.push(CHANGED, path, now - self.debouncer.max_delay)
+
+    def step(self, timeout=1.0):
+        """Wait for events up to `timeout` seconds and process due files."""
+        now = time.monotonic()
+        for kind, path in self.source.poll(self.debouncer.timeout(now, timeout)):
+            self.debouncer.push(kind, path, time.monotonic())
+        results = []
+        for kind, path in self.debouncer.ready(time.monotonic()):
+            if kind == CHANGED and os.path.isfile(path):
+                self.known.add(path)
+                results.append(cli.generate(path, self.components))
+            elif kind == DELETED or not os.path.exists(path):
+                results.extend({"path": p, "deleted": True} for p in self.deleted(path))
+        for result in results:
+            self.sink(result)
+            self.processed += 1
+        return results
+
+    def deleted(self, path):
+        """Deleted files for a deleted file or directory `path`."""
+        prefix = join(path, "")
+        paths = sorted(p for p in self.known if p.startswith(prefix))
+        if not paths or path in self.known:
+            paths.insert(0, path)
+        self.known.difference_update(paths)
+        return paths
+
+    def run(self, stop=None):
+        """Process events until the `stop` event is set (or forever)."""
+        while stop is None or not stop.is_set():
+            self.step()
+
+    def close(self):
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonLinesSink:
+    """Write results as JSON Lines to a text stream."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def __call__(self, result):
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        stream.flush()
+
+
+class IndexSink:
+    """Keep an `index.CodeIndex` current, replacing the codes of changed files."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __call__(self, result):
+        if "error" in result:
+            return
+        self.index.remove(result["path"])
+        if not result.get("deleted"):
+            self.index.add_result(result)
+        self.index.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m iscc.watch",
+        description="Watch directories and generate ISCCs for changed files.",
+    )
+    parser.add_argument("paths", nargs="+", help="directories to watch")
+    parser.add_argument(
+        "-c",
+        "--components",
+        type=cli.parse_components,
+        default=cli.DEFAULT_COMPONENTS,
+        help="comma separated: %s (default: %s)"
+        % (",".join(cli.COMPONENTS), ",".join(cli.DEFAULT_COMPONENTS)),
+    )
+    parser.add_argument("--index", help="keep an SQLite code index current")
+    parser.add_argument(
+        "--debounce", type=float, default=DEBOUNCE, help="quiet seconds per file"
+    )
+    parser.add_argument(
+        "--max-delay", type=float, default=MAX_DELAY, help="max seconds per file"
+    )
+    parser.add_argument(
+        "--poll", type=float, default=None, help="poll every N seconds (no inotify)"
+    )
+    parser.add_argument(
+        "--scan", action="store_true", help="process existing files on start"
+    )
+    args = parser.parse_args(argv)
+
+    index = None
+    sink = JsonLinesSink()
+    if args.index:
+        from iscc.index import CodeIndex
+
+        index = CodeIndex(args.index)
+        sink = IndexSink(index)
+    watcher = Watcher(
+        args.paths, args.components, sink, args.debounce, args.max_delay, args.poll
+    )
+    sys.stderr.write("watching with %s\n" % type(watcher.source).__name__)
+    try:
+        if args.scan:
+            watcher.scan()
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        if index is not None:
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
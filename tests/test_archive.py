@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import tarfile
+import zipfile
+import pytest
+from iscc.archive import is_archive, iter_members
+
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+IMG = os.path.join(TESTS_PATH, "file_image_cat.jpg")
+
+MEMBERS = [("docs/hello.txt", b"Hello World"), ("data.bin", bytes(range(256)) * 500)]
+
+
+def make_zip(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("docs/", b"")
+        for name, data in MEMBERS:
+            zf.writestr(name, data)
+
+
+def make_tar(path, mode="w:gz"):
+    with tarfile.open(path, mode) as tf:
+        for name, data in MEMBERS:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.buffer.readinto(b)
+
+
+def read_members(archive):
+    return [(name, size, stream.read()) for name, size, stream in iter_members(archive)]
+
+
+@pytest.mark.parametrize("ext", [".zip", ".tar.gz", ".tar"])
+def test_iter_members(tmpdir, ext):
+    path = str(tmpdir.join("bundle" + ext))
+    if ext == ".zip":
+        make_zip(path)
+    else:
+        make_tar(path, "w" if ext == ".tar" else "w:gz")
+    assert read_members(path) == [(n, len(d), d) for n, d in MEMBERS]
+
+
+def test_iter_members_unseekable_tar(tmpdir):
+    path = str(tmpdir.join("bundle.tar.gz"))
+    make_tar(path)
+    with open(path, "rb") as infile:
+        stream = Unseekable(infile.read())
+    assert read_members(stream) == [(n, len(d), d) for n, d in MEMBERS]
+
+
+def test_is_archive():
+    assert is_archive("a/b.ZIP")
+    assert is_archive("b.tar.gz")
+    assert not is_archive("b.gz")
+    assert not is_archive(IMG)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+import iscc
+from iscc import join
+
+pa = pytest.importorskip("pyarrow")
+arrow = pytest.importorskip("iscc.arrow")
+
+
+def results(n):
+    items = []
+    for i in range(n):
+        data = ("item %d" % i).encode("utf-8")
+        instance_id, tophash = iscc.instance_id(data)
+        items.append(
+            {
+                "path": "file%d.txt" % i,
+                "size": len(data),
+                "content_id": iscc.content_id_text(data.decode("utf-8")),
+                "data_id": iscc.data_id(data),
+                "instance_id": instance_id,
+                "tophash": tophash,
+            }
+        )
+    items.append({"path": "broken.bin", "error": "OSError: unreadable"})
+    return items
+
+
+def test_to_record_batch():
+    items = results(3)
+    batch = arrow.to_record_batch(items)
+    assert batch.schema == arrow.SCHEMA
+    assert batch.num_rows == 4
+    digest = iscc.decode(items[0]["data_id"])
+    assert batch.column(batch.schema.get_field_index("data_header"))[0].as_py() == 32
+    body = batch.column(batch.schema.get_field_index("data_body"))[0].as_py()
+    assert body == int.from_bytes(digest[1:], "big")
+    tophash = batch.column(batch.schema.get_field_index("tophash"))[0].as_py()
+    assert tophash.hex() == items[0]["tophash"]
+    assert batch.column(batch.schema.get_field_index("meta_body")).null_count == 4
+
+
+@pytest.mark.parametrize("name", ["results.arrow", "results.parquet"])
+def test_writer_roundtrip(tmpdir, name):
+    path = str(tmpdir.join(name))
+    items = results(10)
+    with arrow.ArrowWriter(path, batch_size=4, metadata={"source": "test"}) as w:
+        w.write_all(items)
+    assert w.rows == 11
+    table = arrow.read_table(path)
+    assert table.num_rows == 11
+    assert table.schema.metadata[b"source"] == b"test"
+    assert table.column("error").to_pylist()[-1] == "OSError: unreadable"
+    paths, (headers, bodies) = arrow.read_catalog(path, "data")
+    assert paths.to_pylist() == [r["path"] for r in items[:-1]]
+    assert (list(headers), list(bodies)) == tuple(
+        map(list, join.bodies(r["data_id"] for r in items[:-1]))
+    )
+
+
+def test_read_catalog_zero_copy(tmpdir):
+    path = str(tmpdir.join("results.arrow"))
+    with arrow.ArrowWriter(path) as writer:
+        writer.write_all(results(5)[:-1])
+    before = pa.total_allocated_bytes()
+    paths, (headers, bodies) = arrow.read_catalog(path, "content")
+    assert pa.total_allocated_bytes() == before
+    assert len(bodies) == 5
+    pairs = list(join.join((headers, bodies), radius=64))
+    assert len(pairs) == 10
+
+
+def test_main(tmpdir, capsys):
+    source = str(tmpdir.join("results.jsonl"))
+    with open(source, "w", encoding="utf-8") as outf:
+        for result in results(3):
+            outf.write(json.dumps(result) + "\n")
+    output = str(tmpdir.join("results.parquet"))
+    arrow.main([source, output, "--batch-size", "2"])
+    assert "4 rows written" in capsys.readouterr().err
+    join.main([output, "-c", "data", "-r", "64", "-w", "1"])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3
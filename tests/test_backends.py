@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+import iscc
+from iscc import backends
+
+
+@pytest.fixture(autouse=True)
+def reset_backend():
+    yield
+    backends.select("python", check=False)
+
+
+def test_default_backend_is_reference():
+    assert backends.active() == "python"
+    assert iscc.minimum_hash is backends.reference()["minimum_hash"]
+    assert "python" in backends.available()
+
+
+def test_select_unknown():
+    with pytest.raises(backends.BackendError):
+        backends.select("does-not-exist")
+
+
+def test_select_python_self_check():
+    assert backends.self_check("python")
+    assert backends.select("python") == "python"
+
+
+def test_select_auto():
+    name = backends.select("auto")
+    assert name == backends.available()[0]
+    assert backends.active() == name
+
+
+def test_select_from_env(monkeypatch):
+    monkeypatch.setenv(backends.ENV_VAR, "python")
+    backends.select_from_env()
+    assert backends.active() == "python"
+
+
+def test_register_custom_backend():
+    calls = []
+
+    def encode(digest):
+        calls.append(digest)
+        return backends.reference()["encode"](digest)
+
+    expected = iscc.data_id(b"\x00" * 1000)
+    backends.register("custom", lambda: {"encode": encode}, priority=-1)
+    try:
+        backends.select("custom")
+        assert iscc.iscc.encode is encode
+        assert iscc.encode is encode
+        assert iscc.data_id(b"\x00" * 1000) == expected
+        assert calls
+    finally:
+        backends._registry.pop("custom")
+
+
+def test_broken_backend_fails_self_check():
+    backends.register("broken", lambda: {"minimum_hash": lambda f, n=64: [0] * n})
+    try:
+        assert not backends.self_check("broken", raise_error=False)
+        with pytest.raises(backends.BackendError):
+            backends.select("broken")
+        assert backends.active() == "python"
+        assert iscc.minimum_hash is backends.reference()["minimum_hash"]
+    finally:
+        backends._registry.pop("broken")
+
+
+def test_self_check_without_test_data(monkeypatch):
+    monkeypatch.setenv(backends.ENV_TEST_DATA, "/does/not/exist.json")
+    assert backends.test_data_path() is None
+    assert backends.self_check("python")
+
+
+def test_unavailable_backend():
+    def loader():
+        raise ImportError("missing")
+
+    backends.register("missing", loader)
+    try:
+        assert "missing" not in backends.available()
+        with pytest.raises(backends.BackendError):
+            backends.select("missing")
+    finally:
+        backends._registry.pop("missing")
+
+
+def test_numpy_backend_matches_reference():
+    pytest.importorskip("numpy")
+    from iscc import backend_numpy as nb
+
+    ref = backends.reference()
+    rnd = random.Random(0)
+    features = [rnd.getrandbits(32) for _ in range(10000)]
+    assert nb.minimum_hash(features) == ref["minimum_hash"](features)
+    assert nb.minimum_hash(features, n=8) == ref["minimum_hash"](features, n=8)
+    wide = [-1, -(1 << 63), 1 << 64, (1 << 100) + 3] + features[:100]
+    assert nb.minimum_hash(wide) == ref["minimum_hash"](wide)
+    digests = [rnd.getrandbits(64).to_bytes(8, "big") for _ in range(99)]
+    assert nb.similarity_hash(digests) == ref["similarity_hash"](digests)
+    for n in (1, 2, 8, 32):
+        values = [rnd.random() * 255 for _ in range(n)]
+        assert nb.dct(values) == ref["dct"](values)
+    pixels = [[rnd.randint(0, 255) for _ in range(32)] for _ in range(32)]
+    assert nb.image_hash(pixels) == ref["image_hash"](pixels)
+    data = rnd.getrandbits(8 * 200000).to_bytes(200000, "big")
+    args = (iscc.GEAR2_NORM, iscc.GEAR2_MIN, iscc.GEAR2_MAX)
+    masks = (iscc.GEAR2_MASK1, iscc.GEAR2_MASK2)
+    for size in (0, 100, 3000, 70000):
+        assert nb.chunk_length(data[:size], *args, *masks) == ref["chunk_length"](
+            data[:size], *args, *masks
+        )
+    assert backends.self_check("numpy")
+
+
+def test_numpy_backend_select():
+    pytest.importorskip("numpy")
+    data = bytes(range(256)) * 2000
+    expected = iscc.data_id(data)
+    backends.select("numpy")
+    assert backends.active() == "numpy"
+    assert iscc.data_id(data) == expected
+
+
+def test_selected_codec_reaches_tools():
+    from iscc import cluster, index, join, server
+
+    ref = backends.reference()
+    calls = []
+
+    def decode(code):
+        calls.append(code)
+        return ref["decode"](code)
+
+    backends.register("codec", lambda: {"decode": decode, "encode": ref["encode"]})
+    try:
+        backends.select("codec")
+        code = iscc.encode(iscc.HEAD_DID + b"\x01" * 8)
+        for use in (
+            lambda: join.bodies([code]),
+            lambda: index._row("item", code),
+            lambda: server.load_shard([code]),
+            lambda: list(cluster.cluster([("a", [code])], {"data": 2})),
+        ):
+            del calls[:]
+            use()
+            assert code in calls
+    finally:
+        backends._registry.pop("codec")
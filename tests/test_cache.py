@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+import pytest
+import iscc
+from iscc import cli
+from iscc.cache import ResultCache, algorithm_version, file_key
+
+
+@pytest.fixture
+def db(tmpdir):
+    return str(tmpdir.join("cache.db"))
+
+
+def test_algorithm_version():
+    version = algorithm_version()
+    assert version.startswith(iscc.__version__ + "-")
+    assert version == algorithm_version()
+
+
+def test_file_key_changes_on_modification(tmpdir):
+    path = tmpdir.join("file.bin")
+    path.write_binary(b"abc")
+    key = file_key(str(path))
+    assert key == file_key(str(path))
+    path.write_binary(b"abcd")
+    assert file_key(str(path)) != key
+
+
+def test_put_get(db):
+    key = (1, 2, 3, 4)
+    with ResultCache(db) as cache:
+        assert cache.get(key, "data") is None
+        cache.put(key, "data", "CDC7Lg4oHA8DC")
+        cache.put(key, "instance", ["CRLdd9g4BSUyY", "f8e5"])
+        assert cache.get(key, "data") == "CDC7Lg4oHA8DC"
+        assert cache.get((1, 2, 3, 5), "data") is None
+        assert cache.hits == 1
+        assert cache.misses == 2
+    with ResultCache(db) as cache:
+        assert cache.get_many(key, ["data", "instance", "content:text"]) == {
+            "data": "CDC7Lg4oHA8DC",
+            "instance": ["CRLdd9g4BSUyY", "f8e5"],
+        }
+
+
+def test_version_change_invalidates(db):
+    with ResultCache(db, version="a") as cache:
+        cache.put((1, 2, 3, 4), "data", "X")
+    with ResultCache(db, version="a") as cache:
+        assert len(cache) == 1
+    with ResultCache(db, version="b") as cache:
+        assert len(cache) == 0
+        assert cache.get((1, 2, 3, 4), "data") is None
+
+
+def test_lru_eviction(db):
+    with ResultCache(db, max_entries=2) as cache:
+        cache.put((1, 0, 0, 0), "data", "A")
+        time.sleep(0.01)
+        cache.put((2, 0, 0, 0), "data", "B")
+        time.sleep(0.01)
+        assert cache.get((1, 0, 0, 0), "data") == "A"
+        cache.put((3, 0, 0, 0), "data", "C")
+        assert cache.evict() == 1
+        assert len(cache) == 2
+        assert cache.get((2, 0, 0, 0), "data") is None
+        assert cache.get((1, 0, 0, 0), "data") == "A"
+
+
+def test_cli_uses_cache(tmpdir, db, monkeypatch, capsys):
+    path = tmpdir.join("file.txt")
+    path.write_text("Hello World", encoding="utf-8")
+    args = ["-w", "1", "--cache", db, str(path)]
+    assert cli.main(args) == 0
+    first = json.loads(capsys.readouterr().out)
+
+    def fail(*args):
+        raise AssertionError("generator called for cached file")
+
+    monkeypatch.setattr(iscc, "data_id", fail)
+    monkeypatch.setattr(iscc, "instance_id", fail)
+    monkeypatch.setattr(iscc, "content_id_text", fail)
+    assert cli.main(args) == 0
+    out, err = capsys.readouterr()
+    assert json.loads(out) == first
+    assert "cache: 3 hits, 0 misses" in err
+
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    monkeypatch.undo()
+    assert cli.main(args) == 0
+    assert "cache: 0 hits, 3 misses" in capsys.readouterr().err
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import shutil
+import pytest
+import iscc
+from iscc import cli
+
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+IMG = os.path.join(TESTS_PATH, "file_image_cat.jpg")
+
+
+@pytest.fixture
+def tree(tmpdir):
+    shutil.copy(IMG, str(tmpdir.join("cat.jpg")))
+    sub = tmpdir.mkdir("sub")
+    sub.join("hello.txt").write_text("Hello World", encoding="utf-8")
+    sub.join("data.bin").write_binary(bytes(range(256)) * 10)
+    return tmpdir
+
+
+def test_iter_paths(tree):
+    paths = list(cli.iter_paths([str(tree)]))
+    names = [os.path.relpath(p, str(tree)) for p in paths]
+    assert names == [
+        "cat.jpg",
+        os.path.join("sub", "data.bin"),
+        os.path.join("sub", "hello.txt"),
+    ]
+
+
+def test_iter_paths_stdin(tree):
+    stdin = io.StringIO("%s\n\n%s\n" % (tree.join("cat.jpg"), tree.join("sub")))
+    paths = list(cli.iter_paths(["-"], stdin=stdin))
+    assert len(paths) == 3
+
+
+def test_generate(tree):
+    result = cli.generate(str(tree.join("cat.jpg")), cli.COMPONENTS)
+    assert result["meta_id"] == iscc.meta_id("cat")[0]
+    assert result["content_id"] == iscc.content_id_image(IMG)
+    assert result["data_id"] == iscc.data_id(IMG)
+    assert [result["instance_id"], result["tophash"]] == iscc.instance_id(IMG)
+    assert result["iscc"] == "-".join(
+        (
+            result["meta_id"],
+            result["content_id"],
+            result["data_id"],
+            result["instance_id"],
+        )
+    )
+    text = cli.generate(str(tree.join("sub", "hello.txt")), ("content",))
+    assert text["content_id"] == iscc.content_id_text("Hello World")
+    assert "data_id" not in text
+
+
+def test_generate_error(tmpdir):
+    result = cli.generate(str(tmpdir.join("missing.bin")))
+    assert result["error"].startswith("FileNotFoundError")
+    assert "iscc" not in result
+
+
+def test_main_parallel(tree, capsys):
+    assert cli.main(["-q", "-w", "2", "--ordered", str(tree)]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    results = [json.loads(line) for line in lines]
+    assert [os.path.basename(r["path"]) for r in results] == [
+        "cat.jpg",
+        "data.bin",
+        "hello.txt",
+    ]
+    assert results[0]["data_id"] == iscc.data_id(IMG)
+    assert "content_id" not in results[1]
+
+
+def test_main_output_file_and_progress(tree, capsys):
+    outfile = str(tree.join("out.jsonl"))
+    code = cli.main(["-w", "1", "-c", "data", "-o", outfile, str(tree.join("sub"))])
+    assert code == 0
+    with open(outfile, encoding="utf-8") as infile:
+        results = [json.loads(line) for line in infile]
+    assert len(results) == 2
+    assert set(results[0]) == {"path", "size", "data_id", "iscc"}
+    assert "2 files (0 errors)" in capsys.readouterr().err
+
+
+def test_main_invalid_components():
+    with pytest.raises(SystemExit):
+        cli.main(["-c", "data,unknown", "."])
+
+
+def test_generate_stream(tree):
+    components = cli.COMPONENTS
+    for name in ("cat.jpg", os.path.join("sub", "hello.txt")):
+        path = str(tree.join(name))
+        with open(path, "rb") as infile:
+            result = cli.generate_stream(
+                path, infile, os.path.getsize(path), components
+            )
+        assert result == cli.generate(path, components)
+
+
+def test_main_archives(tree, capsys):
+    import zipfile
+
+    path = str(tree.join("bundle.zip"))
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.write(IMG, "images/cat.jpg")
+        zf.writestr("empty.bin", b"")
+    assert cli.main(["-q", "-w", "1", "-a", path]) == 1
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["path"] for r in results] == [
+        path + "!images/cat.jpg",
+        path + "!empty.bin",
+    ]
+    assert results[0]["content_id"] == iscc.content_id_image(IMG)
+    assert [results[0]["instance_id"], results[0]["tophash"]] == iscc.instance_id(IMG)
+    assert results[0]["data_id"] == iscc.data_id(IMG)
+    assert results[1]["error"].startswith("ValueError")
+
+
+def test_main_readahead(tree, capsys):
+    args = ["-q", "-w", "1", "--readahead", "2", "--block-size", "4096", str(tree)]
+    assert cli.main(args) == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert results[0]["data_id"] == iscc.data_id(IMG)
+    assert [results[0]["instance_id"], results[0]["tophash"]] == iscc.instance_id(IMG)
+
+
+def test_generate_fadvise(tree):
+    path = str(tree.join("cat.jpg"))
+    options = {"fadvise": True}
+    result = cli.generate(path, cli.COMPONENTS, read_options=options)
+    expected = cli.generate(path, cli.COMPONENTS)
+    assert result.pop("bytes_read") == os.path.getsize(path)
+    assert result == expected
+    cached = {"data": expected["data_id"]}
+    result = cli.generate(path, ("data", "instance"), cached, options)
+    assert result["iscc"] == "-".join((expected["data_id"], expected["instance_id"]))
+    missing = cli.generate(str(tree.join("missing.bin")), read_options=options)
+    assert "error" in missing
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import pytest
+import iscc
+from iscc import cluster
+
+
+def code(header, body):
+    return iscc.encode(header + body.to_bytes(8, "big"))
+
+
+def flip(body, n, rnd):
+    for bit in rnd.sample(range(64), n):
+        body ^= 1 << bit
+    return body
+
+
+def brute_force(items, thresholds):
+    sets = cluster.UnionFind(len(items))
+    digests = [[iscc.decode(c) for c in codes] for _, codes in items]
+    for a in range(len(items)):
+        for b in range(a + 1, len(items)):
+            for da in digests[a]:
+                for db in digests[b]:
+                    comp = cluster.component_of(da[0])
+                    if da[0] == db[0] and comp in thresholds:
+                        if iscc.distance(da[1:], db[1:]) <= thresholds[comp]:
+                            sets.union(a, b)
+    groups = {}
+    for i, (item_id, _) in enumerate(items):
+        groups.setdefault(sets.find(i), []).append(item_id)
+    return sorted(sorted(g) for g in groups.values())
+
+
+@pytest.mark.parametrize("thresholds", [{"content": 8, "data": 2}, {"content": 3}])
+def test_cluster_matches_brute_force(thresholds):
+    rnd = random.Random(1)
+    items = []
+    for group in range(40):
+        content, data = rnd.getrandbits(64), rnd.getrandbits(64)
+        for member in range(rnd.randint(1, 4)):
+            codes = [
+                code(iscc.HEAD_CID_T, flip(content, rnd.randint(0, 10), rnd)),
+                code(iscc.HEAD_DID, flip(data, rnd.randint(0, 3), rnd)),
+            ]
+            items.append(("%s-%s" % (group, member), codes))
+    clusterer = cluster.Clusterer(thresholds)
+    for item_id, codes in items:
+        clusterer.add(item_id, codes)
+    found = sorted(sorted(g) for g in clusterer.run().clusters(min_size=1))
+    assert found == brute_force(items, thresholds)
+
+
+def test_headers_and_identical_codes():
+    body = random.Random(2).getrandbits(64)
+    items = [
+        ("a", [code(iscc.HEAD_CID_T, body)]),
+        ("b", code(iscc.HEAD_CID_I, body)),
+        ("c", [code(iscc.HEAD_CID_T, body)]),
+        ("d", [code(iscc.HEAD_CID_T, body ^ 1)]),
+    ]
+    assignments = dict(cluster.cluster(items, {"content": 0}))
+    assert assignments == {"a": 0, "b": 1, "c": 0, "d": 3}
+
+
+def test_split_bands():
+    assert cluster.split_bands(3) == [
+        (0, 2**22 - 1),
+        (22, 2**21 - 1),
+        (43, 2**21 - 1),
+    ]
+    assert len(cluster.neighbor_masks(16, 2)) == 16 + 120
+    with pytest.raises(ValueError):
+        cluster.Clusterer({"title": 3})
+
+
+def test_main(tmpdir, capsys):
+    path = tmpdir.join("results.jsonl")
+    body = random.Random(3).getrandbits(64)
+    results = [
+        {"path": "a.txt", "content_id": code(iscc.HEAD_CID_T, body)},
+        {"path": "b.txt", "content_id": code(iscc.HEAD_CID_T, body ^ 7)},
+        {"path": "c.txt", "content_id": code(iscc.HEAD_CID_T, ~body & (2**64 - 1))},
+        {"path": "d.txt", "error": "ValueError: empty"},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in results), encoding="utf-8")
+    cluster.main([str(path), "-t", "content=4", "--min-size", "2"])
+    out, err = capsys.readouterr()
+    assert [json.loads(line) for line in out.splitlines()] == [
+        {"path": "a.txt", "cluster": 0},
+        {"path": "b.txt", "cluster": 0},
+    ]
+    assert "3 items, 2 clusters" in err
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import os
+import pytest
+import iscc
+from iscc import backends
+
+pytest.importorskip("multiprocessing.shared_memory")
+from iscc.imagepool import ImageHashPool, normalize_buffer  # noqa: E402
+
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+IMAGES = [
+    os.path.join(TESTS_PATH, name)
+    for name in ("file_image_cat.jpg", "file_image_cat.png", "file_image_cat.gif")
+]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ImageHashPool(workers=2, slots=2) as pool:
+        yield pool
+
+
+def test_normalize_buffer():
+    pixels = iscc.image_normalize(IMAGES[0])
+    assert normalize_buffer(IMAGES[0]) == bytes(sum(pixels, []))
+
+
+def test_content_ids(pool):
+    images = IMAGES * 3
+    assert list(pool.content_ids(images)) == [iscc.content_id_image(i) for i in images]
+    partial = list(pool.content_ids(IMAGES[:1], partial=True))
+    assert partial == [iscc.content_id_image(IMAGES[0], partial=True)]
+
+
+def test_content_ids_numpy_rows(pool):
+    if "numpy" not in backends.available():
+        pytest.skip("numpy not available")
+    image_hash = iscc.image_hash
+    try:
+        backends.select("numpy", check=False)
+        view = memoryview(normalize_buffer(IMAGES[0]))
+        rows = [view[i : i + 32] for i in range(0, 1024, 32)]
+        assert iscc.iscc.image_hash(rows) == image_hash(iscc.image_normalize(IMAGES[0]))
+    finally:
+        backends.select("python", check=False)
+
+
+def test_errors_keep_pool_usable(pool, tmpdir):
+    broken = tmpdir.join("broken.jpg")
+    broken.write_binary(b"no image")
+    results = pool.image_hashes(IMAGES + [str(broken)] + IMAGES)
+    with pytest.raises(Exception):
+        list(results)
+    assert list(pool.content_ids(IMAGES)) == [iscc.content_id_image(i) for i in IMAGES]
+
+
+def test_dead_worker_raises():
+    with ImageHashPool(workers=2, slots=2) as dead_pool:
+        dead_pool.processes[0].kill()
+        dead_pool.processes[0].join()
+        with pytest.raises(RuntimeError):
+            list(dead_pool.content_ids(IMAGES[:2]))
+        with pytest.raises(RuntimeError):
+            list(dead_pool.content_ids(IMAGES[:1]))
+
+
+def test_worker_killed_while_hashing():
+    with ImageHashPool(workers=2, slots=2) as dead_pool:
+        results = dead_pool.image_hashes(IMAGES * 3)
+        next(results)
+        for process in dead_pool.processes:
+            process.kill()
+        with pytest.raises(RuntimeError):
+            list(results)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import pytest
+import iscc
+from iscc.incremental import (
+    DataIdState,
+    InstanceIdState,
+    _root,
+    data_id_resumable,
+    instance_id_resumable,
+)
+
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+def random_bytes(n, seed=0):
+    return random.Random(seed).getrandbits(n * 8).to_bytes(n, "big")
+
+
+@pytest.mark.parametrize("size", [1, 20, 641, 50000, 400000])
+def test_data_id_state_matches_data_id(size):
+    data = random_bytes(size)
+    state = DataIdState().push(data)
+    assert state.code() == iscc.data_id(data)
+    assert state.size == size
+
+
+def test_data_id_state_small_pushes():
+    data = random_bytes(300000)
+    state = DataIdState()
+    rnd = random.Random(1)
+    pos = 0
+    while pos < len(data):
+        step = rnd.randint(1, 20000)
+        state.push(data[pos : pos + step])
+        pos += step
+    assert state.code() == iscc.data_id(data)
+    assert len(state.features) > 100
+    assert sum(state.lengths) == state.offset
+
+
+def test_data_id_state_test_files():
+    for name in ("file_image_cat.jpg", "file_image_cat.png", "file_image_cat.gif"):
+        path = os.path.join(TESTS_PATH, name)
+        assert DataIdState().resume(path).code() == iscc.data_id(path)
+
+
+def test_data_id_state_empty():
+    with pytest.raises(ValueError):
+        DataIdState().code()
+
+
+def test_data_id_state_append_resume():
+    data = random_bytes(500000)
+    state = DataIdState().resume(data[:300000])
+    restored = DataIdState.from_dict(state.to_dict())
+    assert restored.offset == state.offset
+    assert restored.offset < 300000
+    restored.resume(data)
+    assert restored.code() == iscc.data_id(data)
+
+
+def test_data_id_state_edit_resume():
+    data = bytearray(random_bytes(400000))
+    state = DataIdState().resume(bytes(data))
+    data[250000:250010] = b"x" * 50
+    with pytest.raises(ValueError):
+        DataIdState.from_dict(state.to_dict()).resume(bytes(data[:200000] + b"zz"))
+    state.resume(bytes(data), changed=250000)
+    assert state.code() == iscc.data_id(bytes(data))
+    state.rollback(0)
+    assert state.offset == 0
+    assert state.minima is None
+
+
+def test_data_id_resumable(tmpdir):
+    path = str(tmpdir.join("log.bin"))
+    data = random_bytes(200000)
+    with open(path, "wb") as outf:
+        outf.write(data[:120000])
+    assert data_id_resumable(path) == iscc.data_id(data[:120000])
+    assert os.path.exists(path + ".did.json")
+    with open(path, "ab") as outf:
+        outf.write(data[120000:])
+    assert data_id_resumable(path) == iscc.data_id(data)
+    with open(path, "r+b") as outf:
+        outf.write(b"changed")
+    assert data_id_resumable(path, changed=0) == iscc.data_id(b"changed" + data[7:])
+
+
+@pytest.mark.parametrize("leaves", [1, 2, 3, 5, 6, 7, 8, 9, 13, 16, 17])
+def test_merkle_root_matches_top_hash(leaves):
+    digests = [iscc.sha256d(bytes([i])) for i in range(leaves)]
+    frontier = []
+    for digest in digests:
+        InstanceIdState._add(frontier, digest)
+    assert len(frontier) == bin(leaves).count("1")
+    assert _root(frontier) == iscc.top_hash(digests)
+
+
+@pytest.mark.parametrize("size", [1, 64000, 64001, 128000, 300000, 1000000])
+def test_instance_id_state_matches_instance_id(size):
+    data = random_bytes(size)
+    assert InstanceIdState().push(data).code() == iscc.instance_id(data)
+
+
+def test_instance_id_state_append_resume():
+    data = random_bytes(900000)
+    state = InstanceIdState().resume(data[:500000])
+    assert state.code() == iscc.instance_id(data[:500000])
+    restored = InstanceIdState.from_dict(state.to_dict())
+    assert restored.offset == 448000
+    restored.resume(data)
+    assert restored.code() == iscc.instance_id(data)
+    changed = b"x" + data[1:]
+    with pytest.raises(ValueError):
+        InstanceIdState.from_dict(state.to_dict()).resume(changed[:400000] + data)
+
+
+def test_instance_id_state_empty():
+    with pytest.raises(ValueError):
+        InstanceIdState().code()
+
+
+def test_instance_id_resumable(tmpdir):
+    path = str(tmpdir.join("capture.bin"))
+    data = random_bytes(300000)
+    with open(path, "wb") as outf:
+        outf.write(data[:100000])
+    assert instance_id_resumable(path) == iscc.instance_id(data[:100000])
+    with open(path, "ab") as outf:
+        outf.write(data[100000:])
+    assert instance_id_resumable(path) == iscc.instance_id(data)
+    with open(path, "r+b") as outf:
+        outf.seek(200000)
+        outf.write(b"changed")
+    changed = data[:200000] + b"changed" + data[200007:]
+    assert instance_id_resumable(path) == iscc.instance_id(changed)
+
+
+def test_data_id_resumable_insert(tmpdir, monkeypatch):
+    path = str(tmpdir.join("doc.bin"))
+    data = random_bytes(2000000)
+    with open(path, "wb") as outf:
+        outf.write(data)
+    data_id_resumable(path)
+    n_chunks = len(DataIdState.load(path + ".did.json").lengths)
+    edited = data[:1000000] + b"new" + data[1000000:]
+    with open(path, "wb") as outf:
+        outf.write(edited)
+    expected = iscc.data_id(edited)
+    calls = []
+    chunk_length = iscc.iscc.chunk_length
+    monkeypatch.setattr(
+        iscc.iscc, "chunk_length", lambda *args: calls.append(1) or chunk_length(*args)
+    )
+    assert data_id_resumable(path, changed=1000000) == expected
+    # Only chunks from the insert on are chunked again
+    assert 0 < len(calls) < n_chunks * 0.6
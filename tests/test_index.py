@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+import iscc
+from iscc.index import CodeIndex, hamming
+
+
+def code(header, body):
+    return iscc.encode(header + body.to_bytes(8, "big"))
+
+
+def flip(body, n, rnd):
+    for bit in rnd.sample(range(64), n):
+        body ^= 1 << bit
+    return body
+
+
+@pytest.fixture
+def index(tmpdir):
+    with CodeIndex(str(tmpdir.join("index.db")), commit_interval=100) as index:
+        yield index
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(-1, 0) == 64
+    assert hamming(1 << 62, -(1 << 63)) == 2
+    assert hamming(None, 1) is None
+
+
+def test_add_get_remove(index):
+    data_id = iscc.data_id(b"abc")
+    text_id = iscc.content_id_text("Hello World")
+    index.add("a", data_id)
+    index.add_result({"path": "b", "data_id": data_id, "content_id": text_id})
+    assert len(index) == 3
+    assert index.get("b") == {"data": data_id, "content": text_id}
+    index.add("b", data_id)
+    assert len(index) == 3
+    assert index.remove("b") == 2
+    assert index.get("b") == {}
+    with pytest.raises(ValueError):
+        index.add("c", iscc.instance_id(b"abc")[1])
+
+
+@pytest.mark.parametrize("radius", [0, 3, 6, 11, 14])
+def test_query(index, radius):
+    rnd = random.Random(radius)
+    bodies = [rnd.getrandbits(64) for _ in range(200)]
+    bodies += [flip(bodies[0], rnd.randint(0, 16), rnd) for _ in range(100)]
+    items = [("item%d" % i, code(b"\x20", b)) for i, b in enumerate(bodies)]
+    items.append(("other", code(b"\x30", bodies[0])))
+    index.add_many(items)
+    found = index.query(items[0][1], radius)
+    expected = sorted(
+        (iscc.distance(c, items[0][1]), item)
+        for item, c in items[:-1]
+        if iscc.distance(c, items[0][1]) <= radius
+    )
+    assert [(d, item) for item, _, d in found] == expected
+    assert all(c == dict(items)[item] for item, c, _ in found)
+    assert len(index.query(items[0][1], radius, limit=1)) == 1
+
+
+def test_query_uses_band_indexes(index):
+    sql, params = index.query_sql(iscc.data_id(b"abc"), 8)
+    plan = " ".join(
+        r[-1] for r in index.db.execute("EXPLAIN QUERY PLAN " + sql, params)
+    )
+    for band in range(4):
+        assert "USING INDEX codes_b%d" % band in plan
+    assert "SCAN" not in plan
+
+
+def test_persistence(tmpdir):
+    path = str(tmpdir.join("index.db"))
+    with CodeIndex(path) as index:
+        index.add_many(("f%d" % i, iscc.data_id(b"%d" % i)) for i in range(50))
+    with CodeIndex(path) as index:
+        assert len(index) == 50
+        assert index.query(iscc.data_id(b"7"))[0][0] == "f7"
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import iscc
+from iscc import instrument
+
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+IMG = os.path.join(TESTS_PATH, "file_image_cat.jpg")
+
+
+def test_disabled_by_default():
+    assert not instrument.enabled()
+    assert instrument.probe("data_id") is instrument.NULL_PROBE
+    items = [1, 2, 3]
+    assert instrument.NULL_PROBE.wrap("x", items) is items
+
+
+def test_recording_data_id():
+    with open(IMG, "rb") as infile:
+        data = infile.read()
+    with instrument.recording() as rec:
+        code = iscc.data_id(data)
+    assert code == iscc.data_id(data)
+    assert not instrument.enabled()
+    steps = rec.to_dict()["data_id"]
+    assert set(steps) == {"chunk", "features", "dedup", "minhash", "encode"}
+    assert steps["chunk"]["bytes"] == len(data)
+    assert steps["chunk"]["items"] == steps["features"]["items"]
+    assert all(s["calls"] == 1 and s["seconds"] >= 0 for s in steps.values())
+
+
+def test_recording_all_generators():
+    with instrument.recording() as rec:
+        mid, _, _ = iscc.meta_id("Title", "Extra")
+        cid_t = iscc.content_id_text("Hello World")
+        cid_i = iscc.content_id_image(IMG)
+        iscc.content_id_mixed([cid_t, cid_i])
+        iscc.instance_id(IMG)
+    data = rec.to_dict()
+    assert set(data) == {
+        "meta_id",
+        "content_id_text",
+        "content_id_image",
+        "content_id_mixed",
+        "instance_id",
+    }
+    assert data["content_id_text"]["normalize"]["items"] == len("helloworld")
+    assert data["instance_id"]["read"]["bytes"] == os.path.getsize(IMG)
+    assert data["content_id_mixed"]["decode"]["items"] == 2
+
+
+def test_callback_registry():
+    events = []
+
+    def callback(*args):
+        events.append(args)
+
+    instrument.register(callback)
+    try:
+        iscc.content_id_text("Hello World")
+    finally:
+        instrument.unregister(callback)
+    iscc.content_id_text("Hello World")
+    steps = [e[1] for e in events]
+    assert steps == ["normalize", "ngrams", "features", "dedup", "minhash", "encode"]
+    assert all(e[0] == "content_id_text" for e in events)
+
+
+def test_exports():
+    rec = instrument.Recorder()
+    rec("data_id", "chunk", 0.5, 100, 2)
+    rec("data_id", "chunk", 0.25, 50, 1)
+    assert rec.to_dict() == {
+        "data_id": {"chunk": {"calls": 2, "seconds": 0.75, "bytes": 150, "items": 3}}
+    }
+    assert json.loads(rec.to_json()) == rec.to_dict()
+    prom = rec.to_prometheus()
+    assert "# TYPE iscc_step_seconds_total counter" in prom
+    assert 'iscc_step_bytes_total{generator="data_id",step="chunk"} 150' in prom
+    rec.reset()
+    assert rec.to_dict() == {}
+
+
+def test_dedup_stats():
+    with instrument.recording() as rec:
+        iscc.data_id(bytes(2000000))
+        iscc.content_id_text("Hello World " * 50)
+    stats = rec.dedup_stats()
+    assert set(stats) == {"data_id", "content_id_text"}
+    data = stats["data_id"]
+    assert data["unique"] < data["features"]
+    assert data["ratio"] == (data["features"] - data["unique"]) / data["features"]
+    assert data["seconds_saved"] > 0
+    assert stats["content_id_text"]["unique"] == len("helloworld")
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import math
 import random
+import subprocess
+import sys
+from array import array
 from io import BytesIO
 import pytest
 from PIL import Image, ImageFilter, ImageEnhance
@@ -1382,3 +1386,213 @@ def test_image_normalize():
             52,
         ],
     ]
+
+
+def test_minimum_hash_streaming():
+    features = [random.getrandbits(64) for _ in range(10000)]
+    expected = iscc.minimum_hash(features)
+    assert iscc.minimum_hash(iter(features)) == expected
+    minima = None
+    for start in range(0, len(features), 3000):
+        minima = iscc.minimum_hash_update(minima, features[start : start + 3000])
+    assert minima == expected
+    with pytest.raises(ValueError):
+        iscc.minimum_hash([])
+    # Features are taken modulo 2**64
+    assert iscc.minimum_hash([-1, 2 ** 64, 7]) == iscc.minimum_hash(
+        [2 ** 64 - 1, 0, 7]
+    )
+    assert iscc.minimum_hash([-1]) == iscc.minimum_hash_update(None, [-1])
+
+
+def test_content_id_text_stream():
+    rnd = random.Random(3)
+    alphabet = "abcΣσςXYZ 019\n\t.-Ää́¨가가中文字日本語 Iİ'💩"
+    texts = ["", "a", "Some Text", "ΑΣ ΑΣ1 ΑΣa", TEXT_A, TEXT_B]
+    texts += ["".join(rnd.choice(alphabet) for _ in range(2000)) for _ in range(5)]
+    for text in texts:
+        expected = iscc.content_id_text(text)
+        data = text.encode("utf-8")
+        assert iscc.content_id_text_stream(BytesIO(data), block_size=7) == expected
+        blocks = [text[i : i + 5] for i in range(0, len(text), 5)]
+        assert iscc.content_id_text_stream(blocks) == expected
+    assert iscc.content_id_text_stream([b""], partial=True) == iscc.content_id_text(
+        "", partial=True
+    )
+
+
+def test_content_id_text_stream_file(tmpdir):
+    path = tmpdir.join("text.txt")
+    path.write_text(TEXT_A * 50, encoding="utf-8")
+    expected = iscc.content_id_text(TEXT_A * 50)
+    assert iscc.content_id_text_stream(str(path), block_size=100) == expected
+    segments = list(iscc.text_segments(str(path), block_size=100))
+    assert max(len(s) for s in segments) < 200
+
+
+def test_lazy_imports():
+    code = (
+        "import sys, iscc\n"
+        "lazy = ('PIL', 'numpy', 'statistics', 'importlib.metadata')\n"
+        "assert not [m for m in lazy if m in sys.modules], sys.modules.keys()\n"
+        "iscc.content_id_image(%r)\n"
+        "assert 'PIL' in sys.modules and 'statistics' in sys.modules\n"
+    ) % os.path.join(os.path.dirname(__file__), "file_image_cat.jpg")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(iscc.__file__)))
+    subprocess.check_call([sys.executable, "-c", code], env=env)
+
+
+def synthetic_frames(n, shift=0):
+    frames = []
+    for i in range(n):
+        scene = (i + shift) // 10
+        img = Image.new("L", (64, 48))
+        pixels = [(x * (scene + 1) + y * 3) % 256 for y in range(48) for x in range(64)]
+        img.putdata(pixels)
+        frames.append(img)
+    return frames
+
+
+def test_content_id_video():
+    frames = synthetic_frames(30)
+    hashes = [iscc.image_hash(iscc.image_normalize(f)) for f in frames]
+    expected = iscc.encode(iscc.HEAD_CID_V + iscc.similarity_hash(hashes))
+    assert iscc.content_id_video(frames, step=1, threshold=-1) == expected
+    assert iscc.content_id_video(iter(frames), step=1, threshold=0) == expected
+    raw = [(f.width, f.height, f.tobytes()) for f in frames]
+    assert iscc.content_id_video(raw, step=1, threshold=-1) == expected
+    cid_v_p = iscc.content_id_video(frames, partial=True)
+    assert iscc.decode(cid_v_p)[:1] == iscc.HEAD_CID_V_PCF
+    with pytest.raises(ValueError):
+        iscc.content_id_video([])
+
+
+def test_content_id_video_skips_frames(monkeypatch):
+    calls = []
+    image_hash = iscc.iscc.image_hash
+
+    def counting_image_hash(pixels):
+        calls.append(1)
+        return image_hash(pixels)
+
+    monkeypatch.setattr(iscc.iscc, "image_hash", counting_image_hash)
+    frames = synthetic_frames(30)
+    cid_v = iscc.content_id_video(frames, step=1)
+    assert len(calls) == 3
+    assert iscc.content_id_video(frames, step=5) == cid_v
+    shifted = iscc.content_id_video(synthetic_frames(30, shift=3), step=1)
+    assert iscc.distance(cid_v, shifted) < 10
+
+
+def tone(seconds, rate=8000, amplitude=8000, seed=0):
+    rnd = random.Random(seed)
+    freqs = [rnd.uniform(300, 1900) for _ in range(seconds * 4)]
+    samples = []
+    for i in range(seconds * rate):
+        f = freqs[i * 4 // rate]
+        samples.append(int(amplitude * math.sin(2 * math.pi * f * i / rate)))
+    return samples
+
+
+def write_wav(path, samples, rate, channels=1, width=2):
+    import wave
+
+    data = array("h", [s for s in samples for _ in range(channels)])
+    if sys.byteorder == "big":
+        data.byteswap()
+    with wave.open(path, "wb") as outf:
+        outf.setnchannels(channels)
+        outf.setsampwidth(width)
+        outf.setframerate(rate)
+        outf.writeframes(data.tobytes())
+
+
+def test_content_id_audio(tmpdir):
+    samples = tone(10)
+    cid_a = iscc.content_id_audio(samples, sample_rate=8000)
+    windows = iscc.audio_windows([samples], 1, iscc.WINDOW_SIZE_CID_A)
+    spectra = [iscc.dct(w) for w in windows]
+    digests = list(iscc.audio_features(spectra, iscc.audio_bands(8000)))
+    assert cid_a == iscc.encode(iscc.HEAD_CID_A + iscc.similarity_hash(digests))
+    mono, stereo = str(tmpdir.join("mono.wav")), str(tmpdir.join("stereo.wav"))
+    write_wav(mono, samples, 8000)
+    write_wav(stereo, samples, 8000, channels=2)
+    assert iscc.content_id_audio(mono) == cid_a
+    with open(stereo, "rb") as infile:
+        assert iscc.content_id_audio(infile) == cid_a
+    quiet = [s // 4 for s in samples]
+    assert iscc.distance(iscc.content_id_audio(quiet, sample_rate=8000), cid_a) < 4
+    cropped = iscc.content_id_audio(samples[1000:], sample_rate=8000)
+    assert iscc.distance(cropped, cid_a) < 4
+    other = iscc.content_id_audio(tone(10, seed=2), sample_rate=8000)
+    assert iscc.distance(other, cid_a) > 16
+    cid_a_p = iscc.content_id_audio(samples, partial=True, sample_rate=8000)
+    assert iscc.decode(cid_a_p)[:1] == iscc.HEAD_CID_A_PCF
+    with pytest.raises(ValueError):
+        iscc.content_id_audio([], sample_rate=8000)
+
+
+def test_audio_windows():
+    blocks = [[1, 3] * 5, [5, 7] * 4]
+    windows = list(iscc.audio_windows(blocks, 2, 4))
+    assert windows == [[2.0] * 4, [2.0, 6.0, 6.0, 6.0], [6.0, 0, 0, 0]]
+    bands = iscc.audio_bands(8000)
+    assert len(bands) == iscc.BANDS_CID_A
+    assert all(lo < hi for lo, hi in bands)
+
+
+def test_unique_features():
+    features = [3, 1, 3, 2, 1, 3, 4]
+    assert list(iscc.unique_features(features)) == [3, 1, 2, 4]
+    assert list(iscc.unique_features(features, size=2)) == [3, 1, 2, 1, 3, 4]
+    repeated = [random.getrandbits(32) for _ in range(500)] * 8
+    expected = iscc.minimum_hash(repeated)
+    assert iscc.minimum_hash(iscc.unique_features(repeated)) == expected
+    assert iscc.minimum_hash(iscc.unique_features(repeated, size=100)) == expected
+
+
+def test_text_segments_any_script():
+    rnd = random.Random(5)
+    words = ["Σοφία", "ΑΣ", "Ἀθῆναι", "Москва", "ёлка", "ქართ", "नमस्ते", "ㄱㅏ", "각"]
+    text = " ".join(rnd.choice(words) for _ in range(20000))
+    blocks = [text[i : i + 1000] for i in range(0, len(text), 1000)]
+    segments = list(iscc.text_segments(blocks))
+    assert "".join(segments) == text
+    assert max(len(s) for s in segments) < 2000
+    data = BytesIO(text.encode("utf-8"))
+    assert iscc.content_id_text_stream(data, block_size=777) == iscc.content_id_text(
+        text
+    )
+    # Combining marks and conjoining jamo never start a segment
+    segments = list(iscc.text_segments(list("a \u0301b \u314fc \u1161d e \u03a3 x")))
+    assert segments == ["a \u0301b \u314fc \u1161d ", "e ", "\u03a3 ", "x"]
+
+
+def test_text_segments_unspaced():
+    rnd = random.Random(6)
+    for alphabet in ("абвгдеёжМОСКВА", "กขคงจภาษาไทย", "かなカナひらがな", "éèàçÉÈÀÇ"):
+        text = "".join(rnd.choice(alphabet) for _ in range(10000))
+        blocks = [text[i : i + 250] for i in range(0, len(text), 250)]
+        segments = list(iscc.text_segments(blocks))
+        assert "".join(segments) == text
+        assert max(len(s) for s in segments) < 500
+        assert iscc.content_id_text_stream(blocks) == iscc.content_id_text(text)
+    # No boundary next to capital sigma or modifier letters
+    assert list(iscc.text_segments(list("aΣb"))) == ["aΣb"]
+    assert list(iscc.text_segments(list("aʰb"))) == ["aʰb"]
+
+
+def test_similarity_hash_update():
+    digests = [random.getrandbits(64).to_bytes(8, "big") for _ in range(9)]
+    counts = None
+    for digest in digests:
+        counts = iscc.similarity_hash_update(counts, digest)
+    assert counts[-1] == 9
+    assert iscc.similarity_hash_finalize(counts) == iscc.similarity_hash(digests)
+    # A weight counts like repeated digests
+    counts = iscc.similarity_hash_update(None, digests[0], weight=3)
+    counts = iscc.similarity_hash_update(counts, digests[1], weight=2)
+    expected = iscc.similarity_hash([digests[0]] * 3 + [digests[1]] * 2)
+    assert iscc.similarity_hash_finalize(counts) == expected
+    counts = iscc.similarity_hash_update(None, b"\x01\x80")
+    assert iscc.similarity_hash_finalize(counts) == b"\x01\x80"
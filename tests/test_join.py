@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import pytest
+import iscc
+from iscc import join
+
+
+def code(header, body):
+    return iscc.encode(header + body.to_bytes(8, "big"))
+
+
+def flip(body, n, rnd):
+    for bit in rnd.sample(range(64), n):
+        body ^= 1 << bit
+    return body
+
+
+def catalogs(seed=0):
+    rnd = random.Random(seed)
+    header = b"\x20"
+    left = [rnd.getrandbits(64) for _ in range(300)]
+    right = [flip(rnd.choice(left), rnd.randint(0, 14), rnd) for _ in range(200)]
+    right += [rnd.getrandbits(64) for _ in range(100)]
+    left += [flip(left[0], rnd.randint(0, 10), rnd) for _ in range(20)]
+    return [code(header, b) for b in left], [code(header, b) for b in right]
+
+
+def brute_force(left, right, radius):
+    left = [iscc.decode(c) for c in left]
+    right = left if right is None else [iscc.decode(c) for c in right]
+    self_join = right is left
+    pairs = set()
+    for i, a in enumerate(left):
+        for j, b in enumerate(right):
+            if self_join and j <= i:
+                continue
+            d = bin(int.from_bytes(a[1:], "big") ^ int.from_bytes(b[1:], "big"))
+            d = d.count("1")
+            if d <= radius and a[0] == b[0]:
+                pairs.add((i, j, d))
+    return pairs
+
+
+@pytest.mark.parametrize("radius", [0, 3, 8, 12])
+def test_join_cross(radius):
+    left, right = catalogs()
+    pairs = list(join.join(left, right, radius, slice_size=50))
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == brute_force(left, right, radius)
+
+
+@pytest.mark.parametrize("blocks", [1, 3, 9])
+def test_join_self(blocks):
+    left, _ = catalogs(1)
+    pairs = list(join.join(left, radius=8, blocks=blocks))
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == brute_force(left, None, 8)
+
+
+def test_join_workers():
+    left, right = catalogs(2)
+    pairs = list(join.join(left, right, 6, workers=2, slice_size=64))
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == brute_force(left, right, 6)
+
+
+def test_join_headers():
+    body = random.Random(3).getrandbits(64)
+    left = [code(b"\x20", body), code(b"\x10", body)]
+    right = [code(b"\x10", body)]
+    assert list(join.join(left, right, 4)) == [(1, 0, 0)]
+    assert list(join.join([], right)) == []
+
+
+def test_main(tmpdir, capsys):
+    left, right = catalogs(4)
+    paths = []
+    for name, codes in (("left", left), ("right", right)):
+        path = str(tmpdir.join(name + ".jsonl"))
+        with open(path, "w", encoding="utf-8") as outf:
+            for i, c in enumerate(codes):
+                outf.write(json.dumps({"path": "%s%d" % (name, i), "data_id": c}))
+                outf.write("\n")
+        paths.append(path)
+    join.main(paths + ["-c", "data", "-r", "5", "-w", "1"])
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    expected = brute_force(left, right, 5)
+    assert len(records) == len(expected)
+    assert {
+        (int(r["left"][4:]), int(r["right"][5:]), r["distance"]) for r in records
+    } == expected
+
+
+def test_min_blocks():
+    for radius in range(40):
+        assert radius // join.min_blocks(radius) <= join.MAX_BLOCK_RADIUS
+        assert radius // (join.min_blocks(radius) - 1 or 1) > join.MAX_BLOCK_RADIUS or (
+            join.min_blocks(radius) == 1
+        )
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+import iscc
+from iscc import backends
+from iscc.meta import LRUCache, MetaIdBatch, meta_id_batch
+
+
+RECORDS = [
+    ("Die Unendliche Geschichte", "Michael Ende"),
+    ("Die unendliche Geschichte ", "Michael Ende"),
+    ("Momo", ""),
+    ("", ""),
+    ("Hello", "Publisher Ltd."),
+    ("Momo", ""),
+    ("Ä" * 200, "Ö" * 200),
+]
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request):
+    if request.param not in backends.available():
+        pytest.skip("backend not available")
+    backends.select(request.param, check=False)
+    yield request.param
+    backends.select("python", check=False)
+
+
+def test_batch_matches_meta_id(backend):
+    generator = MetaIdBatch()
+    expected = [iscc.meta_id(title, extra) for title, extra in RECORDS]
+    assert generator.batch(RECORDS) == expected
+    assert generator.batch(RECORDS) == expected
+    assert generator.results.hits == len(RECORDS)
+    assert generator.meta_id("Momo") == iscc.meta_id("Momo")
+    assert generator.batch(["Momo"]) == [iscc.meta_id("Momo")]
+
+
+def test_meta_id_batch_bounded_caches():
+    generator = MetaIdBatch(field_cache_size=3, result_cache_size=2)
+    records = RECORDS * 3
+    results = list(meta_id_batch(records, generator, batch_size=4))
+    assert results == [iscc.meta_id(title, extra) for title, extra in records]
+    assert len(generator.fields) == 3
+    assert len(generator.results) == 2
+
+
+def test_similarity_hash_batch(backend):
+    digests = [bytes([i] * 8) for i in range(20)]
+    lists = [digests[:1], digests[1:7], digests[7:]]
+    assert iscc.similarity_hash_batch(lists) == [iscc.similarity_hash(d) for d in lists]
+    assert iscc.similarity_hash_batch([]) == []
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert (cache.hits, cache.misses) == (2, 1)
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+from iscc import profile
+
+
+HERE = os.path.dirname(__file__)
+IMAGE = os.path.join(HERE, "file_image_cat.jpg")
+
+
+def test_profile_file():
+    report = profile.profile_file(IMAGE, ("content", "data"), top=5)
+    assert report["size"] == os.path.getsize(IMAGE)
+    assert list(report["components"]) == ["content", "data"]
+    data = report["components"]["data"]
+    assert data["result"]["data_id"].startswith("C")
+    assert data["seconds"] > 0
+    assert data["peak_bytes"] > 0
+    assert "minhash" in data["steps"]["data_id"]
+    assert 0 < len(report["functions"]) <= 5
+    cumtimes = [row["cumtime"] for row in report["functions"]]
+    assert cumtimes == sorted(cumtimes, reverse=True)
+    assert len(data["allocations"]) <= 5
+    assert "content_id_image" in profile.format_report(report)
+
+
+def test_profile_main(tmp_path, capsys):
+    collapsed = str(tmp_path / "stacks.txt")
+    profile.main([IMAGE, "-c", "data", "--json", "--collapsed", collapsed])
+    report = json.loads(capsys.readouterr().out)
+    assert list(report["components"]) == ["data"]
+    with open(collapsed, encoding="utf-8") as infile:
+        for line in infile:
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+            assert stack
+
+
+def test_profile_clean_timing():
+    report = profile.profile_file(IMAGE, ("data",), top=5)
+    data = report["components"]["data"]
+    assert 0 < data["seconds"]
+    assert data["profiled_seconds"] > 0
+    # Steps come from the untraced run and fit into its wall time
+    steps = data["steps"]["data_id"]
+    assert sum(v["seconds"] for v in steps.values()) <= data["seconds"]
+
+
+def test_stack_sampler_pause():
+    sampler = profile.StackSampler(interval=0.001).start()
+    sampler.pause()
+    time.sleep(0.2)
+    paused = sum(sampler.counts.values())
+    time.sleep(0.2)
+    assert sum(sampler.counts.values()) == paused
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    assert sum(sampler.counts.values()) > paused
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import os
+from io import BytesIO
+import pytest
+import iscc
+from iscc.readers import AdvisedFile, ReadAheadReader, open_file
+
+
+DATA = os.urandom(300000)
+
+
+class FailingFile:
+    def __init__(self):
+        self.calls = 0
+
+    def read(self, size):
+        self.calls += 1
+        if self.calls > 2:
+            raise OSError("device error")
+        return b"x" * size
+
+
+def test_read_ahead_read_sizes():
+    for size in (1, 1000, 4096, 64000, 300000, 500000):
+        reader = ReadAheadReader(BytesIO(DATA), block_size=4096, depth=2)
+        parts = list(iter(lambda: reader.read(size), b""))
+        reader.close()
+        assert b"".join(parts) == DATA
+        assert all(len(p) == size for p in parts[:-1])
+        assert reader.bytes_read == len(DATA)
+
+
+def test_read_ahead_read_all():
+    with ReadAheadReader(BytesIO(DATA), block_size=1000) as reader:
+        assert reader.read(10) == DATA[:10]
+        assert reader.read() == DATA[10:]
+        assert reader.read(10) == b""
+
+
+def test_read_ahead_codes(tmpdir):
+    path = str(tmpdir.join("data.bin"))
+    with open(path, "wb") as outf:
+        outf.write(DATA)
+    with ReadAheadReader(path, block_size=10000, depth=3) as reader:
+        data_id = iscc.data_id(reader)
+    with open_file(path, readahead=2, block_size=7000) as reader:
+        instance_id = iscc.instance_id(reader)
+    assert data_id == iscc.data_id(DATA)
+    assert instance_id == iscc.instance_id(DATA)
+
+
+def test_read_ahead_error():
+    reader = ReadAheadReader(FailingFile(), block_size=10, depth=1)
+    assert reader.read(20) == b"x" * 20
+    with pytest.raises(OSError):
+        reader.read(10)
+    reader.close()
+
+
+def test_read_ahead_close_early():
+    reader = ReadAheadReader(BytesIO(DATA), block_size=100, depth=2)
+    assert reader.read(5) == DATA[:5]
+    reader.close()
+    assert reader.closed
+    assert reader.bytes_read < len(DATA)
+
+
+def test_read_ahead_invalid():
+    with pytest.raises(ValueError):
+        ReadAheadReader(BytesIO(DATA), depth=0)
+
+
+def test_open_file_plain(tmpdir):
+    path = str(tmpdir.join("data.bin"))
+    with open(path, "wb") as outf:
+        outf.write(DATA)
+    with open_file(path) as infile:
+        assert not isinstance(infile, ReadAheadReader)
+        assert infile.read() == DATA
+
+
+def test_advised_file(tmpdir):
+    path = str(tmpdir.join("data.bin"))
+    with open(path, "wb") as outf:
+        outf.write(DATA)
+    with AdvisedFile(path, drop_interval=50000) as infile:
+        assert iscc.instance_id(infile) == iscc.instance_id(DATA)
+        assert infile.bytes_read == len(DATA)
+    assert infile.closed
+    with open_file(path, readahead=2, block_size=4096, fadvise=True) as infile:
+        assert iscc.data_id(infile) == iscc.data_id(DATA)
+        assert infile.bytes_read == len(DATA)
+
+
+def _advice_log(monkeypatch, resident):
+    calls = []
+    monkeypatch.setattr(AdvisedFile, "_advise", lambda self, *args: calls.append(args))
+    monkeypatch.setattr(AdvisedFile, "_resident", lambda self, offset: resident)
+    return calls
+
+
+def test_advised_file_drops_only_read_ranges(tmpdir, monkeypatch):
+    path = str(tmpdir.join("data.bin"))
+    with open(path, "wb") as outf:
+        outf.write(DATA)
+    calls = _advice_log(monkeypatch, resident=False)
+    with AdvisedFile(path, drop_interval=50000) as infile:
+        while infile.read(4096):
+            pass
+    drops = [
+        (offset, length) for offset, length, advice in calls if "DONTNEED" in advice
+    ]
+    assert drops and all(length > 0 for _, length in drops)
+    # Consecutive ranges from the start, ending with the last prefetch window
+    end = 0
+    for offset, length in drops:
+        assert offset == end
+        end += length
+    assert end >= len(DATA)
+
+
+def test_advised_file_keeps_cached_pages(tmpdir, monkeypatch):
+    path = str(tmpdir.join("data.bin"))
+    with open(path, "wb") as outf:
+        outf.write(DATA)
+    calls = _advice_log(monkeypatch, resident=True)
+    with AdvisedFile(path, drop_interval=50000) as infile:
+        assert infile.read() == DATA
+    assert not [call for call in calls if "DONTNEED" in call[2]]
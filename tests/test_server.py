@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+import pytest
+import iscc
+from iscc.server import (
+    ShardedIndex,
+    ShardError,
+    SearchServer,
+    load_shard,
+    search_shard,
+)
+
+
+def random_codes(n, header=iscc.HEAD_DID, seed=0):
+    rnd = random.Random(seed)
+    return [
+        iscc.encode(header + rnd.getrandbits(64).to_bytes(8, "big")) for _ in range(n)
+    ]
+
+
+@pytest.fixture(scope="module")
+def index():
+    codes = random_codes(200) + random_codes(50, header=iscc.HEAD_IID, seed=1)
+    with ShardedIndex.partition(codes, n_shards=3) as idx:
+        yield idx
+
+
+@pytest.fixture(scope="module")
+def server(index):
+    srv = SearchServer(index, port=0)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%s" % srv.server_address[1]
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_load_shard(tmpdir):
+    codes = random_codes(3)
+    path = tmpdir.join("shard.txt")
+    path.write("\n".join([codes[0] + "\tfirst", codes[1], "", codes[2]]))
+    entries = load_shard(str(path))
+    assert [e[2] for e in entries] == codes
+    assert entries[0][3] == "first"
+    assert entries[1][3] is None
+
+
+def test_search_shard_matches_brute_force():
+    codes = random_codes(100)
+    entries = load_shard(codes)
+    query = codes[7]
+    result = search_shard(entries, query, k=5)
+    expected = sorted((iscc.distance(query, c), c) for c in codes)[:5]
+    assert [(d, c) for d, c, _ in result] == expected
+    assert search_shard(entries, query, k=5, max_distance=0) == [(0, query, None)]
+
+
+def test_sharded_search_merges_top_k(index):
+    codes = random_codes(200)
+    query = codes[42]
+    results = index.search(query, k=10)
+    expected = sorted((iscc.distance(query, c), c) for c in codes)[:10]
+    assert [(r["distance"], r["code"]) for r in results] == expected
+    assert len(index) == 250
+
+
+def test_sharded_search_filters_component(index):
+    query = random_codes(1, header=iscc.HEAD_IID, seed=1)[0]
+    results = index.search(query, k=100)
+    assert len(results) == 50
+    assert all(iscc.decode(r["code"])[:1] == iscc.HEAD_IID for r in results)
+
+
+def test_sharded_search_invalid_code(index):
+    with pytest.raises(ValueError):
+        index.search("invalid")
+    assert index.stats()["queries"]["errors"] >= 1
+
+
+def test_http_search(server):
+    query = random_codes(200)[3]
+    with urlopen(server + "/search?code=%s&k=3" % query) as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    assert data["code"] == query
+    assert data["results"][0] == {"distance": 0, "code": query, "key": None}
+    assert len(data["results"]) == 3
+
+
+def test_http_metrics(server):
+    urlopen(server + "/search?code=%s" % random_codes(1)[0]).close()
+    with urlopen(server + "/metrics") as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    assert data["entries"] == 250
+    assert len(data["shards"]) == 3
+    assert data["queries"]["count"] >= 1
+    assert data["queries"]["p99_ms"] >= data["queries"]["p50_ms"] >= 0
+
+
+def test_http_errors(server):
+    with pytest.raises(HTTPError) as e:
+        urlopen(server + "/search")
+    assert e.value.code == 400
+    with pytest.raises(HTTPError) as e:
+        urlopen(server + "/unknown")
+    assert e.value.code == 404
+
+
+def test_concurrent_searches(index):
+    codes = random_codes(200)
+    queries = codes[:40]
+    results = {}
+
+    def search(query):
+        results[query] = index.search(query, k=5)
+
+    threads = [threading.Thread(target=search, args=(q,)) for q in queries]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    for query in queries:
+        expected = sorted((iscc.distance(query, c), c) for c in codes)[:5]
+        assert [(r["distance"], r["code"]) for r in results[query]] == expected
+
+
+def test_dead_shard():
+    codes = random_codes(30)
+    with ShardedIndex.partition(codes, n_shards=2) as idx:
+        assert idx.search(codes[0], k=1)[0]["code"] == codes[0]
+        idx.shards[1].proc.terminate()
+        idx.shards[1].proc.join()
+        for _ in range(3):
+            with pytest.raises(ShardError):
+                idx.search(codes[0])
+        assert idx.unavailable() == [1]
+        srv = SearchServer(idx, port=0)
+        thread = threading.Thread(target=srv.serve_forever, daemon=True)
+        thread.start()
+        url = "http://127.0.0.1:%s" % srv.server_address[1]
+        try:
+            with pytest.raises(HTTPError) as e:
+                urlopen(url + "/search?code=%s" % codes[0])
+            assert e.value.code == 503
+            with pytest.raises(HTTPError) as e:
+                urlopen(url + "/health")
+            assert e.value.code == 503
+        finally:
+            srv.shutdown()
+            srv.server_close()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import sys
+import pytest
+import iscc
+from iscc import watch
+from iscc.index import CodeIndex
+
+
+def wait_for(watcher, count, timeout=10.0):
+    results = []
+    deadline = watch.time.monotonic() + timeout
+    while len(results) < count and watch.time.monotonic() < deadline:
+        results += watcher.step(timeout=0.05)
+    return results
+
+
+def test_debouncer():
+    debouncer = watch.Debouncer(delay=1.0, max_delay=5.0)
+    debouncer.push(watch.CHANGED, "a", 0.0)
+    debouncer.push(watch.CHANGED, "a", 0.5)
+    debouncer.push(watch.CHANGED, "b", 0.2)
+    assert debouncer.timeout(0.6, 10.0) == pytest.approx(0.6)
+    assert debouncer.ready(1.3) == [(watch.CHANGED, "b")]
+    assert debouncer.ready(1.4) == []
+    assert debouncer.ready(1.5) == [(watch.CHANGED, "a")]
+    # Continuous writes are processed after max_delay
+    for t in range(0, 10):
+        debouncer.push(watch.CHANGED, "c", t * 0.5)
+        if t * 0.5 < 5.0:
+            assert debouncer.ready(t * 0.5) == []
+    assert debouncer.ready(5.0) == [(watch.CHANGED, "c")]
+    debouncer.push(watch.CHANGED, "d", 0.0)
+    debouncer.push(watch.DELETED, "d", 0.1)
+    assert debouncer.ready(2.0) == [(watch.DELETED, "d")]
+    assert debouncer.timeout(2.0, 3.0) == 3.0
+
+
+def test_poller(tmpdir):
+    tmpdir.join("a.bin").write_binary(b"a")
+    poller = watch.Poller([str(tmpdir)], interval=0.0)
+    assert poller.poll(0) == []
+    tmpdir.mkdir("sub").join("b.bin").write_binary(b"b")
+    os.remove(str(tmpdir.join("a.bin")))
+    events = poller.poll(0)
+    assert sorted(events) == [
+        (watch.CHANGED, str(tmpdir.join("sub", "b.bin"))),
+        (watch.DELETED, str(tmpdir.join("a.bin"))),
+    ]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify")
+def test_inotify(tmpdir):
+    source = watch.Inotify([str(tmpdir)])
+    try:
+        tmpdir.join("a.bin").write_binary(b"a")
+        sub = tmpdir.mkdir("sub")
+        sub.join("b.bin").write_binary(b"b")
+        events = set()
+        for _ in range(20):
+            events.update(source.poll(0.05))
+        assert (watch.CHANGED, str(tmpdir.join("a.bin"))) in events
+        sub.join("c.bin").write_binary(b"c")
+        os.remove(str(tmpdir.join("a.bin")))
+        for _ in range(20):
+            events.update(source.poll(0.05))
+        assert (watch.CHANGED, str(sub.join("c.bin"))) in events
+        assert (watch.DELETED, str(tmpdir.join("a.bin"))) in events
+    finally:
+        source.close()
+
+
+@pytest.mark.parametrize("poll_interval", [None, 0.05])
+def test_watcher_index(tmpdir, poll_interval):
+    root = tmpdir.mkdir("root")
+    index = CodeIndex(str(tmpdir.join("index.db")))
+    watcher = watch.Watcher(
+        [str(root)],
+        ("data",),
+        watch.IndexSink(index),
+        debounce=0.1,
+        max_delay=1.0,
+        poll_interval=poll_interval,
+    )
+    with watcher:
+        path = str(root.join("file.bin"))
+        for i in range(5):
+            with open(path, "ab") as outf:
+                outf.write(b"chunk %d" % i)
+        results = wait_for(watcher, 1)
+        assert len(results) == 1
+        with open(path, "rb") as infile:
+            data_id = iscc.data_id(infile)
+        assert results[0]["data_id"] == data_id
+        assert index.get(os.path.abspath(path)) == {"data": data_id}
+        os.remove(path)
+        results = wait_for(watcher, 1)
+        assert results == [{"path": os.path.abspath(path), "deleted": True}]
+        assert len(index) == 0
+    index.close()
+
+
+def test_watcher_scan(tmpdir):
+    tmpdir.join("a.txt").write_text("Hello World", encoding="utf-8")
+    out = io.StringIO()
+    with watch.Watcher([str(tmpdir)], sink=watch.JsonLinesSink(out)) as watcher:
+        watcher.scan()
+        assert len(watcher.step(timeout=0)) == 1
+    result = json.loads(out.getvalue())
+    assert result["content_id"] == iscc.content_id_text("Hello World")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify")
+def test_watcher_directory_moved_out(tmpdir):
+    root, out = tmpdir.mkdir("root"), tmpdir.mkdir("out")
+    root.mkdir("sub").join("f.bin").write_binary(b"data")
+    root.join("g.bin").write_binary(b"other")
+    index = CodeIndex(str(tmpdir.join("index.db")))
+    with watch.Watcher(
+        [str(root)], ("data",), watch.IndexSink(index), debounce=0.05
+    ) as watcher:
+        assert isinstance(watcher.source, watch.Inotify)
+        watcher.scan()
+        assert len(wait_for(watcher, 2)) == 2
+        moved = str(root.join("sub", "f.bin"))
+        assert index.get(moved)
+        os.rename(str(root.join("sub")), str(out.join("sub")))
+        results = wait_for(watcher, 1)
+        assert results == [{"path": moved, "deleted": True}]
+        assert not index.get(moved)
+        assert index.get(str(root.join("g.bin")))
+        # Writes below the moved directory are not reported under old paths
+        out.join("sub", "h.bin").write_binary(b"new")
+        assert wait_for(watcher, 1, timeout=0.5) == []
+    index.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify")
+def test_inotify_rescan(tmpdir):
+    tmpdir.join("a.bin").write_binary(b"a")
+    tmpdir.join("b.bin").write_binary(b"b")
+    source = watch.Inotify([str(tmpdir)])
+    try:
+        os.remove(str(tmpdir.join("a.bin")))
+        assert source.rescan() == [
+            (watch.DELETED, str(tmpdir.join("a.bin"))),
+            (watch.CHANGED, str(tmpdir.join("b.bin"))),
+        ]
+    finally:
+        source.close()
+
+
+def test_watcher_deleted_prefix(tmpdir):
+    with watch.Watcher([str(tmpdir)], poll_interval=60) as watcher:
+        sub = os.path.join(str(tmpdir), "sub")
+        watcher.known.update([sub + "/a", sub + "/b", sub + "x"])
+        assert watcher.deleted(sub) == [sub + "/a", sub + "/b"]
+        assert watcher.deleted(sub + "x") == [sub + "x"]
+        assert watcher.deleted(sub + "y") == [sub + "y"]
+        assert watcher.known == set()
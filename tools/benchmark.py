@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""Benchmark ISCC component generators on reproducible synthetic corpora.
+
+Every case runs in a fresh process so that peak RSS is measured per case.
+Results are saved as JSON to the `benchmarks` folder for later comparison.
+
+Usage: python tools/benchmark.py [--quick] [--compare results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+from os.path import dirname, join, abspath
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), "src"))
+
+import iscc  # noqa: E402
+from iscc import instrument  # noqa: E402
+
+
+BENCH_DIR = join(dirname(abspath(__file__)), "benchmarks")
+KB, MB, GB = 1024, 1024**2, 1024**3
+BLOCK_SIZE = MB
+SEED = 0
+
+DATA_SIZES = [KB, 64 * KB, MB, 16 * MB, 256 * MB, GB]
+TEXT_SIZES = [KB, 16 * KB, 256 * KB, MB]
+IMAGE_SIZES = [64, 256, 1024, 2048]
+META_ITEMS = [1000, 10000]
+
+QUICK_DATA_SIZES = [KB, 64 * KB, MB]
+QUICK_TEXT_SIZES = [KB, 16 * KB]
+QUICK_IMAGE_SIZES = [64, 256]
+QUICK_META_ITEMS = [1000]
+
+SCRIPTS = [
+    "abcdefghijklmnopqrstuvwxyz",  # Latin
+    "абвгдежзийклмнопрстуфхцчшщыэюя",  # Cyrillic
+    "αβγδεζηθικλμνξοπρστυφχψω",  # Greek
+    "的一是不了人我在有他这中大来上个国到说们为子和你地出道也时年得",  # CJK
+    "ابتثجحخدذرزسشصضطظعغفقكلمنهوي",  # Arabic
+    "अआइईउऊएऐओऔकखगघङचछजझञटठडढणतथदधनपफबभमयरलवशसह",  # Devanagari
+    "àáâãäåæçèéêëìíîïñòóôõöøùúûüýÿ",  # Latin with diacritics
+]
+
+
+###############################################################################
+# Synthetic Corpora                                                           #
+###############################################################################
+
+
+def random_file(size, seed=SEED):
+    """Write `size` seeded random bytes to a temporary file and return its path."""
+    rnd = random.Random(seed)
+    fd, path = tempfile.mkstemp(prefix="iscc-bench-", suffix=".bin")
+    with os.fdopen(fd, "wb") as outf:
+        remaining = size
+        while remaining:
+            n = min(remaining, BLOCK_SIZE)
+            outf.write(rnd.getrandbits(n * 8).to_bytes(n, "big"))
+            remaining -= n
+    return path
+
+
+def random_text(size, seed=SEED):
+    """Multilingual text of roughly `size` UTF-8 bytes mixing several scripts."""
+    rnd = random.Random(seed)
+    words, length = [], 0
+    while length < size:
+        script = rnd.choice(SCRIPTS)
+        word = "".join(rnd.choice(script) for _ in range(rnd.randint(2, 10)))
+        if rnd.random() < 0.1:
+            word = word.capitalize() + rnd.choice(",.;:!?")
+        words.append(word)
+        length += len(word.encode("utf-8")) + 1
+    return " ".join(words)
+
+
+def random_image(size, seed=SEED):
+    """Smooth seeded RGB test image with `size` x `size` pixels."""
+    from PIL import Image
+
+    rnd = random.Random(seed)
+    small = Image.frombytes(
+        "RGB", (16, 16), rnd.getrandbits(16 * 16 * 24).to_bytes(768, "big")
+    )
+    return small.resize((size, size), Image.BILINEAR)
+
+
+def random_titles(n, seed=SEED):
+    rnd = random.Random(seed)
+    return [
+        (random_text(rnd.randint(16, 96), seed=i), random_text(32, seed=-i))
+        for i in range(n)
+    ]
+
+
+###############################################################################
+# Runner                                                                      #
+###############################################################################
+
+
+def prepare(component, size, path=None):
+    if component == "meta_id":
+        return random_titles(size)
+    if component == "content_id_text":
+        return random_text(size)
+    if component == "content_id_image":
+        return random_image(size)
+    return path
+
+
+def run_case(component, size, path, repeat):
+    """Run one benchmark case (in a fresh worker process)."""
+    data = prepare(component, size, path)
+    func = getattr(iscc, component)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if component == "meta_id":
+            for title, extra in data:
+                func(title, extra)
+        else:
+            func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    with instrument.recording() as rec:
+        if component == "meta_id":
+            for title, extra in data:
+                func(title, extra)
+        else:
+            func(data)
+    steps = rec.to_dict()[component]
+    stages = {step: values["seconds"] for step, values in steps.items()}
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        rss *= 1024
+    if component == "meta_id":
+        nbytes = sum(len(t.encode("utf-8")) + len(e.encode("utf-8")) for t, e in data)
+        items = len(data)
+    elif component == "content_id_text":
+        nbytes, items = len(data.encode("utf-8")), 1
+    elif component == "content_id_image":
+        nbytes, items = size * size * 3, 1
+    else:
+        nbytes, items = size, 1
+    return {
+        "component": component,
+        "size": size,
+        "bytes": nbytes,
+        "items": items,
+        "seconds": best,
+        "mb_per_s": nbytes / MB / best if best else 0.0,
+        "items_per_s": items / best if best else 0.0,
+        "peak_rss": rss,
+        "stages": stages,
+    }
+
+
+def cases(quick=False, components=None, max_size=None):
+    data_sizes = QUICK_DATA_SIZES if quick else DATA_SIZES
+    plan = [("meta_id", n) for n in (QUICK_META_ITEMS if quick else META_ITEMS)]
+    plan += [
+        ("content_id_text", n) for n in (QUICK_TEXT_SIZES if quick else TEXT_SIZES)
+    ]
+    plan += [
+        ("content_id_image", n) for n in (QUICK_IMAGE_SIZES if quick else IMAGE_SIZES)
+    ]
+    plan += [(c, n) for n in data_sizes for c in ("data_id", "instance_id")]
+    if components:
+        plan = [(c, n) for c, n in plan if c in components]
+    if max_size:
+        plan = [
+            (c, n)
+            for c, n in plan
+            if c in ("meta_id", "content_id_image") or n <= max_size
+        ]
+    return plan
+
+
+def run(plan, repeat=1):
+    ctx = get_context("spawn")
+    files = {}
+    results = []
+    try:
+        for component, size in plan:
+            path = None
+            if component in ("data_id", "instance_id"):
+                if size not in files:
+                    files[size] = random_file(size)
+                path = files[size]
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_case, (component, size, path, repeat))
+            report(result)
+            results.append(result)
+    finally:
+        for path in files.values():
+            os.remove(path)
+    return results
+
+
+def report(result):
+    stages = ", ".join(
+        "%s=%.3fs" % (k, v)
+        for k, v in sorted(result["stages"].items(), key=lambda i: -i[1])
+    )
+    print(
+        "%-17s %10s %9.3fs %9.2f MB/s %10.1f items/s %8.1f MB RSS | %s"
+        % (
+            result["component"],
+            human_size(result["component"], result["size"]),
+            result["seconds"],
+            result["mb_per_s"],
+            result["items_per_s"],
+            result["peak_rss"] / MB,
+            stages,
+        )
+    )
+
+
+def human_size(component, size):
+    if component == "meta_id":
+        return "%d items" % size
+    if component == "content_id_image":
+        return "%dx%d" % (size, size)
+    for unit, factor in (("GB", GB), ("MB", MB), ("KB", KB)):
+        if size >= factor:
+            return "%d%s" % (size // factor, unit)
+    return "%dB" % size
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    for unit, factor in (("GB", GB), ("MB", MB), ("KB", KB), ("B", 1)):
+        if text.endswith(unit):
+            return int(float(text[: -len(unit)]) * factor)
+    return int(text)
+
+
+def save(results, outdir=BENCH_DIR):
+    os.makedirs(outdir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    doc = {
+        "timestamp": stamp,
+        "version": iscc.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    path = join(outdir, "results-%s.json" % stamp)
+    with open(path, "w", encoding="utf-8") as outf:
+        json.dump(doc, outf, indent=2, sort_keys=True)
+    return path
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as infile:
+        baseline = json.load(infile)
+    previous = {(r["component"], r["size"]): r for r in baseline["results"]}
+    print("\nCompared to %s (%s):" % (baseline_path, baseline["version"]))
+    for result in results:
+        old = previous.get((result["component"], result["size"]))
+        if old is None or not result["seconds"]:
+            continue
+        print(
+            "%-17s %10s %7.2fx speed, %+6.1f MB RSS"
+            % (
+                result["component"],
+                human_size(result["component"], result["size"]),
+                old["seconds"] / result["seconds"],
+                (result["peak_rss"] - old["peak_rss"]) / MB,
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ISCC generators.")
+    parser.add_argument("--quick", action="store_true", help="small corpora only")
+    parser.add_argument("--components", help="comma separated generator names")
+    parser.add_argument("--max-size", type=parse_size, help="e.g. 64MB")
+    parser.add_argument("--repeat", type=int, default=1, help="best of N runs")
+    parser.add_argument("--output", default=BENCH_DIR, help="results folder")
+    parser.add_argument("--compare", help="previous results file to compare")
+    args = parser.parse_args()
+
+    components = args.components.split(",") if args.components else None
+    plan = cases(args.quick, components, args.max_size)
+    results = run(plan, args.repeat)
+    print("\nSaved", save(results, args.output))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Verify the cold start import budget of the iscc package.
+
+Runs `python -X importtime -c "import iscc"` in fresh processes (with a warm
+bytecode cache), reports the slowest modules of the best run and fails if the
+cumulative import time exceeds the budget or if a module that should load
+lazily was imported.
+
+Usage: python tools/importtime.py [--budget 25] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from os.path import dirname, join, abspath
+
+
+SRC = join(dirname(dirname(abspath(__file__))), "src")
+BUDGET_MS = 25.0
+RUNS = 5
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ("PIL", "numpy", "statistics", "importlib.metadata")
+
+
+def measure(pycache):
+    """Return `[(module, self_us, cumulative_us)]` of one `import iscc`."""
+    env = dict(os.environ, PYTHONPATH=SRC)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    cmd = [sys.executable, "-X", "importtime", "-X", "pycache_prefix=" + pycache]
+    cmd += ["-c", "import iscc"]
+    proc = subprocess.run(cmd, env=env, stderr=subprocess.PIPE, check=True)
+    return parse(proc.stderr.decode("utf-8"))
+
+
+def parse(report):
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative)))
+    return rows
+
+
+def imported_modules():
+    """Modules loaded by `import iscc` in a fresh interpreter."""
+    code = "import sys, iscc; print('\\n'.join(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=SRC)
+    out = subprocess.check_output([sys.executable, "-c", code], env=env)
+    return out.decode("utf-8").split()
+
+
+def check(budget_ms=BUDGET_MS, runs=RUNS, top=10):
+    """Print a report and return a list of budget violations."""
+    with tempfile.TemporaryDirectory() as pycache:
+        measure(pycache)
+        best = min((measure(pycache) for _ in range(runs)), key=lambda r: r[-1][2])
+    total_ms = best[-1][2] / 1000.0
+    print("import iscc: %.1f ms (budget %.1f ms)" % (total_ms, budget_ms))
+    for name, self_us, cumulative in sorted(best, key=lambda r: -r[1])[:top]:
+        print(
+            "  %-32s self %7.1f ms  cumulative %7.1f ms"
+            % (name, self_us / 1000.0, cumulative / 1000.0)
+        )
+    problems = []
+    if total_ms > budget_ms:
+        problems.append("import time %.1f ms exceeds budget" % total_ms)
+    modules = set(imported_modules())
+    for name in LAZY_MODULES:
+        if name in modules:
+            problems.append("%s imported eagerly" % name)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time budget.")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="in ms")
+    parser.add_argument("--runs", type=int, default=RUNS, help="best of N runs")
+    args = parser.parse_args()
+    problems = check(args.budget, args.runs)
+    for problem in problems:
+        print("FAIL:", problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Measure the gain of read-ahead I/O for Data-ID and Instance-ID.
+
+Compares synchronous buffered reads with `ReadAheadReader` at the same block
+size. By default reads are throttled with a per-request latency and a
+bandwidth limit to model a network filesystem; `--latency 0 --bandwidth 0`
+reads the local file directly.
+
+Usage: python tools/readahead.py [--size 64MB] [--latency 2] [--bandwidth 200]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from os.path import dirname, join, abspath
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), "src"))
+
+import iscc  # noqa: E402
+from iscc.readers import DEFAULT_BLOCK_SIZE, ReadAheadReader  # noqa: E402
+from benchmark import MB, human_size, parse_size, random_file  # noqa: E402
+
+
+class ThrottledFile(io.RawIOBase):
+    """Raw file that sleeps `latency` seconds plus transfer time per read."""
+
+    def __init__(self, path, latency, bandwidth):
+        self.raw = open(path, "rb", buffering=0)
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        delay = self.latency + (n / self.bandwidth if self.bandwidth else 0.0)
+        if delay:
+            time.sleep(delay)
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def open_source(path, latency, bandwidth, block_size):
+    raw = ThrottledFile(path, latency, bandwidth)
+    return io.BufferedReader(raw, buffer_size=block_size)
+
+
+def measure(func, path, latency, bandwidth, block_size, depth):
+    source = open_source(path, latency, bandwidth, block_size)
+    reader = ReadAheadReader(source, block_size, depth) if depth else source
+    start = time.perf_counter()
+    try:
+        code = func(reader)
+    finally:
+        reader.close()
+        source.close()
+    return time.perf_counter() - start, code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark read-ahead I/O.")
+    parser.add_argument("--size", type=parse_size, default=64 * MB)
+    parser.add_argument("--latency", type=float, default=2.0, help="ms per read")
+    parser.add_argument("--bandwidth", type=float, default=200.0, help="MB/s")
+    parser.add_argument("--block-size", type=parse_size, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--depth", type=int, default=4, help="blocks in flight")
+    args = parser.parse_args()
+
+    latency, bandwidth = args.latency / 1000.0, args.bandwidth * MB
+    path = random_file(args.size)
+    print(
+        "%s, latency %.1f ms, bandwidth %.0f MB/s, block %s, depth %d"
+        % (
+            human_size("data_id", args.size),
+            args.latency,
+            args.bandwidth,
+            human_size("data_id", args.block_size),
+            args.depth,
+        )
+    )
+    try:
+        for name in ("data_id", "instance_id"):
+            func = getattr(iscc, name)
+            sync, expected = measure(func, path, latency, bandwidth, args.block_size, 0)
+            ahead, code = measure(
+                func, path, latency, bandwidth, args.block_size, args.depth
+            )
+            assert code == expected, "read-ahead changed the result"
+            print(
+                "%-12s sync %8.3fs  read-ahead %8.3fs  speedup %.2fx"
+                % (name, sync, ahead, sync / ahead)
+            )
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()